@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+
+""" gen-corpus.py
+
+    Generates a synthetic corpus for benchmarking the DECCA scripts, in
+    all of their input formats: TnT for decca-pos.py, id-word-pos and
+    constituents for decca-treebank.py, id-word-pos and filtertries for
+    decca-disc.py, and id-word-pos-head and filtertries for
+    decca-dep.py.
+
+    The words follow a Zipf distribution and each word has one to three
+    possible tags.  The ambiguity rate is the probability that a token
+    is not given the most likely tag of its word, and the repeat rate is
+    the probability that a sentence repeats an earlier sentence (with
+    the same ambiguity), which gives long variation n-grams.  The same
+    seed always generates the same corpus.
+
+"""
+
+# --------------------------------------------------------
+# USER SETTINGS
+# --------------------------------------------------------
+
+# Optional: default parameters to be used if unspecified on command line
+
+destination_dir = "corpus"
+sentences = 1000
+vocabulary = 2000
+ambiguity = 0.1
+repeat = 0.2
+seed = 1
+
+# the longest token sequences checked for NIL entries in the filtertries
+# files
+
+max_nil_length = 8
+
+# --------------------------------------------------------
+# END USER SETTINGS
+# --------------------------------------------------------
+
+# import included modules
+import getopt
+import sys
+import os
+import random
+import bisect
+
+# specify the long options in arglist
+arglist = ['directory=','sentences=','vocabulary=','ambiguity=','repeat=','seed=','help']
+# parse the command line call
+opts, args = getopt.getopt(sys.argv[1:],"d:s:v:a:r:e:h",arglist)
+
+for option, specification in opts:
+    if option in ("-d", "--directory"):
+        destination_dir = specification
+    elif option in ("-s", "--sentences"):
+        sentences = int(specification)
+    elif option in ("-v", "--vocabulary"):
+        vocabulary = int(specification)
+    elif option in ("-a", "--ambiguity"):
+        ambiguity = float(specification)
+    elif option in ("-r", "--repeat"):
+        repeat = float(specification)
+    elif option in ("-e", "--seed"):
+        seed = int(specification)
+    elif option in ("-h", "--help"):
+        print """
+Generates a synthetic corpus for benchmarking the DECCA scripts in all
+of their input formats.
+
+Options:
+
+-d/--directory   specify the output directory name
+-s/--sentences   specify the number of sentences
+-v/--vocabulary  specify the number of distinct words
+-a/--ambiguity   specify the probability of a token not having the most
+                 likely tag of its word
+-r/--repeat      specify the probability of a sentence repeating an
+                 earlier one
+-e/--seed        specify the random seed
+-h/--help        display this help menu
+"""
+        sys.exit()
+
+# --------------------------------------------------------
+# FUNCTIONS
+
+TAGS = ["NN", "NNS", "VB", "VBD", "DT", "JJ", "IN", "RB", "PRP", "CC"]
+CATS = ["NP", "VP", "PP", "ADJP", "ADVP", "S"]
+RELS = ["SB", "OB", "AT", "PA", "AA", "ET"]
+
+# the function 'zipf_words' returns a function that draws a word with a
+# Zipf distribution over the vocabulary
+
+def zipf_words(vocabulary):
+    cumulative = []
+    total = 0.0
+    for rank in range(1, vocabulary + 1):
+        total += 1.0 / rank
+        cumulative.append(total)
+
+    def draw():
+        return bisect.bisect(cumulative, random.random() * total) + 1
+    return draw
+
+# the function 'gen_sentence' returns a new sentence as a list of
+# (word, tag) pairs
+
+def gen_sentence(draw, Lexicon):
+    sentence = []
+    for i in range(random.randint(4, 30)):
+        word = draw()
+        tags = Lexicon[word]
+        if len(tags) > 1 and random.random() < ambiguity:
+            tag = random.choice(tags[1:])
+        else:
+            tag = tags[0]
+        sentence.append(("w" + str(word), tag))
+    return sentence
+
+# the function 'retag' returns a repeated sentence with the tags drawn
+# again, so that repeated sentences differ in their ambiguous tags
+
+def retag(sentence, Lexicon):
+    newsentence = []
+    for (word, tag) in sentence:
+        tags = Lexicon[int(word[1:])]
+        if len(tags) > 1 and random.random() < ambiguity:
+            tag = random.choice(tags[1:])
+        else:
+            tag = tags[0]
+        newsentence.append((word, tag))
+    return newsentence
+
+# the function 'gen_constituents' returns the (start, end, cat)
+# constituents of a sentence by splitting it recursively; the cat
+# depends on the first tag, except with the ambiguity rate, and only
+# some single tokens are constituents
+
+def gen_constituents(sentence, start, end, Constituents):
+    tag = sentence[start][1]
+    if random.random() < ambiguity:
+        cat = random.choice(CATS)
+    else:
+        cat = CATS[TAGS.index(tag) % len(CATS)]
+    if end - start == 1:
+        if random.random() < 0.3:
+            Constituents.append((start, end, cat))
+        return
+    Constituents.append((start, end, cat))
+    split = random.randint(start + 1, end - 1)
+    gen_constituents(sentence, start, split, Constituents)
+    gen_constituents(sentence, split, end, Constituents)
+
+# the function 'gen_heads' returns the head of every token in a sentence
+# (the root has the head -1) and its dependency relation
+
+def gen_heads(sentence):
+    root = random.randint(0, len(sentence) - 1)
+    heads = []
+    for i in range(len(sentence)):
+        if i == root:
+            heads.append((-1, "ROOT"))
+            continue
+        head = i
+        while head == i:
+            head = random.randint(max(0, i - 4), min(len(sentence) - 1, i + 4))
+        if random.random() < ambiguity:
+            rel = random.choice(RELS)
+        else:
+            rel = RELS[TAGS.index(sentence[i][1]) % len(RELS)]
+        heads.append((head, rel))
+    return heads
+
+def words_of(sentence, start, end):
+    return tuple([word for (word, tag) in sentence[start:end]])
+
+# --------------------------------------------------------
+# STEP 1: Generate the sentences
+
+random.seed(seed)
+
+if not os.path.exists(destination_dir):
+    os.makedirs(destination_dir)
+
+# the lexicon gives each word its possible tags, most likely tag first
+Lexicon = {}
+for word in range(1, vocabulary + 1):
+    Lexicon[word] = random.sample(TAGS, random.choice([1, 1, 1, 2, 2, 3]))
+
+draw = zipf_words(vocabulary)
+Sentences = []
+for s in range(sentences):
+    if Sentences and random.random() < repeat:
+        Sentences.append(retag(random.choice(Sentences), Lexicon))
+    else:
+        Sentences.append(gen_sentence(draw, Lexicon))
+
+print "Generated %d sentences" % len(Sentences)
+
+# --------------------------------------------------------
+# STEP 2: Generate the constituents and dependencies
+
+AllConstituents = []
+AllHeads = []
+ConstituentWords = {}
+DependencyWords = {}
+
+for sentence in Sentences:
+    Constituents = []
+    gen_constituents(sentence, 0, len(sentence), Constituents)
+    AllConstituents.append(Constituents)
+    for (start, end, cat) in Constituents:
+        ConstituentWords[words_of(sentence, start, end)] = 1
+
+    heads = gen_heads(sentence)
+    AllHeads.append(heads)
+    for i in range(len(sentence)):
+        head = heads[i][0]
+        if head >= 0:
+            DependencyWords[(sentence[min(i, head)][0], sentence[max(i, head)][0])] = 1
+
+# --------------------------------------------------------
+# STEP 3: Write out the corpus in all formats
+
+tt = open(os.path.join(destination_dir, "corpus.tt"), 'w')
+txt = open(os.path.join(destination_dir, "corpus.txt"), 'w')
+dep = open(os.path.join(destination_dir, "corpus.dep"), 'w')
+cons = open(os.path.join(destination_dir, "constituents.txt"), 'w')
+ftries = open(os.path.join(destination_dir, "filtertries.txt"), 'w')
+depftries = open(os.path.join(destination_dir, "depfiltertries.txt"), 'w')
+
+# position is the corpus position of the first token in the sentence
+position = 1
+
+for s in range(len(Sentences)):
+    sentence = Sentences[s]
+    heads = AllHeads[s]
+
+    for i in range(len(sentence)):
+        (word, tag) = sentence[i]
+        id = "s%d_%d" % (s + 1, i + 1)
+        tt.write(word + "\t" + tag + "\n")
+        txt.write(id + "\t" + word + "\t" + tag + "\n")
+        dep.write(id + "\t" + word + "\t" + tag + "\t" + heads[i][1] + "\t" + word + "\n")
+
+    # constituents, and NIL entries for the token sequences that are a
+    # constituent somewhere else but not here
+    Entries = []
+    Seen = {}
+    for (start, end, cat) in AllConstituents[s]:
+        Entries.append((start, end, cat))
+        Seen[(start, end)] = 1
+    for start in range(len(sentence)):
+        for end in range(start + 1, min(len(sentence), start + max_nil_length) + 1):
+            if not Seen.has_key((start, end)) and \
+               ConstituentWords.has_key(words_of(sentence, start, end)):
+                Entries.append((start, end, "NIL"))
+    Entries.sort(lambda a, b: cmp(a[0], b[0]) or cmp(b[1], a[1]))
+
+    for (start, end, cat) in Entries:
+        words = "\t".join(words_of(sentence, start, end))
+        if cat != "NIL":
+            cons.write(str(position + start) + "\t" + cat + "\t" + words + "\n")
+        ftries.write(str(position + start) + "\t" + cat + "\t" + "1" * (end - start) + "\t" + words + "\n")
+
+    # dependencies, and NIL entries for the word pairs that are a
+    # dependency somewhere else but not here
+    Pairs = {}
+    for i in range(len(sentence)):
+        (head, rel) = heads[i]
+        id = "s%d_%d" % (s + 1, i + 1)
+        if head < 0:
+            depftries.write(id + "\tROOT\t1\t" + sentence[i][0] + "\n")
+            continue
+        first = min(i, head)
+        last = max(i, head)
+        Pairs[(first, last)] = 1
+        if head > i:
+            rel = rel + "-R"
+        else:
+            rel = rel + "-L"
+        depftries.write("s%d_%d\t%s\t1%s1\t%s\t%s\n" % (s + 1, first + 1, rel, "0" * (last - first - 1), sentence[first][0], sentence[last][0]))
+    for first in range(len(sentence)):
+        for last in range(first + 1, min(len(sentence), first + 5)):
+            if not Pairs.has_key((first, last)) and \
+               DependencyWords.has_key((sentence[first][0], sentence[last][0])):
+                depftries.write("s%d_%d\tNIL\t1%s1\t%s\t%s\n" % (s + 1, first + 1, "0" * (last - first - 1), sentence[first][0], sentence[last][0]))
+
+    position += len(sentence)
+
+for file in (tt, txt, dep, cons, ftries, depftries):
+    file.close()
+
+print "Wrote %d tokens to %s" % (position - 1, destination_dir)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+
+""" run-bench.py
+
+    Runs the DECCA scripts on a corpus generated by gen-corpus.py and
+    records the wall time, the peak memory (maximum resident set size),
+    the time spent on each n-gram length, and the metrics the scripts
+    write for each n-gram length (see --metrics) of every run in a JSON
+    results file.  Two results files can be compared to find the runs
+    that got slower or used more memory.
+
+"""
+
+# --------------------------------------------------------
+# USER SETTINGS
+# --------------------------------------------------------
+
+# Optional: default parameters to be used if unspecified on command line
+
+corpus_dir = "corpus"
+results_file = "results.json"
+
+# the number of times each run is repeated (the fastest one is kept)
+
+repeats = 1
+
+# the increase (in percent) of the wall time or the peak memory that is
+# reported as a regression when comparing two results files
+
+threshold = 10.0
+
+# the python interpreter used to run the scripts
+
+python = "python"
+
+# the runs: a name, the directory of the script, the script and its
+# arguments.  %(corpus)s is replaced by the corpus directory and
+# %(work)s by a temporary directory for the output and cache files.
+
+runs = [
+    ("pos", "pos", "decca-pos.py",
+     "-c %(corpus)s/corpus.tt -d %(work)s -f ngrams"),
+    ("pos-arrays", "pos", "decca-pos.py",
+     "-c %(corpus)s/corpus.tt -d %(work)s -f ngrams -a"),
+    ("pos-suffix-array", "pos", "decca-pos.py",
+     "-c %(corpus)s/corpus.tt -d %(work)s -f ngrams -s"),
+    ("treebank-unit1", "treebank", "decca-treebank.py",
+     "-u 1 -c %(corpus)s/corpus.txt -b %(work)s/corpus.cache -o %(corpus)s/constituents.txt -n %(work)s/cons.bsddb -d %(work)s -f grams"),
+    ("treebank-unit2", "treebank", "decca-treebank.py",
+     "-u 2 -c %(corpus)s/corpus.txt -b %(work)s/corpus.cache -o %(corpus)s/constituents.txt -n %(work)s/cons.bsddb -d %(work)s -f grams"),
+    ("treebank-unit3", "treebank", "decca-treebank.py",
+     "-u 3 -c %(corpus)s/corpus.txt -b %(work)s/corpus.cache -o %(corpus)s/constituents.txt -n %(work)s/cons.bsddb -d %(work)s -f grams"),
+    ("disc-unit2", "disc", "decca-disc.py",
+     "-u 2 -c %(corpus)s/corpus.txt -b %(work)s/corpus.cache -t %(corpus)s/filtertries.txt -d %(work)s"),
+    ("dep", "dep", "decca-dep.py",
+     "-c %(corpus)s/corpus.dep -t %(corpus)s/depfiltertries.txt -d %(work)s/"),
+]
+
+# --------------------------------------------------------
+# END USER SETTINGS
+# --------------------------------------------------------
+
+# import included modules
+import getopt
+import sys
+import os
+import re
+import time
+import json
+import shutil
+import tempfile
+
+# specify the long options in arglist
+arglist = ['corpus=','results=','runs=','repeats=','python=','compare','threshold=','help']
+# parse the command line call
+opts, args = getopt.getopt(sys.argv[1:],"c:o:n:r:p:mt:h",arglist)
+
+selected = []
+compare = 0
+
+for option, specification in opts:
+    if option in ("-c", "--corpus"):
+        corpus_dir = specification
+    elif option in ("-o", "--results"):
+        results_file = specification
+    elif option in ("-n", "--runs"):
+        selected = specification.split(",")
+    elif option in ("-r", "--repeats"):
+        repeats = int(specification)
+    elif option in ("-p", "--python"):
+        python = specification
+    elif option in ("-m", "--compare"):
+        compare = 1
+    elif option in ("-t", "--threshold"):
+        threshold = float(specification)
+    elif option in ("-h", "--help"):
+        print """
+Runs the DECCA scripts on a corpus generated by gen-corpus.py and
+records the wall time, peak memory, and the time for each n-gram length
+in a JSON results file.
+
+Usage:
+
+run-bench.py -c corpus_dir -o results.json
+run-bench.py -m old-results.json new-results.json
+
+Options:
+
+-c/--corpus      specify the corpus directory
+-o/--results     specify the results file
+-n/--runs        specify a comma-separated list of the runs to do
+-r/--repeats     specify the number of times each run is repeated
+-p/--python      specify the python interpreter for the scripts
+-m/--compare     compare two results files
+-t/--threshold   specify the increase (in percent) that is a regression
+-h/--help        display this help menu
+"""
+        sys.exit()
+
+# --------------------------------------------------------
+# FUNCTIONS
+
+# the progress output of all scripts starts each n-gram length with
+# "NNN grams:"; decca-dep.py also starts each window unit with "units
+# of length N"
+level_re = re.compile(r"(\d+) grams:|units of length (\d+)")
+
+# the function 'run_once' runs one script and returns its exit status,
+# wall time, peak memory (in kB), the time for each n-gram length, and
+# the metrics the script wrote for each n-gram length
+
+def run_once(directory, script, arguments):
+    work = tempfile.mkdtemp(prefix="decca-bench-")
+    try:
+        values = {'corpus': os.path.abspath(corpus_dir), 'work': work}
+        metrics_file = os.path.join(work, "metrics.jsonl")
+        command = [python, script, "-e", metrics_file] + (arguments % values).split()
+
+        # the scripts flush their progress output, but make sure that
+        # it is not buffered
+        env = dict(os.environ)
+        env['PYTHONUNBUFFERED'] = "1"
+
+        (read_fd, write_fd) = os.pipe()
+        start = time.time()
+        pid = os.fork()
+        if pid == 0:
+            os.chdir(directory)
+            os.dup2(write_fd, 1)
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 2)
+            os.close(read_fd)
+            try:
+                os.execvpe(python, command, env)
+            finally:
+                os._exit(127)
+        os.close(write_fd)
+
+        # timestamp the start of each n-gram length as the progress
+        # output comes in
+        Marks = []
+        unit = ""
+        output = ""
+        while 1:
+            data = os.read(read_fd, 65536)
+            if not data:
+                break
+            now = time.time() - start
+            output += data
+            keep = len(output) - 32
+            for match in level_re.finditer(output):
+                if match.group(2):
+                    unit = "u" + match.group(2) + "/"
+                else:
+                    Marks.append((unit + match.group(1), now))
+                keep = max(keep, match.end())
+            # keep the end of the output, which may hold the beginning
+            # of a match, for the next read
+            output = output[max(keep, 0):]
+        os.close(read_fd)
+
+        (pid, status, rusage) = os.wait4(pid, 0)
+        wall = time.time() - start
+
+        Levels = {}
+        for i in range(len(Marks)):
+            (level, begin) = Marks[i]
+            if i + 1 < len(Marks):
+                end = Marks[i+1][1]
+            else:
+                end = wall
+            Levels[level] = round(end - begin, 4)
+
+        Metrics = []
+        if os.path.exists(metrics_file):
+            for line in open(metrics_file):
+                Metrics.append(json.loads(line))
+
+        return {'status': os.WEXITSTATUS(status),
+                'wall': round(wall, 4),
+                'peak_rss_kb': rusage.ru_maxrss,
+                'levels': Levels,
+                'metrics': Metrics}
+    finally:
+        shutil.rmtree(work, True)
+
+# the function 'compare_results' prints the runs that are in both
+# results files and returns the number of regressions
+
+def compare_results(old_file, new_file):
+    old = json.load(open(old_file))['runs']
+    new = json.load(open(new_file))['runs']
+
+    regressions = 0
+    names = new.keys()
+    names.sort()
+    for name in names:
+        if not old.has_key(name):
+            continue
+        for measure in ('wall', 'peak_rss_kb'):
+            before = old[name][measure]
+            after = new[name][measure]
+            if before > 0:
+                change = 100.0 * (after - before) / before
+            else:
+                change = 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print "%-20s %-12s %12s %12s %+8.1f%%%s" % (name, measure, before, after, change, flag)
+    return regressions
+
+# --------------------------------------------------------
+# Compare two results files
+
+if compare:
+    if len(args) != 2:
+        sys.stderr.write("\n\nError: --compare requires two results files\n")
+        sys.exit(1)
+    if compare_results(args[0], args[1]):
+        sys.exit(1)
+    sys.exit(0)
+
+# --------------------------------------------------------
+# Run the scripts
+
+decca_dir = os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[0])))
+
+if not os.path.exists(os.path.join(corpus_dir, "corpus.tt")):
+    sys.stderr.write("\n\nError: No corpus in " + corpus_dir + " (see gen-corpus.py)\n")
+    sys.exit(1)
+
+Results = {'corpus': os.path.abspath(corpus_dir),
+           'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+           'repeats': repeats,
+           'runs': {}}
+
+for (name, directory, script, arguments) in runs:
+    if selected and name not in selected:
+        continue
+
+    print name + ":",
+    sys.stdout.flush()
+
+    best = None
+    for i in range(repeats):
+        result = run_once(os.path.join(decca_dir, directory), script, arguments)
+        if best is None or result['wall'] < best['wall']:
+            best = result
+
+    Results['runs'][name] = best
+    if best['status']:
+        print "failed with exit status %d" % best['status']
+    else:
+        print "%.2fs, peak memory %d kB, %d n-gram lengths" % (best['wall'], best['peak_rss_kb'], len(best['levels']))
+    sys.stdout.flush()
+
+file = open(results_file, 'w')
+json.dump(Results, file, indent=1, sort_keys=True)
+file.write("\n")
+file.close()
+
+print "Results written to " + results_file
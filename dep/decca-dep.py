@@ -46,10 +46,20 @@ charencoding = "utf-8"        # encoding for xhtml output
 # (Files specified on command line will override these settings.)
 
 input_corpus = "/path/to/corpus.conll"
+cached_corpus = ""
 filtertries = "/path/to/filtertries.txt"
 destination_dir = "/path/to/output/dir"
 output_file_stem = "dep"
 
+# Optional: file for the metrics of each n-gram length
+# [If a metrics file is given, one line with a JSON object is written to
+#  it for every n-gram length, with the number of n-grams generated and
+#  kept as variation n-grams, the time spent on expanding, filtering,
+#  and writing them, and the peak memory.  This requires python >= 2.6
+#  for the json module.]
+
+metrics_file = ""
+
 # --------------------------------------------------------
 # END USER SETTINGS
 # --------------------------------------------------------
@@ -59,17 +69,22 @@ import getopt
 import sys
 import os
 import re
+import time
 import commands
+import tempfile
 
 # import extra modules
 import bsddb
 from nltk_freqdist import *
+from sortedoutput import SortedOutput, peak_memory
+from corpuscache import CorpusCache, CorpusCacheWriter
+from metrics import Metrics
 
 # specify the long options in arglist
-arglist = ['corpus=','ftree=','file=','xhtml','help']
+arglist = ['corpus=','cached-corp=','ftree=','file=','xhtml','metrics=','help']
 # parse the command line call
 try:
-    opts, args = getopt.getopt(sys.argv[1:],"d:c:t:f:x:h",arglist)
+    opts, args = getopt.getopt(sys.argv[1:],"d:c:b:t:f:x:e:h",arglist)
 except:
     sys.stderr.write("\nInvalid commandline argument(s).")
     opts = [["-h", "-"]]
@@ -82,6 +97,8 @@ for option, specification in opts:
         destination_dir = specification
     elif option in ("-c", "--corpus"):
         input_corpus = specification
+    elif option in ("-b", "--cached-corp"):
+        cached_corpus = specification
     elif option in ("-t", "--ftree"):
         filtertries = specification
     elif option in ("-f", "--file"):
@@ -90,6 +107,8 @@ for option, specification in opts:
         usedeppos = 1
     elif option in ("-x", "--xhtml"):
         xhtml = 1
+    elif option in ("-e", "--metrics"):
+        metrics_file = specification
     elif option in ("-h", "--help"):
         print """
 
@@ -98,11 +117,13 @@ Code to calculate all variation n-grams for dependency corpora.
 Options:
 
 -c/--corpus        specify the (absolute) corpus file name
+-b/--cached-corp   specify the (absolute) cached corpus file name
 -t/--ftree         specify the (absolute) filter tries file name
 -d/--directory     specify the (absolute) output directory name
 -f/--file          specify the base name for the output files
 -p/--deppos        use part-of-speech for dependent word
 -x/--xhtml         produce filtered xhtml output
+-e/--metrics       specify a file to write the metrics of each n-gram length to
 -h/--help          display this help menu
 """
         sys.exit()
@@ -225,12 +246,51 @@ def get_oneline_info(oneline):
 
     return cat,binary,nbinary,words
 
+# the columns of the corpus cache: the word, the POS tag, the dependency
+# relation, and the word shown in the context of the xhtml output
+
+WORD = 0
+POS = 1
+REL = 2
+FORM = 3
+
+# the function 'get_corpus_position' returns the position in the corpus
+# cache (counting from 0) of the token with the corpus id sNN_NN, or -1
+# if there is no such token
+
+def get_corpus_position(id):
+    sarray = id.split('_')
+    if not SentenceIndex.has_key(sarray[0]):
+        return -1
+    sentence = SentenceIndex[sarray[0]]
+    position = Corpus.sentence_starts[sentence] + int(sarray[1]) - 1
+    if position < Corpus.sentence_starts[sentence] or \
+       position >= Corpus.sentence_starts[sentence+1]:
+        return -1
+    return position
+
+def has_corpus_id(id):
+    return get_corpus_position(id) >= 0
+
+# the function 'get_corpus_field' returns the column of the token with
+# the corpus id sNN_NN
+
+def get_corpus_field(id, column):
+    position = get_corpus_position(id)
+    if position < 0:
+        raise KeyError(id)
+    return Corpus.field(position, column)
+
 def get_corpus_word(corppos):
-    corpline = Corpus[corppos]
-    corpspl = corpline.split('\t')
-    this_word = corpspl.pop()
+    return get_corpus_field(corppos, WORD)
+
+# the function 'ends_sentence' returns whether the token with the corpus
+# id sNN_NN is followed by the first token of another sentence
 
-    return this_word
+def ends_sentence(id):
+    position = get_corpus_position(id)
+    return position >= 0 and position + 1 < len(Corpus) and \
+           Corpus.starts_sentence(position + 1)
 
 def get_sent_num(id):
     sarray = id.split('_')
@@ -312,7 +372,7 @@ def nilfilter(binary, position):
 	        right = 1
 
         right_position = id_modify(position, len(binary) - 1)
-	if onepos == len(binary) - 1 and Boundaries.has_key(right_position):
+	if onepos == len(binary) - 1 and ends_sentence(right_position):
 	    right = 1
 
         if left == 1 and right == 1:
@@ -355,7 +415,7 @@ def nonfringe(binary, position):
 	        right = 1
 
 	right_position = id_modify(position, len(binary) - 1)
-	if onepos == len(binary) - 1 and Boundaries.has_key(right_position):
+	if onepos == len(binary) - 1 and ends_sentence(right_position):
 	    right = 1
 
         # this 1 isn't good, so is fringe
@@ -372,7 +432,7 @@ def countall(hash):
 
     return count
 
-def print_d(D,filename):
+def print_d(D,filename,Output):
     # --------
     # VERIFICATION
     # check to see if there are variations before opening output file
@@ -432,14 +492,16 @@ def print_d(D,filename):
             # delete this subentry
             del D[words][nbinaries]
 
-        # finish the line and print it to the file
+        # finish the line and add it to the sorted output
         if total:
             line = str(total) + "\t" + line
-            file.write(line+'\n')
+            Output.add(total, line)
 
         # delete this entry
         del D[words]
 
+    # write the lines sorted by decreasing count
+    Output.write(file)
     file.close()
     return 1
 
@@ -623,12 +685,12 @@ def add_to_xhtml_output(D,Dpositions,output,n):
 				deppos = index[inst].split('_')[0] + "_" + str(deppos)
 
                                 if usedeppos:
-                                    outputkey = Corpus[str(headpos)] + tokensep + CorpusPOS[str(deppos)]
+                                    outputkey = get_corpus_field(str(headpos), WORD) + tokensep + get_corpus_field(str(deppos), POS)
                                 else:
-                                    outputkey = Corpus[str(headpos)] + tokensep + Corpus[str(deppos)]
+                                    outputkey = get_corpus_field(str(headpos), WORD) + tokensep + get_corpus_field(str(deppos), WORD)
                                 elementkey = cat + tokensep + str(headpos) + tokensep + str(deppos)
 
-                                headrel = CorpusRel[str(headpos)]
+                                headrel = get_corpus_field(str(headpos), REL)
 				rels[headrel] = 1
 
                                 nonfringe_cats[cat] = 1
@@ -642,18 +704,18 @@ def add_to_xhtml_output(D,Dpositions,output,n):
 
 			        for i in range(len(binaries)):
 			            if binaries[i] == "0":
-			                context += CorpusWords[id_modify(index[inst], i)] + " "
+			                context += get_corpus_field(id_modify(index[inst], i), FORM) + " "
 			            elif binaries[i] == "X":
-			                context += '<font color="blue">' + CorpusWords[id_modify(index[inst], i)] + "</font> "
+			                context += '<font color="blue">' + get_corpus_field(id_modify(index[inst], i), FORM) + "</font> "
 			            else:
-			                context += '<b><font color="blue">' + CorpusWords[id_modify(index[inst], i)] + "/" + CorpusPOS[id_modify(index[inst], i)] + "</font></b> "
+			                context += '<b><font color="blue">' + get_corpus_field(id_modify(index[inst], i), FORM) + "/" + get_corpus_field(id_modify(index[inst], i), POS) + "</font></b> "
 
 
                                     if binaries[i] == "X" or binaries[i] == "1":
                                         if usedeppos and i == deppos:
-                                            ngram += CorpusPOS[id_modify(index[inst], i)] + " "
+                                            ngram += get_corpus_field(id_modify(index[inst], i), POS) + " "
                                         else:
-                                            ngram += CorpusWords[id_modify(index[inst], i)] + " "
+                                            ngram += get_corpus_field(id_modify(index[inst], i), FORM) + " "
 
 
                                 tempadd.append([outputkey,elementkey,ngram,context])
@@ -750,7 +812,7 @@ def get_new_ngram(words,cat,binary,nbinary,start):
     # corpus
     
     # new right position
-    if Corpus.has_key(id_modify(start, len(binary))):
+    if has_corpus_id(id_modify(start, len(binary))):
 
         # get the position of the word to be added and eventually
         # insert the word into the wordlist
@@ -819,65 +881,91 @@ sys.stdout.flush()
 
 # --------------------------------------------------------
 # STEP 1:  Read in corpus, finding sentence boundaries if needed
-# If either the cached corpus or cached boundaries file does not exist, start
-# from scratch reading in the input_corpus
+# If the cached corpus does not exist, start from scratch reading in the
+# input_corpus
 
-# set the corpus counter to be 1, the start of the corpus
-i = 1
+if not cached_corpus or not os.path.exists(cached_corpus):
+    try:
+        corpus_file = open(input_corpus,'r')
+    except:
+        sys.stderr.write("\n\nError: Unable to open corpus file " + input_corpus + "\n")
+        sys.exit(1)
 
-# read in the corpus, word by word with no annotation and keep track of 
-# sentence boundaries
-try:
-    corpus_file = open(input_corpus,'r')
-except:
-    sys.stderr.write("\n\nError: Unable to open corpus file " + input_corpus + "\n")
-    sys.exit(1)
+    # without a cached_corpus, the corpus is cached in a temporary file,
+    # which is removed as soon as it is opened
+    if cached_corpus:
+        cache_filename = cached_corpus
+    else:
+        (fd, cache_filename) = tempfile.mkstemp(".cache")
+        os.close(fd)
 
-Corpus = bsddb.btopen(None)
-CorpusPOS = bsddb.btopen(None)
-CorpusRel = bsddb.btopen(None)
-CorpusWords = bsddb.btopen(None)
-Boundaries = {}
+    try:
+        Writer = CorpusCacheWriter(cache_filename, 4)
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to open cached_corpus file for writing\n" + cache_filename + "\n")
+        sys.exit(1)
 
-# keep track of previous sentence boundary for all tokens
-prevBoundary = 1
+    prevsentid = None
 
-line = corpus_file.readline()
-line = line.strip()
-spl = line.split('\t')
-previd = spl[0]
-prevsentid = int(previd.split("_")[0][1:])
+    # read in the corpus, word by word, and keep track of sentence
+    # boundaries
+    line = corpus_file.readline()
+    while line:
+        # get the word at each position
+        line = line.strip()
+        spl = line.split('\t')
 
-while line:
-    # get the word at each position
-    line = line.strip()
-    spl = line.split('\t')
+        # start a new sentence in the cache, with the sNN from the
+        # corpus id sNN_NN as its id
+        sentid = int(spl[0].split("_")[0][1:])
+        if prevsentid != sentid:
+            Writer.new_sentence(spl[0].split("_")[0])
+        prevsentid = sentid
 
-    # add the word to the Corpus dictionary
-    id = spl[0]
-    Corpus[id] = spl[1]
-    CorpusPOS[id] = spl[2]
-    CorpusRel[id] = spl[3]
-    CorpusWords[id] = spl[4]
+        # add the word, POS tag, dependency relation, and surface word
+        Writer.append(spl[1], spl[2], spl[3], spl[4])
 
-    sentid = int(id.split("_")[0][1:])
-    if prevsentid != sentid:
-        Boundaries[previd] = 1
+        line = corpus_file.readline()
 
-    prevsentid = sentid
-    previd = id
+    corpus_file.close()
+    Writer.close()
+    if cached_corpus:
+        print "Corpus read in and cached."
+    else:
+        print "Corpus read in."
+    sys.stdout.flush()
+else:
+    cache_filename = cached_corpus
+    print "Cached corpus read in."
+    sys.stdout.flush()
 
-    line = corpus_file.readline()
+try:
+    Corpus = CorpusCache(cache_filename)
+except IOError:
+    sys.stderr.write("\n\nError: Unable to read cached_corpus file " + cache_filename + "\n")
+    sys.exit(1)
+if not cached_corpus:
+    os.remove(cache_filename)
+if len(Corpus.columns) < 4:
+    sys.stderr.write("\n\nError: The cached_corpus file " + cache_filename + " was not created by decca-dep.py\n")
+    sys.exit(1)
 
-corpus_file.close()
-print "Corpus read in."
-sys.stdout.flush()
+# SentenceIndex holds the number of every sentence id in the cache
+SentenceIndex = {}
+for sentence in range(Corpus.sentences):
+    SentenceIndex[Corpus.sentence_id(sentence)] = sentence
 
 # set corplength to be the length of the corpus (plus 1)
-corplength = len(Corpus.keys()) + 1
+corplength = len(Corpus) + 1
 
 topdestination_dir = destination_dir
 
+try:
+    metrics = Metrics(metrics_file, script="decca-dep.py")
+except IOError:
+    sys.stderr.write("\n\nError: Unable to open metrics file " + metrics_file + "\n")
+    sys.exit(1)
+
 output = {}
 
 for unit in range(2, 3):
@@ -898,6 +986,9 @@ for unit in range(2, 3):
     print n_str+" grams:",
     sys.stdout.flush()
 
+    # the base case is expanded from the nonterminals
+    begin = time.time()
+
     # create D, the dictionary of variations
     D = {}
     # create Dpositions to keep track of where each variation appeared in
@@ -934,7 +1025,7 @@ for unit in range(2, 3):
             # nbinary is the coverage of the nucleus within the n-gram
             nbinary = get_small_binary(binary)
 
-	    if filter_punctuation == 0 or (CorpusPOS[index][0] != "Z" and CorpusPOS[id_modify(index, len(binary)-1)][0] != "Z"):
+	    if filter_punctuation == 0 or (get_corpus_field(index, POS)[0] != "Z" and get_corpus_field(id_modify(index, len(binary)-1), POS)[0] != "Z"):
 
                 # the remaining part of the line/spl is the words of the
                 # nonterminal
@@ -945,26 +1036,26 @@ for unit in range(2, 3):
                     spl2 = spl[:]
                     # convert appropriate elements to POS if needed
                     if usedeppos:
-                        spl[0] = "POS-" + CorpusPOS[index]
-                        spl2[1] = "POS-" + CorpusPOS[id_modify(index, len(binary)-1)]
+                        spl[0] = "POS-" + get_corpus_field(index, POS)
+                        spl2[1] = "POS-" + get_corpus_field(id_modify(index, len(binary)-1), POS)
                     else:
-                        spl[0] = "DEP-" + Corpus[index]
-                        spl2[1] = "DEP-" + Corpus[id_modify(index, len(binary)-1)]
+                        spl[0] = "DEP-" + get_corpus_field(index, WORD)
+                        spl2[1] = "DEP-" + get_corpus_field(id_modify(index, len(binary)-1), WORD)
                     cat1 = "NIL-R"
                     span2 = tokensep.join(spl2)
                     cat2 = "NIL-L"
                 # otherwise create category label and convert to POS if needed
                 elif cat[-1] == "L":
                     if usedeppos:
-                        spl[1] = "POS-" + CorpusPOS[id_modify(index, len(binary)-1)]
+                        spl[1] = "POS-" + get_corpus_field(id_modify(index, len(binary)-1), POS)
                     else:
-                        spl[1] = "DEP-" + Corpus[id_modify(index, len(binary)-1)]
+                        spl[1] = "DEP-" + get_corpus_field(id_modify(index, len(binary)-1), WORD)
                     cat1 = cat
                 elif cat[-1] == "R":
                     if usedeppos:
-                        spl[0] = "POS-" + CorpusPOS[index]
+                        spl[0] = "POS-" + get_corpus_field(index, POS)
                     else:
-                        spl[0] = "DEP-" + Corpus[index]
+                        spl[0] = "DEP-" + get_corpus_field(index, WORD)
                     cat1 = cat
 
                 span = tokensep.join(spl)
@@ -998,6 +1089,7 @@ for unit in range(2, 3):
         # get information from Grams and break it down line-by-line (each
         # line corresponds to a new n-gram at that index
         spl = line.split('\n')
+        metrics.add("candidates", len(spl))
 
         # loop through the different n-grams (here: oneline)
         for oneline in spl:
@@ -1022,6 +1114,8 @@ for unit in range(2, 3):
             else:
 	        Dpositions[poskey] = [key];
 
+    metrics.since("expand", begin)
+
     # print a note that the nonterminals have been read in
     print "nonterminals read in,",
     sys.stdout.flush()
@@ -1030,6 +1124,10 @@ for unit in range(2, 3):
 
     # filter out the nonvariations in Grams
 
+    # varying counts the n-grams kept in Grams
+    begin = time.time()
+    varying = 0
+
     # get the first key and cycle through all the keys in Grams
     gramskeys = Grams.keys()
     for key in gramskeys:
@@ -1059,10 +1157,13 @@ for unit in range(2, 3):
         if new:
             newline = "\n".join(new)
             Grams[oldkey] = newline
+            varying = varying + len(new)
         # if there was no variation, it should be removed from Grams
         else:
             del Grams[oldkey]
 
+    metrics.since("filter", begin)
+
 # --------------------------------------------------------
 # STEP 3: loop over increasing longer n-grams until none found
 
@@ -1082,12 +1183,14 @@ for unit in range(2, 3):
 
     while Grams and variations_found:
         # add results to hash
+        begin = time.time()
 
         if xhtml:
 	    variations_found = add_to_xhtml_output(D,Dpositions,output,n)
 	elif not xhtml:
             filename = destination_dir+n_str
-            variations_found = print_d(D,filename)
+            Output = SortedOutput()
+            variations_found = print_d(D,filename,Output)
 
         # if there were indeed variations, tell the user and
         # proceed with n-gram n+1
@@ -1100,16 +1203,18 @@ for unit in range(2, 3):
 	    if not xhtml:
                 # print out a note to the screen that these n-grams are finished.
                 print "written to file,",
-
-                # sort the text file output using unix sort, 
-	        # output into the file itself
-                commands.getstatusoutput("sort -nr "+filename+" -o "+filename)
-                print "and file sorted."
+                print "and file sorted (%.2fs, peak memory %d kB)." % (Output.sort_time, peak_memory())
 	    else:
 	        print "and written to file."
 
             sys.stdout.flush()
 
+            metrics.add("varying", varying)
+            if not xhtml:
+                metrics.add("sort_time", Output.sort_time)
+            metrics.since("output", begin)
+            metrics.level(n, unit=unit)
+
 
             # Increment n: we are now dealing with the next higher n-gram
             n = n + 1
@@ -1129,6 +1234,10 @@ for unit in range(2, 3):
             print n_str+" grams:",
             sys.stdout.flush()
 
+            # candidates counts the n-grams added to Store
+            begin = time.time()
+            candidates = 0
+
             # Grams holds all the n-1 grams in string form, so we cycle through them.
             for key, line in Grams.iteritems():
                 spl = line.split('\n')
@@ -1179,6 +1288,7 @@ for unit in range(2, 3):
                                 to_add = newline + "\n"
                                 to_add += cat + tokensep + binary + tokensep + nbinary + tokensep + words
                                 Store[start] = to_add
+                                candidates = candidates + 1
 
                                 # add info to dictionary
                                 add_to_d(D,words,nbinary,binary,cat)
@@ -1201,6 +1311,7 @@ for unit in range(2, 3):
                         else:
                             # so, add a line to Store here
                             Store[start] = cat + tokensep + binary + tokensep + nbinary + tokensep + words
+                            candidates = candidates + 1
 
                             # add info to dictionary
                             add_to_d(D,words,nbinary,binary,cat)
@@ -1219,6 +1330,9 @@ for unit in range(2, 3):
             Grams.close()
             Grams = bsddb.btopen(None)
 
+            metrics.add("candidates", candidates)
+            metrics.since("expand", begin)
+
             # print a note to the screen that these n-grams have been indexed.
             print "read in,",
             sys.stdout.flush()
@@ -1226,6 +1340,10 @@ for unit in range(2, 3):
             # -----------------------------
             # FILTER OUT THE NON-VARIATIONS
 
+            # varying counts the n-grams kept in Grams
+            begin = time.time()
+            varying = 0
+
             # loop over the indexed positions in the Store
             for i in Store.keys():
 
@@ -1263,6 +1381,7 @@ for unit in range(2, 3):
                                         gramline += '\n' + oneline
                                     else:
                                         gramline = oneline
+                                    varying = varying + 1
 
                                 # indicate that we have found some variation
                                 # within D[words]
@@ -1288,6 +1407,7 @@ for unit in range(2, 3):
 
             Store.close()
             Store = bsddb.btopen(None)
+            metrics.since("filter", begin)
 
         # end if variations_found
 
@@ -1296,13 +1416,14 @@ for unit in range(2, 3):
     print "and no variations found."
     sys.stdout.flush()
 
+    # the metrics of the first length without variation n-grams
+    metrics.level(n, unit=unit)
+
     # close the Grams file
     Grams.close()
     
 Corpus.close()
-CorpusPOS.close()
-CorpusRel.close()
-CorpusWords.close()
+metrics.close()
 
 if xhtml:
     filename = destination_dir
@@ -13,7 +13,10 @@
 ##  Frequency Distributions
 ##//////////////////////////////////////////////////////
 
-class FreqDist:
+# marks a FreqDist that has not recorded any sample yet
+_NOSAMPLE = object()
+
+class FreqDist(object):
     """
     A frequency distribution for the outcomes of an experiment.  A
     frequency distribution records the number of times each outcome of
@@ -32,13 +35,22 @@ class FreqDist:
         >>> fdist = FreqDist()
         >>> for token in text_token['SUBTOKENS']:
         ...    fdist.inc(token['TEXT'])
+
+    DECCA creates one C{FreqDist} for every distinct n-gram and most
+    of them only ever record a single sample, so the distribution is
+    kept compact: a single sample is stored inline (its count is the
+    total C{N()}) and a dictionary of counts is only created once a
+    second distinct sample is recorded.
     """
+    __slots__ = ('_sample', '_count', '_N')
+
     def __init__(self):
         """
         Construct a new empty, C{FreqDist}.  In particular, the count
         for every sample is zero.
         """
-        self._count = {}
+        self._sample = _NOSAMPLE
+        self._count = None
         self._N = 0
 
     def inc(self, sample, count=1):
@@ -55,9 +67,17 @@ class FreqDist:
                supported sample type.
         """
         if count == 0: return
-        
+
+        if self._count is not None:
+            self._count[sample] = self._count.get(sample,0) + count
+        elif self._sample is _NOSAMPLE or self._sample == sample:
+            self._sample = sample
+        else:
+            # a second distinct sample: move to a dictionary of counts
+            self._count = {self._sample: self._N, sample: count}
+            self._sample = _NOSAMPLE
+
         self._N += count
-        self._count[sample] = self._count.get(sample,0) + count
 
     def N(self):
         """
@@ -69,6 +89,19 @@ class FreqDist:
         """
         return self._N
 
+    def B(self):
+        """
+        @return: The number of sample values (or bins) that have been
+          recorded by this C{FreqDist}, without building the list of
+          C{samples()}.
+        @rtype: C{int}
+        """
+        if self._count is not None:
+            return len(self._count)
+        if self._sample is _NOSAMPLE:
+            return 0
+        return 1
+
     def samples(self):
         """
         @return: A list of all samples that have been recorded as
@@ -76,7 +109,11 @@ class FreqDist:
             to determine the count for each sample.
         @rtype: C{list}
         """
-        return self._count.keys()
+        if self._count is not None:
+            return self._count.keys()
+        if self._sample is _NOSAMPLE:
+            return []
+        return [self._sample]
 
     def count(self, sample):
         """
@@ -91,4 +128,8 @@ class FreqDist:
                should be returned.
         @type sample: any.
         """
-        return self._count.get(sample, 0)
+        if self._count is not None:
+            return self._count.get(sample, 0)
+        if self._sample is not _NOSAMPLE and self._sample == sample:
+            return self._N
+        return 0
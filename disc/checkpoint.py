@@ -0,0 +1,105 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# These are the checkpoints shared by decca-treebank.py and
+# decca-disc.py.  After the output file of an n-gram length has been
+# written, the variation n-grams that survived the filtering (Grams) are
+# all that is needed to go on with the next length, so they are saved
+# to a checkpoint file together with n.  A run that is interrupted can
+# then be resumed at the next length instead of starting over.
+#
+# A checkpoint file holds two marshaled objects: a header with the
+# magic string, n, and the settings of the run, and the state (Grams in
+# the form the script gives it, or None once the run has finished).  The
+# file is written under a temporary name first and then renamed, so an
+# interruption while saving leaves the previous checkpoint in place.
+
+import os
+import marshal
+
+magic = "DECCACP1"
+
+class Checkpoint:
+    """
+    The checkpoint file of one run (one unit length) in a checkpoint
+    directory.  The settings of the run are saved with every
+    checkpoint, and a checkpoint saved with other settings is not
+    loaded.
+
+        >>> checkpoint = Checkpoint("/tmp/checkpoints", "unit03", unit=3)
+        >>> checkpoint.save(4, Grams)
+        >>> (n, Grams) = checkpoint.load()
+    """
+    def __init__(self, directory, name, **settings):
+        """
+        Construct a new C{Checkpoint} for the file C{name} in
+        C{directory}, which is created if it does not exist.
+
+        @param settings: The settings of the run, such as the unit
+            length and the input files.
+        @raise IOError: If the directory cannot be created.
+        """
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError, e:
+                raise IOError(str(e))
+        self._filename = os.path.join(directory, name)
+        self._settings = settings
+
+    def save(self, n, state):
+        """
+        Save the state of the run after the n-gram length C{n} (counting
+        the unit as 1).
+
+        @param state: The state, made up of the types that C{marshal}
+            can write (numbers, strings, tuples, lists, and
+            dictionaries), or C{None} when the run has finished.
+        @rtype: None
+        @raise IOError: If the file cannot be written.
+        """
+        file = open(self._filename + ".tmp", 'wb')
+        marshal.dump({'magic': magic, 'n': n, 'settings': self._settings}, file)
+        marshal.dump(state, file)
+        file.close()
+        os.rename(self._filename + ".tmp", self._filename)
+
+    def finish(self, n):
+        """
+        Mark the run as finished after the n-gram length C{n}, which
+        had no variation n-grams.
+
+        @rtype: None
+        """
+        self.save(n, None)
+
+    def load(self):
+        """
+        @return: A pair (n, state) with the n-gram length and the state
+            of the last checkpoint, where the state is C{None} if the
+            run has finished, or C{None} if there is no checkpoint.
+        @rtype: C{tuple}
+        @raise IOError: If the file cannot be read or was saved with
+            other settings.
+        """
+        if not os.path.exists(self._filename):
+            return None
+        file = open(self._filename, 'rb')
+        try:
+            try:
+                header = marshal.load(file)
+                if not isinstance(header, dict) or header.get('magic') != magic:
+                    raise IOError("Not a checkpoint: " + self._filename)
+                if header['settings'] != self._settings:
+                    raise IOError("Checkpoint " + self._filename +
+                                  " was saved with other settings")
+                state = marshal.load(file)
+            except (EOFError, ValueError, TypeError):
+                raise IOError("Not a checkpoint: " + self._filename)
+        finally:
+            file.close()
+        return header['n'], state
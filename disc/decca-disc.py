@@ -39,8 +39,7 @@ charencoding = "iso-8859-1"
 # (Files specified on command line will override these settings.)
 
 input_corpus = "/home/user/research/decca/disc/corpus.txt"
-cached_corpus = "/home/user/research/decca/disc/corpus.bsddb"
-cached_boundaries = "/home/user/research/decca/disc/corpus.cb.bsddb"
+cached_corpus = "/home/user/research/decca/disc/corpus.cache"
 filtertries = "/home/user/research/decca/disc/filtertries.txt"
 
 destination_dir = "/home/user/research/decca/disc/output"
@@ -55,6 +54,25 @@ unit = 2
 
 xhtml = 1
 
+# Optional: file for the metrics of each n-gram length
+# [If a metrics file is given, one line with a JSON object is written to
+#  it for every n-gram length, with the number of n-grams generated and
+#  kept as variation n-grams, the time spent on expanding, filtering,
+#  and writing them, and the peak memory.  This requires python >= 2.6
+#  for the json module.]
+
+metrics_file = ""
+
+# Optional: directory for checkpoints
+# [If a checkpoint directory is given, the variation n-grams of each
+#  length are saved to it once the length has been written to its
+#  output file.  An interrupted run can then be resumed with resume = 1
+#  (or -s/--resume) and the same settings, and goes on with the next
+#  length instead of starting over.]
+
+checkpoint_dir = ""
+resume = 0
+
 # --------------------------------------------------------
 # END USER SETTINGS
 # --------------------------------------------------------
@@ -63,16 +81,23 @@ xhtml = 1
 import getopt
 import sys
 import os
+import time
 import commands
 
 # import extra modules
 import bsddb
 from nltk_freqdist import *
+from corpuscache import CorpusCache, CorpusCacheWriter
+from metrics import Metrics
+from checkpoint import Checkpoint
 
 # specify the long options in arglist
-arglist = ['unit=','corpus=','cached-corp=','cached-bound=','directory=','ftree=','file=','xhtml','help'] 
+arglist = ['unit=','corpus=','cached-corp=','directory=','ftree=','file=','xhtml','metrics=','checkpoint=','resume','prepare','help'] 
 # parse the command line call
-opts, args = getopt.getopt(sys.argv[1:],"u:c:b:a:t:d:f:x:h",arglist)
+opts, args = getopt.getopt(sys.argv[1:],"u:c:b:t:d:f:x:e:k:sph",arglist)
+
+# with prepare = 1 (-p/--prepare), only the cached corpus is created
+prepare = 0
 
 # Go through the command line options and see if the user specified a
 # directory or a corpus, or asked for help
@@ -87,8 +112,6 @@ for option, specification in opts:
         input_corpus = specification
     elif option in ("-b", "--cached-corp"):
         cached_corpus = specification;
-    elif option in ("-a", "--cached-bound"):
-        cached_boundaries = specification
     elif option in ("-t", "--ftree"):
         filtertries = specification
     elif option in ("-x", "--xhtml"):
@@ -99,6 +122,14 @@ for option, specification in opts:
 	xhtml = newxhtml
     elif option in ("-f", "--file"):
         file_name = specification
+    elif option in ("-e", "--metrics"):
+        metrics_file = specification
+    elif option in ("-k", "--checkpoint"):
+        checkpoint_dir = specification
+    elif option in ("-s", "--resume"):
+        resume = 1
+    elif option in ("-p", "--prepare"):
+        prepare = 1
     elif option in ("-h", "--help"):
         print """
 
@@ -114,11 +145,14 @@ Options:
 -u/--unit          specify the unit length
 -c/--corpus        specify the (absolute) corpus file name
 -b/--cached-corp   specify the (absolute) cached corpus file name
--a/--cached-bound  specify the (absolute) cached boundaries file name
 -t/--ftree         specify the (absolute) filter tries file name
 -d/--directory     specify the (absolute) output directory name
 -f/--file          specify the base name for the output files
 -x/--xhtml         toggle XHTML output
+-e/--metrics       specify a file to write the metrics of each n-gram length to
+-k/--checkpoint    specify a directory to save a checkpoint to after each n-gram length
+-s/--resume        resume from the checkpoint in the checkpoint directory
+-p/--prepare       only create the cached corpus, then exit
 -h/--help          display this help menu
 """
                
@@ -147,7 +181,7 @@ if destination_dir[len(destination_dir)-1] != "/":
 if not os.path.exists(destination_dir):
     print commands.getoutput("mkdir " + destination_dir)
     print "Creating directory " + destination_dir
-if not os.path.exists(destination_dir + unit_str):
+if not prepare and not os.path.exists(destination_dir + unit_str):
     print commands.getoutput("mkdir " + destination_dir + unit_str)
     print "Creating directory " + destination_dir + unit_str
 
@@ -260,11 +294,13 @@ def get_oneline_info(oneline):
     return cat,binary,nbinary,words
 
 def get_corpus_word(corppos):
-    corpline = Corpus[corppos]
-    corpspl = corpline.split('\t')
-    this_word = corpspl.pop()
+    return Corpus.word(int(corppos) - 1)
+
+# the function 'starts_sentence' returns whether the token at the
+# (1-based) corpus position is the first token of a sentence
 
-    return this_word
+def starts_sentence(corppos):
+    return Corpus.starts_sentence(int(corppos) - 1)
 
 def get_sent_num(sentindex):
     sarray = sentindex.split('_')
@@ -323,7 +359,8 @@ def get_n_str(n):
     return n_str
 
 def print_output(Output, filename):
-    if os.path.exists(filename):
+    # when resuming, the file may have been left by the interrupted run
+    if os.path.exists(filename) and not resume:
         sys.stderr.write("\n\nError: Output file " + filename + " already exists.\n")
         sys.exit(1)
 
@@ -410,17 +447,17 @@ def gen_output(D, Dpositions):
 			index = Dpositions[poskey]
 			for inst in range(count):
 			    position = int(index[inst])
-			    sentid = SentIDIndex[position]
+			    sentid = Corpus.sentence_id(Corpus.sentence(position - 1))
 			    context = sentid + ": "
 
-			    for i in range(int(index[inst]), int(index[inst]) + len(binaries)):
-			        reli = i - int(index[inst])
+			    contextwords = Corpus.word_list(position - 1, position - 1 + len(binaries))
+			    for reli in range(len(binaries)):
 				if binaries[reli] == "0":
-				    context += Corpus[str(i)] + " "
+				    context += contextwords[reli] + " "
 				elif binaries[reli] == "X":
-				    context += '<font color="green">' + Corpus[str(i)] + "</font> "
+				    context += '<font color="green">' + contextwords[reli] + "</font> "
 				else:
-				    context += '<font color="green"><u>' + Corpus[str(i)] + "</u></font> "
+				    context += '<font color="green"><u>' + contextwords[reli] + "</u></font> "
 			    templine += "<li>" + context + "</li>\n"
 				
 			currentlines.append("<li>" + str(this_count) + ":" + cat + " <ul>" + templine + "</ul></li>")
@@ -479,7 +516,7 @@ def get_new_ngram(words,cat,binary,nbinary,start):
 
     # make sure that moving one position to the left is still within
     # the corpus
-    if int(start) > 1 and (not Boundaries.has_key(str(start))):
+    if int(start) > 1 and (not starts_sentence(start)):
 
         # get the position of the word to be added and eventually
         # insert the word into the wordlist
@@ -507,7 +544,7 @@ def get_new_ngram(words,cat,binary,nbinary,start):
 
     # make sure that adding a word to the right will not exceed the
     # corpus
-    if (int(start)+len(binary)) < corplength and (not Boundaries.has_key(str(int(start)+len(binary)))):
+    if (int(start)+len(binary)) < corplength and (not starts_sentence(int(start)+len(binary))):
 
         # get the position of the word to be added and eventually
         # insert the word into the wordlist
@@ -580,15 +617,12 @@ sys.stdout.flush()
 
 # --------------------------------------------------------
 # STEP 1:  Read in corpus, finding sentence boundaries if needed
-# If either the cached corpus or cached boundaries file does not exist, start
-# from scratch reading in the input_corpus
-
-# set the corpus counter to be 1, the start of the corpus
-i = 1
+# If the cached corpus does not exist, start from scratch reading in the
+# input_corpus
 
 # read in the corpus, word by word with no annotation and keep track of 
 # sentence boundaries
-if not os.path.exists(cached_corpus) or not os.path.exists(cached_boundaries):
+if not os.path.exists(cached_corpus):
     try:
         corpus_file = open(input_corpus,'r')
     except:
@@ -596,17 +630,11 @@ if not os.path.exists(cached_corpus) or not os.path.exists(cached_boundaries):
         sys.exit(1)
 
     try:
-        TempCorpus = bsddb.btopen(cached_corpus, 'n')
-    except:
+        Writer = CorpusCacheWriter(cached_corpus, 2)
+    except IOError:
         sys.stderr.write("\n\nError: Unable to open cached_corpus file for writing\n" + cached_corpus + "\n")
 	sys.exit(1)
 
-    try:
-        Boundaries = bsddb.btopen(cached_boundaries, 'n')
-    except:
-        sys.stderr.write("\n\nError: Unable to open cached_boundaries file for writing\n" + cached_boundaries + "\n")
-	sys.exit(1)
-
     prev_sentindex = ""
 
     line = corpus_file.readline()
@@ -616,183 +644,231 @@ if not os.path.exists(cached_corpus) or not os.path.exists(cached_boundaries):
         if line:
             spl = line.split('\t')
 
-            # add the word to the Corpus dictionary
-            word = spl[1]
-	    # extract sNN from corpus id sNN_NN
-	    pos = spl[0].split("_")[0]
-            TempCorpus[str(i)] = pos + "\t" + word
-
-	    # find sentence boundaries and store in Boundaries
+	    # find sentence boundaries and start a new sentence in the
+	    # cache, with the sNN from the corpus id sNN_NN as its id
 	    sentindex = get_sent_num(spl[0])
 	    if sentindex != prev_sentindex:
 	        prev_sentindex = sentindex
-	        Boundaries[str(i)] = "1"
-    
-            # iterate i and get the next line
-            i = i + 1
+	        Writer.new_sentence(spl[0].split("_")[0])
+
+            # add the word to the cache
+            Writer.append(spl[1], spl[2])
         line = corpus_file.readline()
 
     corpus_file.close()
+    Writer.close()
     print "Corpus read in and cached."
     sys.stdout.flush()
 else:
-    TempCorpus = bsddb.btopen(cached_corpus)
-    Boundaries = bsddb.btopen(cached_boundaries)
     print "Cached corpus read in."
     sys.stdout.flush()
 
-# index of sentence IDs for each corpus position
-SentIDIndex = {}
-
-# corpus
-Corpus = bsddb.btopen(None)
+# wrapper.py creates the cache once with -p/--prepare before it runs
+# several unit lengths at the same time, which would otherwise all
+# create it
+if prepare:
+    sys.exit()
 
-for key, line in TempCorpus.iteritems():
-  lineparts = line.split("\t")
-  SentIDIndex[int(key)] = lineparts[0]
-  Corpus[key] = lineparts[1]
-
-TempCorpus.close()
+# the corpus, with the sentence boundaries and the sentence ids, is read
+# from the cache as it is needed
+try:
+    Corpus = CorpusCache(cached_corpus)
+except IOError:
+    sys.stderr.write("\n\nError: Unable to read cached_corpus file " + cached_corpus + "\n")
+    sys.exit(1)
 
 # set corplength to be the length of the corpus (plus 1)
-corplength = len(Corpus.keys()) + 1
+corplength = len(Corpus) + 1
 
 # --------------------------------------------------------
 # STEP 2: Read in nonterminals and filtertries which match non-terminals
 # and process base case where n = unit length
 
-# tell the user we're starting to work on this n
-n_str = get_n_str(n+unit-1)
-print n_str+" grams:",
-sys.stdout.flush()
+try:
+    metrics = Metrics(metrics_file, append=resume, script="decca-disc.py", unit=unit)
+except IOError:
+    sys.stderr.write("\n\nError: Unable to open metrics file " + metrics_file + "\n")
+    sys.exit(1)
+
+# the checkpoint of this run, and what it saved when resuming
+checkpoint = None
+saved = None
+if checkpoint_dir:
+    try:
+        checkpoint = Checkpoint(checkpoint_dir, "unit" + unit_str, unit=unit,
+                                corpus=cached_corpus, filtertries=filtertries,
+                                prefix=destination_dir, xhtml=xhtml)
+        if resume:
+            saved = checkpoint.load()
+    except IOError, e:
+        sys.stderr.write("\n\nError: Unable to use checkpoint: " + str(e) + "\n")
+        sys.exit(1)
+elif resume:
+    sys.stderr.write("\n\nError: A checkpoint directory is needed to resume.\n")
+    sys.exit(1)
+
+if saved is not None and saved[1] is None:
+    print "Already finished according to the checkpoint."
+    sys.exit()
+
+# the base case is skipped when resuming from a checkpoint, which holds
+# the variation n-grams (Grams) of the last length that was written
+if saved is None:
+    # tell the user we're starting to work on this n
+    n_str = get_n_str(n+unit-1)
+    print n_str+" grams:",
+    sys.stdout.flush()
+
+    # the base case is expanded from the nonterminals
+    begin = time.time()
 
-# create D, the dictionary of variations
-D = {}
+    # create D, the dictionary of variations
+    D = {}
 
-# create Dpositions to keep track of where each variation appeared in the
-# corpus
-Dpositions = {}
+    # create Dpositions to keep track of where each variation appeared in the
+    # corpus
+    Dpositions = {}
 
-# set Grams to be an empty dictionary
-Grams = bsddb.btopen(None)
+    # set Grams to be an empty dictionary
+    Grams = bsddb.btopen(None)
 
-# open up the file which contains all the nonterminal stretches of
-# text and stretches of text which are string-identical
+    # open up the file which contains all the nonterminal stretches of
+    # text and stretches of text which are string-identical
 
-try:
-    nonterminals = open(filtertries,'r')
-except:
-    sys.stderr.write("\n\nError: Unable to open filtertries file \n" + filtertries + "\n")
-
-line = nonterminals.readline()
-
-# loop until there are no more nonterminal lines
-
-while line:
-    line = line.strip()
-    spl = line.split('\t')
-
-    # we only want to deal with windows of unit length (unit+3 because
-    # of the index, cat, and binary labels)
-    if (len(spl) == unit + 3):
-        # get the index, cat, and binary labels from the line
-        index = spl.pop(0)
-        cat = spl.pop(0)
-        binary = spl.pop(0)
-        # nbinary is the coverage of the nucleus within the n-gram
-        nbinary = get_small_binary(binary)
-
-        # the remaining part of the line/spl is the words of the
-        # nonterminal
-        span = tokensep.join(spl)
-
-        # Grams will be in the form:
-        # cat1::binary1::nbinary1::span1 \n ... catN::binaryN::nbinaryN::spanN
-
-        # for the base case, all nbinary value for the unigrams are
-        # composed of 1's and are equal to the length of the current
-        # unit
-
-        # add this information to Grams: either by creating a new
-        # entry for this index, or by adding a new line of information
-        if Grams.has_key(index):
-            Grams[index] += "\n" + cat + tokensep + binary + tokensep + nbinary + tokensep + span
-        else:
-            Grams[index] = cat + tokensep + binary + tokensep + nbinary + tokensep + span
+    try:
+        nonterminals = open(filtertries,'r')
+    except:
+        sys.stderr.write("\n\nError: Unable to open filtertries file \n" + filtertries + "\n")
 
-    # read the next line
     line = nonterminals.readline()
 
-# we now loop over Grams to store the n-grams in a dictionary (D),
-# which will be used to keep track of varying n-grams
+    # loop until there are no more nonterminal lines
 
-for index, line in Grams.iteritems():
+    while line:
+        line = line.strip()
+        spl = line.split('\t')
 
-    # get information from Grams and break it down line-by-line (each
-    # line corresponds to a new n-gram at that index
-    spl = line.split('\n')
+        # we only want to deal with windows of unit length (unit+3 because
+        # of the index, cat, and binary labels)
+        if (len(spl) == unit + 3):
+            # get the index, cat, and binary labels from the line
+            index = spl.pop(0)
+            cat = spl.pop(0)
+            binary = spl.pop(0)
+            # nbinary is the coverage of the nucleus within the n-gram
+            nbinary = get_small_binary(binary)
 
-    # loop through the different n-grams (here: oneline)
-    for oneline in spl:
+            # the remaining part of the line/spl is the words of the
+            # nonterminal
+            span = tokensep.join(spl)
 
-        # get all relevant info from this line
-        cat,binary,nbinary,words = get_oneline_info(oneline)
+            # Grams will be in the form:
+            # cat1::binary1::nbinary1::span1 \n ... catN::binaryN::nbinaryN::spanN
 
-        # D will be in the form:
-        # D[words] = {offset:<FreqDist of cats>, ...}
+            # for the base case, all nbinary value for the unigrams are
+            # composed of 1's and are equal to the length of the current
+            # unit
 
-        # increment the cat value for the words and for this nbinary
-        # [note that in the base case all nbinary values are
-        # identical since every word in the n-gram is in the nucleus]
+            # add this information to Grams: either by creating a new
+            # entry for this index, or by adding a new line of information
+            if Grams.has_key(index):
+                Grams[index] += "\n" + cat + tokensep + binary + tokensep + nbinary + tokensep + span
+            else:
+                Grams[index] = cat + tokensep + binary + tokensep + nbinary + tokensep + span
 
-        # add info to dictionary
-        add_to_d(D,words,nbinary,binary,cat)
+        # read the next line
+        line = nonterminals.readline()
 
-        # keep track of corpus position for this line
-	poskey = words + tokensep + get_nucleus(words, nbinary) + tokensep + binary + tokensep + cat
-        if Dpositions.has_key(poskey):
-	    Dpositions[poskey].append(index)
-	else:
-	    Dpositions[poskey] = [index]
-        
-# print a note that the nonterminals have been read in
-print "nonterminals read in,",
-sys.stdout.flush()
+    # we now loop over Grams to store the n-grams in a dictionary (D),
+    # which will be used to keep track of varying n-grams
 
-# --------------------------------------------------------
+    for index, line in Grams.iteritems():
 
-# filter out the nonvariations in Grams
+        # get information from Grams and break it down line-by-line (each
+        # line corresponds to a new n-gram at that index
+        spl = line.split('\n')
 
-# get the first key and cycle through all the keys in Grams
-for key in Grams.keys():
-    line = Grams[key]
+        metrics.add("candidates", len(spl))
 
-    # get the information for all n-grams which start at this
-    # key/index
-    spl = line.split('\n')
+        # loop through the different n-grams (here: oneline)
+        for oneline in spl:
 
-    # new will hold all the n-grams which have variation
-    new = []
-    # loop through all the n-grams/onelines at this position
-    for oneline in spl:
+            # get all relevant info from this line
+            cat,binary,nbinary,words = get_oneline_info(oneline)
 
-        # get all relevant info from this line
-        cat,binary,nbinary,words = get_oneline_info(oneline)
+            # D will be in the form:
+            # D[words] = {offset:<FreqDist of cats>, ...}
 
-        nucleus = get_nucleus(words,nbinary)
+            # increment the cat value for the words and for this nbinary
+            # [note that in the base case all nbinary values are
+            # identical since every word in the n-gram is in the nucleus]
 
-        # if there is variation (samples>1), add this n-gram to new
-        if D.has_key(words) and len(D[words][nucleus]) > 1:
-            new.append(oneline)
+            # add info to dictionary
+            add_to_d(D,words,nbinary,binary,cat)
 
-    # if there was at least one n-gram which varied, new will be
-    # non-empty, so add it back to Grams
-    if new:
-        newline = "\n".join(new)
-        Grams[key] = newline
-    # if there was no variation, it should be removed from Grams
-    else:
-        del Grams[key]
+            # keep track of corpus position for this line
+            poskey = words + tokensep + get_nucleus(words, nbinary) + tokensep + binary + tokensep + cat
+            if Dpositions.has_key(poskey):
+                Dpositions[poskey].append(index)
+            else:
+                Dpositions[poskey] = [index]
+
+    metrics.since("expand", begin)
+
+    # print a note that the nonterminals have been read in
+    print "nonterminals read in,",
+    sys.stdout.flush()
+
+    # --------------------------------------------------------
+
+    # filter out the nonvariations in Grams
+
+    # varying counts the n-grams kept in Grams
+    begin = time.time()
+    varying = 0
+
+    # get the first key and cycle through all the keys in Grams
+    for key in Grams.keys():
+        line = Grams[key]
+
+        # get the information for all n-grams which start at this
+        # key/index
+        spl = line.split('\n')
+
+        # new will hold all the n-grams which have variation
+        new = []
+        # loop through all the n-grams/onelines at this position
+        for oneline in spl:
+
+            # get all relevant info from this line
+            cat,binary,nbinary,words = get_oneline_info(oneline)
+
+            nucleus = get_nucleus(words,nbinary)
+
+            # if there is variation (samples>1), add this n-gram to new
+            if D.has_key(words) and len(D[words][nucleus]) > 1:
+                new.append(oneline)
+
+        # if there was at least one n-gram which varied, new will be
+        # non-empty, so add it back to Grams
+        if new:
+            newline = "\n".join(new)
+            Grams[key] = newline
+            varying = varying + len(new)
+        # if there was no variation, it should be removed from Grams
+        else:
+            del Grams[key]
+
+    metrics.since("filter", begin)
+else:
+    (n, state) = saved
+    Grams = bsddb.btopen(None)
+    for (index, line) in state:
+        Grams[index] = line
+    del state
+    n_str = get_n_str(n+unit-1)
+    print "Resuming after the " + n_str + " grams from the checkpoint."
+    sys.stdout.flush()
 
 # --------------------------------------------------------
 # STEP 3: loop over increasing longer n-grams until none found
@@ -812,24 +888,32 @@ for key in Grams.keys():
 
 variations_found = 1
 
+# the output of the length in the checkpoint has already been written
+resumed = saved is not None
+saved = None
+
 while Grams and variations_found:
-    # prepare to print to file
-    filename = destination_dir+n_str
+    written = resumed
+    resumed = 0
+    if not written:
+        # prepare to print to file
+        begin = time.time()
+        filename = destination_dir+n_str
 
-    (variations_found, Output) = gen_output(D, Dpositions)
+        (variations_found, Output) = gen_output(D, Dpositions)
 
     # if there were indeed variations, tell the user and
     # proceed with n-gram n+1
     # (otherwise, the rest of loop is skipped and it exits)
-    if variations_found:
+    if variations_found and not written:
         # print a message that the variations have been found
         print "variations found,",
         sys.stdout.flush()
 
-	if xhtml:
-	  filename = filename + ".html"
+        if xhtml:
+            filename = filename + ".html"
 
-	print_output(Output, filename)
+        print_output(Output, filename)
 
         # print out a note to the screen that these n-grams are finished.
         print "written to file,",
@@ -842,6 +926,20 @@ while Grams and variations_found:
 
         sys.stdout.flush()
 
+        metrics.add("varying", varying)
+        metrics.since("output", begin)
+        metrics.level(n+unit-1)
+
+        # save the variation n-grams of this length, which are all that
+        # is needed to go on with the next one
+        if checkpoint is not None:
+            try:
+                checkpoint.save(n, list(Grams.iteritems()))
+            except IOError, e:
+                sys.stderr.write("\n\nError: Unable to save checkpoint: " + str(e) + "\n")
+                sys.exit(1)
+
+    if variations_found:
         # Increment n: we are now dealing with the next higher n-gram
         n = n + 1
 
@@ -862,6 +960,10 @@ while Grams and variations_found:
         print n_str+" grams:",
         sys.stdout.flush()
 
+        # candidates counts the n-grams added to Store
+        begin = time.time()
+        candidates = 0
+
         # Grams holds all the n-1 grams in string form, so we cycle through them.
         for key, line in Grams.iteritems():
 
@@ -913,6 +1015,7 @@ while Grams and variations_found:
                             to_add = newline + "\n"
                             to_add += cat + tokensep + binary + tokensep + nbinary + tokensep + words
                             Store[start] = to_add
+                            candidates = candidates + 1
 
                             # add info to dictionary
                             add_to_d(D,words,nbinary,binary,cat)
@@ -935,6 +1038,7 @@ while Grams and variations_found:
                     else:
                         # so, add a line to Store here
                         Store[start] = cat + tokensep + binary + tokensep + nbinary + tokensep + words
+                        candidates = candidates + 1
 
                         # add info to dictionary
                         add_to_d(D,words,nbinary,binary,cat)
@@ -953,6 +1057,9 @@ while Grams and variations_found:
         Grams.close()
         Grams = bsddb.btopen(None)
 
+        metrics.add("candidates", candidates)
+        metrics.since("expand", begin)
+
         # print a note to the screen that these n-grams have been indexed.
         print "read in,",
         sys.stdout.flush()
@@ -960,6 +1067,10 @@ while Grams and variations_found:
         # ----------------------------
         # FILTER OUT THE NON-VARIATIONS
 
+        # varying counts the n-grams kept in Grams
+        begin = time.time()
+        varying = 0
+
         # loop over the indexed positions in the Store
         for i in Store.keys():
 
@@ -999,6 +1110,7 @@ while Grams and variations_found:
                                     gramline += '\n' + oneline
                                 else:
                                     gramline = oneline
+                                varying = varying + 1
                                 
                             # indicate that we have found some variation
                             # within D[words]
@@ -1024,6 +1136,7 @@ while Grams and variations_found:
 
         Store.close()
         Store = bsddb.btopen(None)
+        metrics.since("filter", begin)
 
     # end if variations_found
 
@@ -1032,6 +1145,17 @@ while Grams and variations_found:
 print "and no variations found."
 sys.stdout.flush()
 
+# the metrics of the first length without variation n-grams
+metrics.level(n+unit-1)
+metrics.close()
+
+if checkpoint is not None:
+    try:
+        checkpoint.finish(n)
+    except IOError, e:
+        sys.stderr.write("\n\nError: Unable to save checkpoint: " + str(e) + "\n")
+        sys.exit(1)
+
 # close Grams
 Grams.close()
 Corpus.close()
@@ -14,42 +14,54 @@
 import sys
 import bsddb
 
+from corpuscache import CorpusCache, is_corpus_cache
+
 try:
     corpus_filename = sys.argv[1]
     tempcons_filename = sys.argv[2]
 except: 
-    print "Usage: " + sys.argv[0] + " input_corpus.txt temp_cons.txt"
+    print "Usage: " + sys.argv[0] + " input_corpus.txt|corpus.cache temp_cons.txt"
     sys.exit()
 
-try:
-    corpus_fileh = open(corpus_filename)
-except:
-    sys.stderr.write("\n\nError: Unable to open corpus file " + corpus_filename + "\n")
-    sys.exit(1)
-
 try:
     tempcons_fileh = open(tempcons_filename)
 except:
     sys.stderr.write("\n\nError: Unable to open temp_cons file " + tempcons_filename + "\n")
     sys.exit(1)
 
-# read in the corpus and set each "s#_#" value to its corresponding global
-# corpus position (token count from beginning of corpus)
-Corpus = bsddb.btopen(None)
+# the corpus may also be given as the corpus cache of decca-disc.py, in
+# which case the global corpus positions are found from the start
+# positions of the sentences
+Cache = None
+if is_corpus_cache(corpus_filename):
+    Cache = CorpusCache(corpus_filename)
+    Sentences = {}
+    for sentence in range(Cache.sentences):
+        Sentences[Cache.sentence_id(sentence)] = Cache.sentence_starts[sentence]
+else:
+    try:
+        corpus_fileh = open(corpus_filename)
+    except:
+        sys.stderr.write("\n\nError: Unable to open corpus file " + corpus_filename + "\n")
+        sys.exit(1)
+
+    # read in the corpus and set each "s#_#" value to its corresponding
+    # global corpus position (token count from beginning of corpus)
+    Corpus = bsddb.btopen(None)
+
+    i = 1
+    line = corpus_fileh.readline()
+    while line:
+        line = line.strip()
+        (id,word,tag) = line.split('\t')
 
-i = 1
-line = corpus_fileh.readline()
-while line:
-    line = line.strip()
-    (id,word,tag) = line.split('\t')
-     
-    Corpus[id] = str(i)
+        Corpus[id] = str(i)
 
-    # iterate i and get the next line
-    i = i + 1
-    line = corpus_fileh.readline()
+        # iterate i and get the next line
+        i = i + 1
+        line = corpus_fileh.readline()
 
-corpus_fileh.close()
+    corpus_fileh.close()
 
 line = tempcons_fileh.readline()
 while line:
@@ -78,7 +90,10 @@ while line:
 
     # look up the global corpus position of the first terminal in this
     # constituent
-    catstart = Corpus["s" + sentnum + "_" + str(orderedtermkeys[0])]
+    if Cache is not None:
+      catstart = str(Sentences["s" + sentnum] + orderedtermkeys[0])
+    else:
+      catstart = Corpus["s" + sentnum + "_" + str(orderedtermkeys[0])]
 
     # the output starts with the global position and the category
     output = catstart + "\t" + cat
@@ -109,5 +124,8 @@ while line:
 
   line = tempcons_fileh.readline()
 
-Corpus.close()
+if Cache is not None:
+  Cache.close()
+else:
+  Corpus.close()
 tempcons_fileh.close()
@@ -13,14 +13,28 @@
 # imports
 
 import sys
-import commands
+import getopt
+import subprocess
+import time
 
 # -----
 
+usage = "Usage: " + sys.argv[0] + " [-j jobs] filtertries.txt"
+
+# jobs is the number of unit lengths that are run at the same time
+jobs = 1
+
 try:
-    filtertries = sys.argv[1]
-except: 
-    print "Usage: " + sys.argv[0] + " filtertries.txt"
+    opts, args = getopt.getopt(sys.argv[1:], "j:h", ['jobs=','help'])
+    for option, specification in opts:
+        if option in ("-j", "--jobs"):
+            jobs = int(specification)
+        elif option in ("-h", "--help"):
+            print usage
+            sys.exit()
+    filtertries = args[0]
+except (getopt.GetoptError, ValueError, IndexError):
+    print usage
     sys.exit()
 
 
@@ -65,8 +79,60 @@ for key in Counts.keys():
     if int(Counts[key]) > 1:
         unitlist.append(int(key))
 
-# sort the keys and reverse so that the largest n-grams are processed first
-unitlist.sort()
+# run the unit lengths with the most constituents first, since they
+# take the longest, so that with more than one job the shorter ones are
+# run alongside them and the total time approaches that of the longest
+# unit length
+order = [(-Counts[unit], unit) for unit in unitlist]
+order.sort()
+unitlist = [unit for (count, unit) in order]
+
+# the function 'run_unit' runs decca-disc.py for one unit length, with
+# its output in the log file unitN.log, and returns the unit length,
+# the exit status, and the time it took
+
+def run_unit(unit):
+    start = time.time()
+    log = open("unit" + str(unit) + ".log", 'w')
+    status = subprocess.call(["./decca-disc.py", "-u", str(unit)],
+                             stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return unit, status, time.time() - start
+
+# the cached corpus is created once before the unit lengths are run
+# (the log is prepare.log), so that the runs only read it
+start = time.time()
+log = open("prepare.log", 'w')
+status = subprocess.call(["./decca-disc.py", "-p"], stdout=log, stderr=subprocess.STDOUT)
+log.close()
+print "cache: exit status %d (%.1fs), see prepare.log" % (status, time.time() - start)
+sys.stdout.flush()
+if status != 0:
+    sys.stderr.write("\n\nError: Unable to create the cached corpus\n")
+    sys.exit(1)
 
-for unit in unitlist:
-    print commands.getoutput("./decca-disc.py -u "+str(unit)) + "\n"
+# with more than one job, the unit lengths are run on a pool of worker
+# processes (this requires python >= 2.6 for the multiprocessing module)
+# and reported as they finish
+pool = None
+if jobs > 1:
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    runs = pool.imap_unordered(run_unit, unitlist)
+else:
+    runs = (run_unit(unit) for unit in unitlist)
+
+failed = 0
+for (unit, status, seconds) in runs:
+    print "unit %d: exit status %d (%.1fs), see unit%d.log" % (unit, status, seconds, unit)
+    sys.stdout.flush()
+    if status != 0:
+        failed = failed + 1
+
+if pool is not None:
+    pool.close()
+    pool.join()
+
+if failed:
+    sys.stderr.write("\n\nError: %d of %d unit lengths failed\n" % (failed, len(unitlist)))
+    sys.exit(1)
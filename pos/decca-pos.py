@@ -43,6 +43,110 @@ input_corpus = "/home/user/research/decca/pos/corpus.tt"
 destination_dir = "/home/user/research/decca/pos/corpus-output/"
 output_file_stem = "ngrams"
 
+# Optional: corpus cache file
+# [If a corpus cache is given and does not exist yet, the corpus is read
+#  in and saved there in a binary format, which is opened without
+#  reading the corpus again in later runs.  A corpus cache can also be
+#  given as the corpus (or the corpus to append) itself.  The cache
+#  keeps the sentence boundaries that it was created with.]
+
+cached_corpus = ""
+
+# sentence boundaries: "" for none, "blank" for sentences separated by
+# blank lines, or "id" for an id-word-tag corpus with token ids of the
+# form sNN_NN, where sNN is the sentence id
+# [No n-gram is extended across a sentence boundary.  Without
+#  boundaries, the whole corpus is treated as one sentence.]
+
+boundaries = ""
+
+# store the corpus in a bsddb btree: 0, in integer-interned arrays: 1
+# [The array-backed store maps every word and tag to an integer ID and
+#  is much faster for large corpora, as long as the corpus fits in
+#  memory.]
+
+use_arrays = 0
+
+# find the variation n-grams level by level: 0, with a suffix array: 1
+# [The suffix array engine finds the variation n-grams of all lengths in
+#  a single pass, which is much faster when there are very long
+#  variation n-grams.  It uses the array-backed store.]
+
+use_suffix_array = 0
+
+# number of worker processes used to extend the n-grams at each level
+# [More than one job uses the array-backed store and requires python
+#  >= 2.6 for the multiprocessing module.]
+
+jobs = 1
+
+# Optional: directory for the state of an incremental run
+# [If a state directory is given, the corpus and the variation n-grams
+#  are saved there, so that sentences can later be appended to the
+#  corpus with --append without rerunning the whole corpus.  This uses
+#  the array-backed store.]
+
+state_dir = ""
+
+# memory limit (in megabytes) for counting the n-grams of one length, or
+# 0 for no limit
+# [Until the non-varying n-grams are deleted, the counts for every word
+#  n-gram are held in memory.  With a limit, the counts are written to
+#  temporary files in sorted runs when the limit is reached and merged
+#  afterwards.  The limit is also used for sorting the output files.]
+
+max_memory = 0
+
+# limits for the variation n-grams that are found and written out
+# [min_count is the minimum total count of a variation n-gram and max_n
+#  the length of the longest variation n-grams, or 0 for no limit.
+#  Since an n-gram never occurs more often than the shorter n-grams in
+#  it, the n-grams below min_count are not extended any further, so
+#  both limits make the longer n-grams faster to find.  top_k is the
+#  number of variation n-grams with the highest counts written for each
+#  length, or 0 for all of them.  It only limits the output files, since
+#  the longer variation n-grams with the highest counts may be found
+#  from shorter ones that are not among the top_k.]
+
+min_count = 1
+max_n = 0
+top_k = 0
+
+# Optional: file for the metrics of each n-gram length
+# [If a metrics file is given, one line with a JSON object is written to
+#  it for every n-gram length, with the number of n-grams generated and
+#  kept as variation n-grams, the time spent on expanding, filtering,
+#  and writing them, and the peak memory.  This requires python >= 2.6
+#  for the json module.]
+
+metrics_file = ""
+
+# Optional: file for an index of the words and tags in the output files
+# [If an index file is given, every word and tag in the variation
+#  n-grams is mapped to the output lines that contain it, so that
+#  query-index.py can look up the variation n-grams for a word without
+#  reading all output files.]
+
+index_file = ""
+
+# Optional: binary result file
+# [If a result file is given, the variation n-grams of all lengths are
+#  written to it as well, with the words of the n-grams and the tags of
+#  the tag sequences as integer IDs, so that they can be loaded with
+#  resultfile.ResultFile without parsing the output files.]
+
+results_file = ""
+
+# rank the non-fringe variation nuclei: 0 (no), 1 (yes)
+# [With the non-fringe heuristic of Dickinson and Meurers (2003), the
+#  variation nuclei that are surrounded by identical context on both
+#  sides are the most likely errors.  If turned on, the words that are
+#  the nucleus of a non-fringe variation n-gram are written to a file
+#  output_file_stem.nonfringe, ranked by the length of their longest
+#  non-fringe variation n-gram.]
+
+nonfringe = 0
+
 # --------------------------------------------------------
 # END USER SETTINGS
 # --------------------------------------------------------
@@ -51,22 +155,51 @@ output_file_stem = "ngrams"
 import getopt
 import sys
 import os
-import commands
-
-# import bsddb
-import bsddb
+import time
+import heapq
+from array import array
 
 # import included minimized FreqDist
 from nltk_freqdist import *
 
+# import the variation n-gram detection
+from decca_pos import *
+from intcorpus import InternedCorpus
+
+# import the binary corpus cache
+from corpuscache import CorpusCache, CorpusCacheWriter, is_corpus_cache
+
+# import the sorted output stage
+import sortedoutput
+from sortedoutput import SortedOutput, peak_memory
+
+# import the metrics stream
+from metrics import Metrics
+
+# import the index of the output files
+from ngramindex import IndexWriter, IndexedFile, output_filename
+
+# import the non-fringe heuristic
+from nonfringe import NonFringeNuclei
+
+# import the binary result file
+from resultfile import ResultWriter
+
+# import the state for incremental runs
+from posstate import *
+
 # specify the long options in arglist
-arglist = ['corpus=','directory=','file=','help']
+arglist = ['corpus=','directory=','file=','boundaries=','arrays','suffix-array',
+           'jobs=','state=','append=','max-memory=','metrics=','min-count=',
+           'max-n=','top-k=','cached-corp=','index=','results=','nonfringe','help']
 # parse the command line call
-opts, args = getopt.getopt(sys.argv[1:],"c:d:f:h",arglist)
+opts, args = getopt.getopt(sys.argv[1:],"c:d:f:b:asj:t:u:m:e:k:n:o:w:i:r:gh",arglist)
 
 # Go through the command line options and see if the user specified a
 # directory or a corpus, or asked for help
 
+append_corpus = ""
+
 for option, specification in opts:
     if option in ("-d", "--directory"):
         destination_dir = specification
@@ -74,6 +207,36 @@ for option, specification in opts:
         input_corpus = specification
     elif option in ("-f", "--file"):
         output_file_stem = specification
+    elif option in ("-b", "--boundaries"):
+        boundaries = specification
+    elif option in ("-a", "--arrays"):
+        use_arrays = 1
+    elif option in ("-s", "--suffix-array"):
+        use_suffix_array = 1
+    elif option in ("-j", "--jobs"):
+        jobs = int(specification)
+    elif option in ("-t", "--state"):
+        state_dir = specification
+    elif option in ("-u", "--append"):
+        append_corpus = specification
+    elif option in ("-m", "--max-memory"):
+        max_memory = int(specification)
+    elif option in ("-e", "--metrics"):
+        metrics_file = specification
+    elif option in ("-k", "--min-count"):
+        min_count = int(specification)
+    elif option in ("-n", "--max-n"):
+        max_n = int(specification)
+    elif option in ("-o", "--top-k"):
+        top_k = int(specification)
+    elif option in ("-w", "--cached-corp"):
+        cached_corpus = specification
+    elif option in ("-i", "--index"):
+        index_file = specification
+    elif option in ("-r", "--results"):
+        results_file = specification
+    elif option in ("-g", "--nonfringe"):
+        nonfringe = 1
     elif option in ("-h", "--help"):
         print """
 Code to calculate variation n-grams: takes in a corpus in TnT
@@ -83,9 +246,26 @@ Annotation" (EACL-03)
 
 Options:
 
--c/--corpus      specify the (absolute) corpus name
+-c/--corpus      specify the (absolute) corpus name (.gz, .bz2, .xz, or
+                 - for standard input)
 -d/--directory   specify the (absolute) output directory name
 -f/--file        specify the base name for the output files
+-b/--boundaries  specify the sentence boundaries: blank (blank lines) or
+                 id (an id-word-tag corpus with ids sNN_NN)
+-a/--arrays      store the corpus in integer-interned arrays
+-s/--suffix-array  find all variation n-grams with a suffix array
+-j/--jobs        specify the number of worker processes
+-t/--state       specify a directory to save the state of the run in
+-u/--append      specify a corpus to append to the saved state
+-m/--max-memory  specify a memory limit in megabytes for counting n-grams
+-e/--metrics     specify a file to write the metrics of each n-gram length to
+-k/--min-count   specify the minimum total count of a variation n-gram
+-n/--max-n       specify the length of the longest variation n-grams
+-o/--top-k       specify the number of variation n-grams written per length
+-w/--cached-corp specify the (absolute) corpus cache name
+-i/--index       specify a file to write an index of the output files to
+-r/--results     specify a file to write the results to in a binary format
+-g/--nonfringe   rank the non-fringe variation nuclei
 -h/--help        display this help menu
 """
         sys.exit()
@@ -110,147 +290,220 @@ def get_word_tag(line):
 
     return word, tag
 
-# the function 'add_to_dict' adds a word and its tag to a given dictionary
-
-def add_to_dict(Dict,word,tag):
-    # if the dictionary already has the word, merely increment the tag.
-    if Dict.has_key(word):
-        Dict[word].inc(tag)
-    # otherwise, first create the distribution, then increment the tag.
-    else:
-        Dict[word] = FreqDist()
-        Dict[word].inc(tag)
-
-def to_string(n):
-
-    if (n < 10):
-        n_str='00'+str(n)
-    elif (n < 100):
-        n_str='0'+str(n)
-    else:
-        n_str=str(n)
-    return n_str
-
-# --------------------------------------------------------
-# STEP 0: Initialization
-
-# add a trailing "/" if not already there since it's a directory
-if destination_dir[len(destination_dir)-1] != "/":
-    destination_dir += "/"
-
-# n is the n-gram counter.  We start with unigrams, so we start with 1
-
-n = 1
-
-# initialize Corpus, which will hold the entire corpus indexed from 1
-try:
-    Corpus = bsddb.btopen(None)
-except:
-    sys.stderr.write("\n\nError: Unable to open temporary db for corpus\n")
-    sys.exit(1)
-
-# initialize index to 1; at the end of the loop index is corpus-size + 1
-index = 1
-
-# intialize Dict, which will hold a dictionary keyed by words, accessing
-# a frequency distribution of tags
-Dict = {}
-
-# --------------------------------------------------------
-# STEP 1: Read in corpus
-
-print "Using corpus: "+input_corpus
-print "Writing to:   "+destination_dir
-sys.stdout.flush()
-
-# concatenate the path name with the file name and a dot for the
-# extension, to be used in the rest of the code
-destination_dir += output_file_stem + "."
-
-# open the corpus for reading
-try:
-    corpus_file = open(input_corpus,'r')
-except:
-    sys.stderr.write("\n\nError: Unable to open " + input_corpus + "\n")
-    sys.exit(1)
-
-# tell the reader, we're reading in the corpus (i.e. unigrams)
-print "001 grams:",
-sys.stdout.flush()
-
-# Read the entire input, storing each word-tag pair in Corpus
-
-# read the first line of the corpus
-line = corpus_file.readline()
-
-while line:
-    # strip the line of extra newlines, tabs, etc. and split it by tabs
-    line = line.rstrip()
-
-    # input is in TnT format:  word \t tag
-    word, tag = get_word_tag(line)
-
-    # store the line
-    Corpus[str(index)] = word + '\t' + tag
-
-    # add word & tag to dictionary Dict
-    add_to_dict(Dict, word, tag)
-
-    # increment counter, i.e. next line in corpus
-    index = index + 1
-
-    # read the next line of the corpus
-    line = corpus_file.readline()
-
-# We're done reading in the corpus, so close that file:
-corpus_file.close()
-
-# At the end of the loop: index = last corpus position + 1
-
-print "read in,",
-sys.stdout.flush()
-
-# --------------------------------------------------------
-# STEP 2:
-# put all the ambiguous unigrams into Grams, indexed by the corpus
-# position (i.e. identical to Corpus, but only the ambiguously tagged
-# words are included)
-
-# set Grams to be an empty dictionary
-try:
-    Grams = bsddb.btopen(None)
-except:
-    sys.stderr.write("\n\nError: Unable to create temporary db for n-grams\n")
-    sys.exit(1)
-
-# for every corpus position, see if it has multiple tags.  If so,
-# store it in Grams.  If not, delete it from Dict, so after this loop Dict
-# will only be left with entries that have multiple tags (making
-# printing easier).  Note that this is why we must first check that Dict
-# has the key word.
-
-for i,line in Corpus.iteritems():
-    spl = line.split('\t')
-    word = spl[0]
+# the function 'open_corpus' opens a corpus file for reading: "-" is
+# standard input and files ending in .gz, .bz2, or .xz are decompressed
+# as they are read.  (Without the lzma module, .xz files are
+# decompressed by the xz program.)
+
+# the class '_XzFile' reads the output of the xz program like a file;
+# closing it waits for the program to exit and raises an IOError if it
+# failed
+
+class _XzFile:
+    def __init__(self, filename):
+        import subprocess
+        self._filename = filename
+        self._process = subprocess.Popen(["xz", "-dc", filename],
+                                         stdout=subprocess.PIPE)
+        self.read = self._process.stdout.read
+
+    def close(self):
+        self._process.stdout.close()
+        status = self._process.wait()
+        if status != 0:
+            raise IOError("xz exited with status %d on %s" % (status, self._filename))
+
+def open_corpus(filename):
+    if filename == "-":
+        return sys.stdin
+    if filename.endswith(".gz"):
+        import gzip
+        return gzip.open(filename, 'rb')
+    if filename.endswith(".bz2"):
+        import bz2
+        return bz2.BZ2File(filename, 'r')
+    if filename.endswith(".xz"):
+        try:
+            import lzma
+            return lzma.open(filename, 'rb')
+        except ImportError:
+            if not os.path.exists(filename):
+                raise IOError(filename)
+            return _XzFile(filename)
+    return open(filename, 'rb')
+
+# the function 'open_cache' opens a corpus cache and exits with an error
+# if it cannot be read
+
+def open_cache(filename):
+    try:
+        return CorpusCache(filename)
+    except (IOError, OSError):
+        sys.stderr.write("\n\nError: Unable to read corpus cache " + filename + "\n")
+        sys.exit(1)
 
-    if (Dict.has_key(word)):
-        if (len(Dict[word].samples()) > 1): # if i has more than one tag 
-            Grams[i] = Corpus[i]         # save that line in Grams
-        else:
-            del Dict[word]
+# the function 'read_cache' generates the (word, tag) pairs of a corpus
+# cache in the same way as 'read_corpus'
+
+def read_cache(filename):
+    cache = open_cache(filename)
+    strings = cache.strings()
+    starts = cache.sentence_starts.array()
+    for s in range(cache.sentences):
+        if boundaries:
+            yield None
+        words = cache.words.array(starts[s], starts[s+1])
+        tags = cache.tags.array(starts[s], starts[s+1])
+        for i in range(len(words)):
+            yield strings[words[i]], strings[tags[i]]
+    cache.close()
+
+# the size of the chunks in which the corpus is read
+
+read_size = 4 * 1024 * 1024
+
+# the function 'read_corpus' opens a corpus in TnT format and generates
+# its (word, tag) pairs, with None between sentences if there are
+# sentence boundaries.  The corpus is read in large chunks, which are
+# split into lines and fields all at once, so that reading is not slowed
+# down by calls for every line.
+
+def read_corpus(filename):
+    if filename != "-" and is_corpus_cache(filename):
+        for pair in read_cache(filename):
+            yield pair
+        return
 
-        # note that we are only deleting non-varying occurrences, so all
-        # corpus positions with a varying n-gram will be saved.
+    try:
+        corpus_file = open_corpus(filename)
+    except (IOError, OSError):
+        sys.stderr.write("\n\nError: Unable to open " + filename + "\n")
+        sys.exit(1)
 
-# --------------------------------------------------------
-# STEP 3: loop over increasing longer n-grams until none found
+    # with sentence boundaries, the corpus starts with a sentence
+    # boundary, so that it is divided into sentences even if it has
+    # only one
+    if boundaries:
+        yield None
+
+    # rest holds the beginning of a line that continues in the next
+    # chunk
+    rest = ""
+    sentence = None
+    while 1:
+        # a truncated or corrupt compressed corpus only fails once the
+        # damaged part is read
+        try:
+            chunk = corpus_file.read(read_size)
+        except (IOError, EOFError):
+            sys.stderr.write("\n\nError: Unable to read " + filename + "\n")
+            sys.exit(1)
+        if not chunk:
+            if not rest:
+                break
+            # the last line has no newline
+            chunk = "\n"
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+
+        for line in lines:
+            # strip the line of extra newlines, tabs, etc. and split it
+            # by tabs
+            spl = line.rstrip().split('\t')
+            if boundaries == "id":
+                if len(spl) < 3:
+                    sys.stderr.write("\n\nError: Incorrectly formatted input corpus.\nThe format expected is 'id \'\t\' word \'\t\' tag'.\n")
+                    sys.stderr.write("Unable to parse line:\n\n" + line + "\n")
+                    sys.exit(1)
+                # the sentence id is the part of the token id before
+                # the "_"
+                if spl[0].split('_')[0] != sentence:
+                    sentence = spl[0].split('_')[0]
+                    yield None
+                yield spl[1], spl[2]
+            elif len(spl) < 2:
+                if boundaries == "blank" and not line.strip():
+                    yield None
+                    continue
+                get_word_tag(line.rstrip())
+            else:
+                yield spl[0], spl[1]
+
+    # a corpus decompressed by the xz program is only known to be
+    # complete once the program has exited without an error
+    if corpus_file is not sys.stdin:
+        try:
+            corpus_file.close()
+        except IOError:
+            sys.stderr.write("\n\nError: Unable to decompress " + filename + "\n")
+            sys.exit(1)
+
+# the function 'format_line' returns the output line for the n-gram
+# words and its frequency distribution of tag sequences
+
+def format_line(words, dist):
+    line = str(dist.N()) + '\t' + words
+    for tags in dist.samples():
+        count = dist.count(tags)
+        line = line + '\t' + str(count) + '\t' + tags
+    return line
+
+# the function 'output_words' returns the n-grams in Dict that are
+# written out: the top_k with the highest counts, or all of them
+
+def output_words(Dict):
+    if top_k:
+        return [words for (count, words) in
+                heapq.nlargest(top_k, ((Dict[words].N(), words)
+                                       for words in Dict.iterkeys()))]
+    return Dict.keys()
+
+# the function 'add_results' adds the n-gram words and its frequency
+# distribution of tag sequences to the result file
+
+def add_results(words, dist):
+    results.add(dist.N(), words,
+                [(0, dist.count(tags), tags) for tags in dist.samples()])
+
+# the function 'table_dict' returns the Dict and the Starts for a table
+# of a saved state, as they are generated by array_levels()
+
+def table_dict(Table):
+    Dict = {}
+    Starts = array('i')
+    for words, (counts, positions) in Table.iteritems():
+        Dict[words] = FreqDist()
+        for tags, count in counts.iteritems():
+            Dict[words].inc(tags, count)
+        Starts.extend(positions)
+    return Dict, Starts
+
+# the function 'write_nonfringe' writes the non-fringe variation
+# nuclei, ranked by the length and count of their longest non-fringe
+# variation n-gram, one per line: the length, the nucleus word, and the
+# variation n-gram as in the output files
+
+def write_nonfringe():
+    filename = destination_dir + "nonfringe"
+    try:
+        file = open(filename, 'w')
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to open output file " + filename + "\n")
+        sys.exit(1)
+    for (n, word, words, dist) in nuclei.ranked():
+        file.write(str(n) + '\t' + word + '\t' + format_line(words, dist) + '\n')
+    file.close()
+    print "%d non-fringe variation nuclei ranked." % len(nuclei)
+    sys.stdout.flush()
 
-# MAIN LOOP: loop until Grams, which stores all varyingly-tagged
-# n-grams, has no more elements -- i.e. there are not n-grams of that
-# size which are tagged in multiple ways
+# the function 'write_level' writes the variation n-grams in Dict, which
+# will be the varying ones, to the output file for n, sorted by
+# decreasing count, and writes the metrics for n.  With top_k, only the
+# top_k lines that come first in the sorted output are written.  The
+# n-grams are also added to the result file, if there is one.
 
-while Grams:
-    # begin by printing out results for the current n
+def write_level(Dict, n):
+    start = time.time()
     print "variations found,",
     sys.stdout.flush()
 
@@ -264,167 +517,320 @@ while Grams:
     except:
         sys.stderr.write("\n\nError: Unable to open output file " + filename + "\n")
         sys.exit(1)
-    
-    # print out all the n-grams in Dict, which will be the varying ones
-
-    for words in Dict.keys():
-        line = str(Dict[words].N()) + '\t' + words
-        for tags in Dict[words].samples():
-            count = Dict[words].count(tags)
-            line = line + '\t' + str(count) + '\t' + tags
-        file.write(line+'\n')
-        del Dict[words]
 
-    # close the file -- we are done writing to this n-gram
+    # collect all the n-grams in Dict, which will be the varying ones
+
+    # when appending, the result file and the non-fringe nuclei are
+    # written from the saved state at the end
+    add = results is not None and not append_corpus
+    if nuclei is not None and not append_corpus:
+        nuclei.add_level(n, Dict)
+
+    output = SortedOutput()
+    for words in output_words(Dict):
+        output.add(Dict[words].N(), format_line(words, Dict[words]))
+        if add:
+            add_results(words, Dict[words])
+        del Dict[words]
+    Dict.clear()
+    if add:
+        results.end_level(n)
+
+    # write the lines sorted by count and close the file -- we are done
+    # writing to this n-gram
+    if index is not None and not append_corpus:
+        output.write(IndexedFile(file, index, n))
+    else:
+        output.write(file)
     file.close()
+    metrics.add("sort_time", output.sort_time)
+    metrics.since("output", start)
+    metrics.level(n)
 
     # print out a note to the screen that these n-grams are finished.
     print "written to file,",
+    print "and file sorted (%.2fs, peak memory %d kB)." % (output.sort_time, peak_memory())
     sys.stdout.flush()
 
-    # sort the file using unix sort, output into the file itself
-    commands.getstatusoutput("sort -nr "+filename+" -o "+filename)
+def to_string(n):
 
-    print "and file sorted."
-    sys.stdout.flush()
+    if (n < 10):
+        n_str='00'+str(n)
+    elif (n < 100):
+        n_str='0'+str(n)
+    else:
+        n_str=str(n)
+    return n_str
 
-    # Increment n: we are now dealing with the next higher n-gram
-    n = n + 1
+# --------------------------------------------------------
+# STEP 0: Initialization
 
-    # (re)initialize Store, which will store the n-grams, indexed by the
-    # corpus position of the first element in the n-gram
-    try:
-        Store = bsddb.btopen(None)
-    except:
-        sys.stderr.write("\n\nError: Unable to open temporary db for storage\n")
-        sys.exit(1)
+# the suffix array engine and the worker processes work on the
+# array-backed store
+if use_suffix_array or jobs > 1:
+    use_arrays = 1
 
-    # (re)initialize Dict, which will for each n-gram corpus position
-    # the tag sequence that occurs for any occurrence of this n-gram
-    Dict = {}
+# use the memory limit for sorting the output files as well
+if max_memory:
+    sortedoutput.max_bytes = max_memory * 1024 * 1024
 
-    # define n_str as str(n) padded with leading 0s, for output/filenames
-    n_str = to_string(n)
+if boundaries not in ("", "blank", "id"):
+    sys.stderr.write("\n\nError: Unknown sentence boundaries " + boundaries + " (use blank or id)\n")
+    sys.exit(1)
 
-    # tell user we're starting work on this n:
-    print n_str+" grams:",
-    sys.stdout.flush()
+if min_count < 1 or max_n < 0 or top_k < 0:
+    sys.stderr.write("\n\nError: The limits --min-count, --max-n, and --top-k cannot be negative\n")
+    sys.exit(1)
 
-    for key,line in Grams.iteritems():
-        # make a list from the word and tag strings stored in Grams
+# the state of an incremental run is kept in the array-backed store
+if append_corpus and not state_dir:
+    sys.stderr.write("\n\nError: --append requires a state directory (--state)\n")
+    sys.exit(1)
+if state_dir:
+    if use_suffix_array:
+        sys.stderr.write("\n\nError: The suffix array engine cannot save a state\n")
+        sys.exit(1)
+    # the state has to hold all variation n-grams, since the n-grams
+    # below the limits may reach them when sentences are appended
+    if min_count > 1 or max_n:
+        sys.stderr.write("\n\nError: --min-count and --max-n cannot be used with a state\n")
+        sys.exit(1)
+    use_arrays = 1
+
+# add a trailing "/" if not already there since it's a directory
+if destination_dir[len(destination_dir)-1] != "/":
+    destination_dir += "/"
 
-        words, tags = get_word_tag(line)
+if append_corpus:
+    input_corpus = append_corpus
 
-        wordlist = words.split(tokensep)
-        taglist = tags.split(tokensep)
+try:
+    metrics = Metrics(metrics_file, script="decca-pos.py")
+except IOError:
+    sys.stderr.write("\n\nError: Unable to open metrics file " + metrics_file + "\n")
+    sys.exit(1)
 
-        numkey = int(key)
+print "Using corpus: "+input_corpus
+print "Writing to:   "+destination_dir
+sys.stdout.flush()
 
-        # if there is something in the corpus one position to the 
-        # left of the n-1 gram  and we haven't already created an
-        # n-gram at that position, then create it
-        if (numkey > 1) and (not Store.has_key(str(numkey-1))):
+if cached_corpus and not append_corpus:
+    # read in the corpus and save it as the cached_corpus, unless it has
+    # already been cached
+    if not os.path.exists(cached_corpus):
+        try:
+            writer = CorpusCacheWriter(cached_corpus, 2)
+        except IOError:
+            sys.stderr.write("\n\nError: Unable to open cached_corpus file for writing\n" + cached_corpus + "\n")
+            sys.exit(1)
+        for pair in read_corpus(input_corpus):
+            if pair is None:
+                writer.new_sentence()
+            else:
+                writer.append(pair[0], pair[1])
+        writer.close()
+        print "Corpus read in and cached."
+        sys.stdout.flush()
+    input_corpus = cached_corpus
 
-            # newkey is the index of the first word in this n-gram
-            newkey = str(numkey-1)
+# concatenate the path name with the file name and a dot for the
+# extension, to be used in the rest of the code
+destination_dir += output_file_stem + "."
 
-            # push the previous word in the corpus onto the front of the
-            # list and the previous tag, as well
+# the index of the output files; when appending, only some of the files
+# are rewritten, so the index is built from all of them at the end
+index = None
+if index_file:
+    try:
+        index = IndexWriter(index_file, destination_dir, tokensep)
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to open index file " + index_file + "\n")
+        sys.exit(1)
 
-            corpline = Corpus[newkey]
-            spl = corpline.split('\t')
-            wordlist.insert(0,spl[0])
-            taglist.insert(0,spl[1])
+# the function 'close_index' writes the index file and exits with an
+# error if it cannot be written
 
-            # create strings from the n-gram lists
-            wordline = tokensep.join(wordlist)
-            tagline = tokensep.join(taglist)
+def close_index():
+    try:
+        index.close()
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to write index file " + index_file + "\n")
+        sys.exit(1)
 
-            # store the wordline and tagline, indexed by the position
-            # of the first word
-            Store[newkey] = wordline + '\t' + tagline
+results = None
+if results_file:
+    try:
+        results = ResultWriter(results_file, tokensep)
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to open result file " + results_file + "\n")
+        sys.exit(1)
 
-            # add the tags to the words' dictionary slot.
-            add_to_dict(Dict,wordline,tagline)
+nuclei = None
+if nonfringe:
+    nuclei = NonFringeNuclei(tokensep)
 
-            # pop the first element off both lists, so that when we
-            # create an n-gram to the right, we will be dealing with
-            # the original n-1 gram
-            wordlist.pop(0)
-            taglist.pop(0)
+# --------------------------------------------------------
+# STEP 1a: Append to a saved state
 
-        # if there is a position in the corpus to the right of the entire
-        # n-gram (last corpus position = index-1 !) and no n-gram has
-        # been created at this key, create a new n-gram to the right
-        if ((numkey + (n-1)) < index) and (not Store.has_key(key)):
+# when appending, only the n-grams that overlap the new corpus are
+# looked at and only the output files for the lengths whose variation
+# n-grams changed are rewritten
+if append_corpus:
+    try:
+        Corpus, Levels = load_state(state_dir)
+    except (IOError, OSError):
+        sys.stderr.write("\n\nError: Unable to read state from " + state_dir + "\n")
+        sys.exit(1)
 
-            # newkey will be the position of the *last* token in the
-            # n-gram; key will be the position we index the n-gram on,
-            # i.e. the starting position
-            newkey = str(numkey+(n-1))
+    # the new sentences have to be read in the same way as the corpus
+    # in the state
+    if (Corpus.sentences is not None) != (boundaries != ""):
+        sys.stderr.write("\n\nError: The sentence boundaries (--boundaries) have to be the same as for the saved state\n")
+        sys.exit(1)
 
-            # append the rightmost word and tag onto their lists
+    pairs = list(read_corpus(append_corpus))
 
-            corpline = Corpus[newkey]
-            spl = corpline.split('\t')
-            wordlist.append(spl[0])
-            taglist.append(spl[1])
+    print "appending %d tokens to %d," % (len(pairs) - pairs.count(None), len(Corpus)),
+    sys.stdout.flush()
+    changed = append_tokens(Corpus, Levels, pairs)
+    print "%d n-gram lengths changed." % len(changed)
+    sys.stdout.flush()
 
-            # create strings from the lists
-            wordline = tokensep.join(wordlist)
-            tagline = tokensep.join(taglist)
+    for n in changed:
+        Table = Levels[n-1]
+        Dict, Starts = table_dict(Table)
+        metrics.add("varying", len(Starts))
+        metrics.add("varying_types", len(Dict))
+
+        print to_string(n)+" grams:",
+        filename = destination_dir+to_string(n)
+        if os.path.exists(filename):
+            os.remove(filename)
+        write_level(level_strings(Corpus, Dict, Starts, n, tokensep), n)
+        save_level(state_dir, n, Table)
+
+    save_corpus(state_dir, Corpus)
+    metrics.close()
+
+    # index the output files for all lengths, rewritten or not
+    if index is not None:
+        n = 1
+        while os.path.exists(output_filename(destination_dir, n)):
+            index.add_file(n, output_filename(destination_dir, n))
+            n = n + 1
+        close_index()
+
+    # write the results and the non-fringe nuclei for all lengths from
+    # the updated state
+    if results is not None or nuclei is not None:
+        for n in range(1, len(Levels) + 1):
+            Dict, Starts = table_dict(Levels[n-1])
+            Dict = level_strings(Corpus, Dict, Starts, n, tokensep)
+            if nuclei is not None:
+                nuclei.add_level(n, Dict)
+            if results is not None:
+                for words in output_words(Dict):
+                    add_results(words, Dict[words])
+                results.end_level(n)
+    if results is not None:
+        results.close()
+    if nuclei is not None:
+        write_nonfringe()
+    sys.exit(0)
+
+if state_dir:
+    create_state(state_dir)
 
-            # Store the wordline and tagline, indexed by the position
-            # of the first word
-            Store[key] = wordline + '\t' + tagline
+# --------------------------------------------------------
+# STEP 1: Read in corpus
 
-            # add the tags to the words' dictionary slot.
-            add_to_dict(Dict,wordline,tagline)
-        #key = Grams.next()
-    # end for (key in Grams.keys())
+# tell the reader, we're reading in the corpus (i.e. unigrams)
+print "001 grams:",
+sys.stdout.flush()
 
-    # reinitialize Grams
-    Grams.close()
+# in the array-backed store, the whole corpus is read in here, so that
+# it can be saved in the state directory; otherwise it is read in by
+# bsddb_levels()
+if use_arrays:
+    start = time.time()
+    Corpus = InternedCorpus()
+    if input_corpus != "-" and is_corpus_cache(input_corpus):
+        # the prefix hashes of the words and tags are saved next to the
+        # cache the first time it is loaded (the words in the same hash
+        # file as decca-treebank.py)
+        cache = open_cache(input_corpus)
+        try:
+            Corpus.load_cache(cache, boundaries != "", input_corpus)
+        except IOError:
+            sys.stderr.write("\n\nError: Unable to write hash files for " + input_corpus + "\n")
+            sys.exit(1)
+        cache.close()
+    else:
+        for pair in read_corpus(input_corpus):
+            if pair is None:
+                Corpus.end_sentence()
+            else:
+                Corpus.append(pair[0], pair[1])
+    metrics.since("expand", start)
+    Levels = array_levels(Corpus, use_suffix_array, jobs, max_memory, metrics,
+                          min_count, max_n)
+else:
     try:
-        Grams = bsddb.btopen(None)
-    except:
-        sys.stderr.write("\n\nError: Unable to open temporary db for n-grams\n")
+        import bsddb
+    except ImportError:
+        sys.stderr.write("\n\nError: The bsddb module is not available; use -a/--arrays to store the corpus in arrays\n")
         sys.exit(1)
+    Levels = bsddb_levels(read_corpus(input_corpus), tokensep, max_memory,
+                          metrics, min_count, max_n)
 
-    # print a note to the screen that these n-grams have been indexed.
-    print "read in,",
-    sys.stdout.flush()
+# --------------------------------------------------------
+# STEP 2: write out the variation n-grams for increasingly longer
+# n-grams until none are found
 
-    # loop over the indexed positions in the Store
-    for i in Store.keys():
-
-        storeline = Store[i]
-        spl = storeline.split('\t')
-        
-        # get the word n-gram
-        words = spl[0]
-
-        # if we have not yet deleted words, then if is a varying
-        # n-gram, put it in Grams.  Otherwise, get rid of it from Dict
-        if (Dict.has_key(words)):
-            if (len(Dict[words].samples()) > 1):
-                # Fill the Grams dictionary from the Store one
-                Grams[i] = Store[i]
-            else:
-                del Dict[words]
+n = 0
 
-        del Store[i]
+for Level in Levels:
+    if use_arrays:
+        (n, Dict, Starts) = Level
+        start = time.time()
 
-    # end for (i in Store.keys())
+        # save the variation n-grams for later incremental runs
+        if state_dir:
+            save_level(state_dir, n, level_table(Corpus, Dict, Starts, n))
 
-    Store.close()
+        Dict = level_strings(Corpus, Dict, Starts, n, tokensep)
+        metrics.since("output", start)
+    else:
+        (n, Dict) = Level
 
-# end while Grams
+    # tell user we're done with the n-grams for this n
+    if n == 1:
+        print "read in,",
+    else:
+        print to_string(n)+" grams: read in,",
+    write_level(Dict, n)
 
-print "and no variations found."
-sys.stdout.flush()
+if max_n and n >= max_n:
+    print "maximum n-gram length reached."
+    sys.stdout.flush()
+else:
+    if n == 0:
+        print "read in,",
+    else:
+        print to_string(n+1)+" grams: read in,",
+    print "and no variations found."
+    sys.stdout.flush()
+
+    # the metrics of the first length without variation n-grams
+    metrics.level(n+1)
+metrics.close()
 
-# close corpus files
+if index is not None:
+    close_index()
+if results is not None:
+    results.close()
+if nuclei is not None:
+    write_nonfringe()
 
-Corpus.close()
-Grams.close()
+if state_dir:
+    save_corpus(state_dir, Corpus)
@@ -0,0 +1,542 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+""" decca_pos.py
+
+    Library interface to the variation n-gram detection of decca-pos.py,
+    as described in Dickinson and Meurers (2003), "Detecting Errors in
+    Part-of-Speech Annotation" (EACL-03).
+
+    The corpus is given as an iterable of (word, tag) pairs and the
+    variation n-grams are generated one n-gram length at a time, as soon
+    as all the n-grams of that length have been found:
+
+        >>> from decca_pos import variation_ngrams
+        >>> for n, Dict in variation_ngrams(pairs):
+        ...     for words in Dict.keys():
+        ...         print n, words, Dict[words].samples()
+
+    Dict maps each variation n-gram (the words joined by tokensep) to a
+    C{FreqDist} of its tag sequences (the tags joined by tokensep).
+
+    A C{None} in the pairs marks a sentence boundary; no n-gram extends
+    across a sentence boundary.
+
+    decca-pos.py is the command line interface to this module.
+"""
+
+import time
+from array import array
+
+from nltk_freqdist import *
+from intcorpus import InternedCorpus
+from suffixarray import variation_levels
+from spillcounts import SpillCounts
+from metrics import Metrics
+
+def variation_ngrams(pairs, tokensep=" ## ", use_arrays=1, use_suffix_array=0,
+                     jobs=1, max_memory=0, metrics=None, min_count=1, max_n=0):
+    """
+    Find the variation n-grams in a corpus.
+
+    @return: A generator of (n, Dict) pairs for n = 1, 2, ... up to
+        the longest variation n-gram, where Dict maps each variation
+        n-gram of length C{n} to a C{FreqDist} of its tag sequences.
+    @rtype: C{generator}
+    @param pairs: The corpus as (word, tag) pairs, with C{None} between
+        sentences.
+    @type pairs: C{iterable}
+    @param tokensep: The string used to join the words and tags of an
+        n-gram.
+    @type tokensep: C{string}
+    @param use_arrays: Store the corpus in integer-interned arrays (1)
+        or in bsddb btrees (0).
+    @type use_arrays: C{int}
+    @param use_suffix_array: Find the variation n-grams of all lengths
+        with a suffix array.
+    @type use_suffix_array: C{int}
+    @param jobs: The number of worker processes used to extend the
+        n-grams at each length.
+    @type jobs: C{int}
+    @param max_memory: The memory limit in megabytes for counting the
+        n-grams of one length, or 0 for no limit.
+    @type max_memory: C{int}
+    @param metrics: The metrics to record the expansion and filtering
+        of each n-gram length in, before it is generated.
+    @type metrics: C{Metrics}
+    @param min_count: Only find the variation n-grams that occur at
+        least this many times.  Since an n-gram occurs at most as often
+        as the shorter n-grams in it, the n-grams that occur less often
+        are not extended any further.
+    @type min_count: C{int}
+    @param max_n: The length of the longest variation n-grams to find,
+        or 0 for no limit.
+    @type max_n: C{int}
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    if not (use_arrays or use_suffix_array or jobs > 1):
+        for n, Dict in bsddb_levels(pairs, tokensep, max_memory, metrics,
+                                    min_count, max_n):
+            yield n, Dict
+        return
+
+    start = time.time()
+    corpus = InternedCorpus()
+    for pair in pairs:
+        if pair is None:
+            corpus.end_sentence()
+        else:
+            corpus.append(pair[0], pair[1])
+    metrics.since("expand", start)
+
+    for n, Dict, Starts in array_levels(corpus, use_suffix_array, jobs,
+                                        max_memory, metrics, min_count, max_n):
+        yield n, level_strings(corpus, Dict, Starts, n, tokensep)
+
+def array_levels(corpus, use_suffix_array=0, jobs=1, max_memory=0,
+                 metrics=None, min_count=1, max_n=0):
+    """
+    Find the variation n-grams in an C{InternedCorpus}.
+
+    @return: A generator of (n, Dict, Starts) tuples for n = 1, 2, ...
+        Dict maps the word key of each variation n-gram of length C{n}
+        to a C{FreqDist} of the tag keys of its occurrences and Starts
+        holds start positions of these n-grams (at least one for each
+        of their tag sequences).  Without the suffix array, Starts holds
+        the start positions of all their occurrences in order.  Use
+        L{level_strings} to turn the keys into strings.
+    @rtype: C{generator}
+    """
+    if metrics is None:
+        metrics = Metrics()
+
+    if use_suffix_array:
+        # the suffix array engine finds the variation n-grams of all
+        # lengths at once, so all of the time goes to the first length
+        # and the n-grams are only counted by their types
+        start = time.time()
+        Levels = variation_levels(corpus)
+        metrics.since("expand", start)
+        n = 1
+        for (Dict, Starts) in Levels:
+            for words in Dict.keys():
+                if Dict[words].N() < min_count:
+                    del Dict[words]
+            # as in the main loop, there are no more variation n-grams
+            # once there are none of one length
+            if not Dict or (max_n and n > max_n):
+                break
+            metrics.add("varying_types", len(Dict))
+            yield n, Dict, Starts
+            n = n + 1
+        return
+
+    start = time.time()
+    Dict = new_dict(max_memory)
+    for i in xrange(len(corpus)):
+        add_to_dict(Dict, corpus.word_key(i, 1), corpus.tag_key(i, 1))
+    Dict = varying_dict(Dict)
+    metrics.add("candidates", len(corpus))
+    metrics.since("expand", start)
+
+    # Grams is the ordered list of corpus positions where a varying
+    # n-gram starts
+    start = time.time()
+    Grams = array('i')
+    for i in xrange(len(corpus)):
+        word = corpus.word_key(i, 1)
+
+        if (Dict.has_key(word)):
+            if (Dict[word].B() > 1) and (Dict[word].N() >= min_count):
+                Grams.append(i)
+            else:
+                del Dict[word]
+    metrics.since("filter", start)
+
+    # start the worker processes now that the corpus is complete, so
+    # that every worker has its own read-only copy of it
+    pool = None
+    if jobs > 1:
+        import multiprocessing
+        global _corpus
+        _corpus = corpus
+        pool = multiprocessing.Pool(jobs)
+
+    try:
+        n = 1
+        while Grams:
+            metrics.add("varying", len(Grams))
+            metrics.add("varying_types", len(Dict))
+            yield n, Dict, Grams
+
+            if max_n and n >= max_n:
+                break
+
+            n = n + 1
+            if pool is not None:
+                Dict, Grams = expand_parallel(pool, jobs, Grams, n, metrics,
+                                              min_count)
+            else:
+                start = time.time()
+                Store, Dict = expand_positions(corpus, Grams, n, max_memory)
+                metrics.add("candidates", len(Store))
+                metrics.since("expand", start)
+                start = time.time()
+                Grams = filter_positions(Store, Dict, min_count)
+                metrics.since("filter", start)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+def level_strings(corpus, Dict, Starts, n, tokensep=" ## "):
+    """
+    @return: The variation n-grams of length C{n} from L{array_levels}
+        with the word and tag keys turned into strings joined by
+        C{tokensep}.
+    @rtype: C{dict}
+    """
+    WordStrings = {}
+    TagStrings = {}
+    for start in Starts:
+        words = corpus.word_key(start, n)
+        if not WordStrings.has_key(words):
+            WordStrings[words] = corpus.word_string(start, n, tokensep)
+        tags = corpus.tag_key(start, n)
+        if not TagStrings.has_key(tags):
+            TagStrings[tags] = corpus.tag_string(start, n, tokensep)
+
+    Strings = {}
+    for words, dist in Dict.iteritems():
+        tagdist = FreqDist()
+        for tags in dist.samples():
+            tagdist.inc(TagStrings[tags], dist.count(tags))
+        Strings[WordStrings[words]] = tagdist
+    return Strings
+
+def bsddb_levels(pairs, tokensep=" ## ", max_memory=0, metrics=None,
+                 min_count=1, max_n=0):
+    """
+    Find the variation n-grams in a corpus, storing the corpus and the
+    n-grams in temporary bsddb btrees instead of in memory.
+
+    @return: A generator of (n, Dict) pairs, as for
+        L{variation_ngrams}.
+    @rtype: C{generator}
+    """
+    # bsddb is deprecated since python 2.6 and not always installed, so
+    # it is only imported for the bsddb store
+    import bsddb
+
+    if metrics is None:
+        metrics = Metrics()
+
+    # Corpus holds the entire corpus indexed from 1
+    Corpus = bsddb.btopen(None)
+    Grams = None
+
+    # Sentences holds the sentence number of each corpus position, if
+    # there are sentence boundaries in the pairs
+    Sentences = None
+    sentence = 0
+
+    try:
+        start = time.time()
+        index = 1
+        Dict = new_dict(max_memory)
+        for pair in pairs:
+            if pair is None:
+                if Sentences is None:
+                    Sentences = array('i', [0]) * index
+                if index > 1 and Sentences[-1] == sentence:
+                    sentence = sentence + 1
+                continue
+            (word, tag) = pair
+            Corpus[str(index)] = word + '\t' + tag
+            add_to_dict(Dict, word, tag)
+            if Sentences is not None:
+                Sentences.append(sentence)
+            index = index + 1
+        Dict = varying_dict(Dict)
+        metrics.add("candidates", index - 1)
+        metrics.since("expand", start)
+
+        # put all the ambiguous unigrams into Grams, indexed by the
+        # corpus position
+        start = time.time()
+        Grams = bsddb.btopen(None)
+        for i,line in Corpus.iteritems():
+            spl = line.split('\t')
+            word = spl[0]
+
+            if (Dict.has_key(word)):
+                if (Dict[word].B() > 1) and (Dict[word].N() >= min_count):
+                    Grams[i] = Corpus[i]
+                else:
+                    del Dict[word]
+        metrics.since("filter", start)
+
+        n = 1
+        while Grams:
+            metrics.add("varying", len(Grams))
+            metrics.add("varying_types", len(Dict))
+            yield n, Dict
+
+            if max_n and n >= max_n:
+                break
+
+            n = n + 1
+            start = time.time()
+            Dict = new_dict(max_memory)
+
+            # Store holds the n-grams, indexed by the corpus position of
+            # the first element in the n-gram
+            Store = bsddb.btopen(None)
+
+            for key,line in Grams.iteritems():
+                words, tags = line.split('\t')
+
+                wordlist = words.split(tokensep)
+                taglist = tags.split(tokensep)
+
+                numkey = int(key)
+
+                # extend to the left, unless we are at the beginning of
+                # the corpus or a sentence or have already created an
+                # n-gram there
+                if (numkey > 1) and (not Store.has_key(str(numkey-1))) and \
+                   (Sentences is None or Sentences[numkey-1] == Sentences[numkey]):
+                    newkey = str(numkey-1)
+
+                    spl = Corpus[newkey].split('\t')
+                    wordlist.insert(0,spl[0])
+                    taglist.insert(0,spl[1])
+
+                    wordline = tokensep.join(wordlist)
+                    tagline = tokensep.join(taglist)
+
+                    Store[newkey] = wordline + '\t' + tagline
+                    add_to_dict(Dict,wordline,tagline)
+
+                    wordlist.pop(0)
+                    taglist.pop(0)
+
+                # extend to the right, unless the n-gram would run past
+                # the end of the corpus or a sentence or has already
+                # been created
+                if ((numkey + (n-1)) < index) and (not Store.has_key(key)) and \
+                   (Sentences is None or Sentences[numkey+n-1] == Sentences[numkey]):
+                    newkey = str(numkey+(n-1))
+
+                    spl = Corpus[newkey].split('\t')
+                    wordlist.append(spl[0])
+                    taglist.append(spl[1])
+
+                    wordline = tokensep.join(wordlist)
+                    tagline = tokensep.join(taglist)
+
+                    Store[key] = wordline + '\t' + tagline
+                    add_to_dict(Dict,wordline,tagline)
+
+            Dict = varying_dict(Dict)
+            metrics.add("candidates", len(Store))
+            metrics.since("expand", start)
+
+            # keep the varying n-grams in Grams and delete the others
+            # from Dict
+            start = time.time()
+            Grams.close()
+            Grams = bsddb.btopen(None)
+
+            for i in Store.keys():
+                words = Store[i].split('\t')[0]
+
+                if (Dict.has_key(words)):
+                    if (Dict[words].B() > 1) and (Dict[words].N() >= min_count):
+                        Grams[i] = Store[i]
+                    else:
+                        del Dict[words]
+
+                del Store[i]
+
+            Store.close()
+            metrics.since("filter", start)
+    finally:
+        Corpus.close()
+        if Grams is not None:
+            Grams.close()
+
+# --------------------------------------------------------
+# Counting the n-grams of one length
+
+def new_dict(max_memory):
+    # return an empty Dict for counting the n-grams of one length; with
+    # a memory limit, this is a SpillCounts until all the n-grams have
+    # been counted
+    if max_memory:
+        return SpillCounts(max_memory * 1024 * 1024)
+    return {}
+
+def varying_dict(Dict):
+    # return Dict with only the varying n-grams once they have all been
+    # counted; a plain dictionary is returned as it is and the
+    # non-varying n-grams are deleted from it afterwards
+    if isinstance(Dict, SpillCounts):
+        return Dict.varying()
+    return Dict
+
+def add_to_dict(Dict, words, tags):
+    # add an n-gram and its tags to Dict
+    if isinstance(Dict, SpillCounts):
+        Dict.add(words, tags)
+    elif Dict.has_key(words):
+        Dict[words].inc(tags)
+    else:
+        Dict[words] = FreqDist()
+        Dict[words].inc(tags)
+
+# --------------------------------------------------------
+# Extending the n-grams in the array-backed store
+
+def expand_positions(corpus, Grams, n, max_memory=0):
+    # extend every start position of a varying (n-1)-gram in Grams one
+    # word to the left and one word to the right.  Store maps the start
+    # position of each new n-gram to its word key and Dict maps each
+    # word key to the frequency distribution of its tag sequences.
+    Store = {}
+    Dict = new_dict(max_memory)
+    size = len(corpus)
+    sentences = corpus.sentences
+
+    for start in Grams:
+        # extend to the left, unless we are at the beginning of the
+        # corpus or a sentence or have already created an n-gram at that
+        # position
+        if (start > 0) and (not Store.has_key(start-1)) and \
+           (sentences is None or sentences[start-1] == sentences[start]):
+            words = corpus.word_key(start-1, n)
+            Store[start-1] = words
+            add_to_dict(Dict, words, corpus.tag_key(start-1, n))
+
+        # extend to the right, unless the n-gram would run past the end
+        # of the corpus or a sentence or has already been created
+        if (start + n <= size) and (not Store.has_key(start)) and \
+           (sentences is None or sentences[start+n-1] == sentences[start]):
+            words = corpus.word_key(start, n)
+            Store[start] = words
+            add_to_dict(Dict, words, corpus.tag_key(start, n))
+
+    return Store, varying_dict(Dict)
+
+def filter_positions(Store, Dict, min_count=1):
+    # return the ordered start positions of the varying n-grams in Store
+    # that occur at least min_count times and delete the other n-grams
+    # from Dict
+    Grams = array('i')
+
+    starts = Store.keys()
+    starts.sort()
+
+    for i in starts:
+        words = Store[i]
+        if (Dict.has_key(words)):
+            if (Dict[words].B() > 1) and (Dict[words].N() >= min_count):
+                Grams.append(i)
+            else:
+                del Dict[words]
+
+    return Grams
+
+# the corpus of the worker processes, set before they are started
+_corpus = None
+
+def expand_chunk(args):
+    # run by the worker processes: extend one range of the ordered
+    # (n-1)-gram start positions from Grams, given together with the
+    # position in Grams just before the range.  Since the ranges are
+    # extended independently, Store cannot be used to avoid creating an
+    # n-gram twice.  Instead, the n-gram created by extending start to
+    # the left is skipped if start-1 is itself in Grams, since extending
+    # start-1 to the right creates the same n-gram.  Return two partial
+    # tables: one mapping each word key to the counts of its tag keys
+    # and one mapping each word key to its start positions.
+    (chunk, previous, n) = args
+    Counts = {}
+    Starts = {}
+    size = len(_corpus)
+    sentences = _corpus.sentences
+
+    for start in chunk:
+        newstarts = []
+        if (start > 0) and (start-1 != previous) and \
+           (sentences is None or sentences[start-1] == sentences[start]):
+            newstarts.append(start-1)
+        if (start + n <= size) and \
+           (sentences is None or sentences[start+n-1] == sentences[start]):
+            newstarts.append(start)
+
+        for newstart in newstarts:
+            words = _corpus.word_key(newstart, n)
+            tags = _corpus.tag_key(newstart, n)
+            if Counts.has_key(words):
+                Counts[words][tags] = Counts[words].get(tags, 0) + 1
+                Starts[words].append(newstart)
+            else:
+                Counts[words] = {tags: 1}
+                Starts[words] = [newstart]
+
+        previous = start
+
+    return Counts, Starts
+
+def expand_parallel(pool, jobs, Grams, n, metrics, min_count=1):
+    # split Grams into ranges of start positions, extend them on the
+    # process pool, and merge the partial tables into Dict.  Return Dict
+    # and the new Grams with the start positions of the varying n-grams.
+    # The merging is recorded as expansion and the selection of the
+    # varying n-grams as filtering.
+    start = time.time()
+    chunks = []
+    step = len(Grams) / (jobs * 4) + 1
+    for i in range(0, len(Grams), step):
+        if i > 0:
+            previous = Grams[i-1]
+        else:
+            previous = -2
+        chunks.append((Grams[i:i+step], previous, n))
+
+    Dict = {}
+    AllStarts = {}
+    for (Counts, Starts) in pool.imap(expand_chunk, chunks):
+        for words in Counts.keys():
+            if not Dict.has_key(words):
+                Dict[words] = FreqDist()
+                AllStarts[words] = []
+            for tags, count in Counts[words].iteritems():
+                Dict[words].inc(tags, count)
+            AllStarts[words].extend(Starts[words])
+            metrics.add("candidates", len(Starts[words]))
+            del Counts[words]
+
+    metrics.since("expand", start)
+
+    # keep the start positions of the varying n-grams that occur at least
+    # min_count times
+    start = time.time()
+    newgrams = []
+    for words in Dict.keys():
+        if (Dict[words].B() > 1) and (Dict[words].N() >= min_count):
+            newgrams.extend(AllStarts[words])
+        else:
+            del Dict[words]
+        del AllStarts[words]
+    newgrams.sort()
+    metrics.since("filter", start)
+
+    return Dict, array('i', newgrams)
@@ -0,0 +1,185 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is an integer-interned corpus representation for decca-pos.py.
+# Every distinct word and tag is mapped to an integer ID and the corpus
+# is held in two contiguous arrays indexed by corpus position (counting
+# from 0), so that an n-gram is nothing more than a start position and a
+# length.
+
+from array import array
+
+from ngramhash import HashedSequence
+
+class InternedCorpus:
+    """
+    A corpus of (word, tag) pairs stored as two parallel arrays of
+    integer IDs.  The strings for the IDs are kept in the tables
+    C{word_strings} and C{tag_strings}.
+
+    The word or tag sequence of an n-gram is identified by a key
+    returned by C{word_key()} or C{tag_key()}: a hash over the IDs in
+    the corresponding slice of the array (see L{ngramhash}).  These keys
+    are computed in constant time from the start position and length of
+    the n-gram, and the strings are only built from a start position
+    with C{word_string()} and C{tag_string()} when the output is
+    written.
+
+    If the corpus is divided into sentences with C{end_sentence()},
+    C{sentences} holds the sentence number of every corpus position and
+    C{crosses()} tells whether an n-gram extends across a sentence
+    boundary.  Otherwise C{sentences} is C{None}.
+    """
+    def __init__(self):
+        """
+        Construct a new, empty C{InternedCorpus}.
+        """
+        self._words = HashedSequence()
+        self._tags = HashedSequence()
+        self.words = self._words.ids
+        self.tags = self._tags.ids
+        self.word_strings = self._words.strings
+        self.tag_strings = self._tags.strings
+        self.sentences = None
+        self._sentence = 0
+
+    def append(self, word, tag):
+        """
+        Add one (word, tag) pair to the end of the corpus.
+
+        @param word: The word token.
+        @type word: C{string}
+        @param tag: The tag of the word token.
+        @type tag: C{string}
+        @rtype: None
+        """
+        self._words.append(word)
+        self._tags.append(tag)
+        if self.sentences is not None:
+            self.sentences.append(self._sentence)
+
+    def end_sentence(self):
+        """
+        End the current sentence, so that the next pair added starts a
+        new sentence.  The tokens added before the first call are the
+        first sentence.
+
+        @rtype: None
+        """
+        if self.sentences is None:
+            self.sentences = array('i', [0]) * len(self)
+        if len(self) and self.sentences[-1] == self._sentence:
+            self._sentence = self._sentence + 1
+
+    def load(self, words, word_strings, tags, tag_strings, sentences=None,
+             hashes=None):
+        """
+        Fill an empty corpus with the given word and tag IDs, keeping
+        the IDs as they are.
+
+        @param words: The word IDs of the corpus positions.
+        @type words: C{array}
+        @param word_strings: The strings for the word IDs.
+        @type word_strings: C{list}
+        @param tags: The tag IDs of the corpus positions.
+        @type tags: C{array}
+        @param tag_strings: The strings for the tag IDs.
+        @type tag_strings: C{list}
+        @param sentences: The sentence numbers of the corpus positions,
+            or C{None} if the corpus is not divided into sentences.
+        @type sentences: C{array}
+        @param hashes: The base name of the hash files for the prefix
+            hashes (see L{ngramhash.HashedSequence.load}): the words
+            have the hash file C{hashes + ".hashes"} and the tags
+            C{hashes + ".tags.hashes"}.  Without it, the prefix hashes
+            are computed.
+        @type hashes: C{string}
+        @rtype: None
+        @raise IOError: If a hash file cannot be written.
+        """
+        if hashes is None:
+            self._words.load(words, word_strings)
+            self._tags.load(tags, tag_strings)
+        else:
+            self._words.load(words, word_strings, hashes + ".hashes")
+            self._tags.load(tags, tag_strings, hashes + ".tags.hashes")
+        if sentences is not None:
+            self.sentences = array('i', sentences)
+            if len(sentences):
+                self._sentence = sentences[-1]
+
+    def load_cache(self, cache, sentences, hashes=None):
+        """
+        Fill an empty corpus with the words and tags of a corpus cache.
+        With the base name C{hashes} of the hash files (as for
+        C{load()}), the prefix hashes are only computed the first time
+        the cache is loaded.
+
+        @param cache: The corpus cache.
+        @type cache: L{corpuscache.CorpusCache}
+        @param sentences: Whether the corpus is divided into the
+            sentences of the cache.
+        @type sentences: C{bool}
+        @param hashes: The base name of the hash files, usually the
+            file name of the cache.
+        @type hashes: C{string}
+        @rtype: None
+        @raise IOError: If a hash file cannot be written.
+        """
+        strings = cache.strings()
+        numbers = None
+        if sentences:
+            numbers = array('i')
+            starts = cache.sentence_starts.array()
+            for s in range(cache.sentences):
+                numbers.extend(array('i', [s]) * (starts[s+1] - starts[s]))
+        self.load(cache.words.array(), strings, cache.tags.array(), strings, numbers,
+                  hashes)
+
+    def crosses(self, start, n):
+        """
+        @return: True if the n-gram of length C{n} starting at corpus
+            position C{start} extends across a sentence boundary.
+        @rtype: C{bool}
+        """
+        return self.sentences is not None and \
+               self.sentences[start] != self.sentences[start+n-1]
+
+    def __len__(self):
+        return len(self.words)
+
+    def word_key(self, start, n):
+        """
+        @return: The key for the word n-gram of length C{n} starting
+            at corpus position C{start}.
+        @rtype: C{int}
+        """
+        return self._words.key(start, n)
+
+    def tag_key(self, start, n):
+        """
+        @return: The key for the tag sequence of length C{n} starting
+            at corpus position C{start}.
+        @rtype: C{int}
+        """
+        return self._tags.key(start, n)
+
+    def word_string(self, start, n, tokensep):
+        """
+        @return: The words of the n-gram of length C{n} starting at
+            corpus position C{start} joined by C{tokensep}.
+        @rtype: C{string}
+        """
+        return self._words.string(start, n, tokensep)
+
+    def tag_string(self, start, n, tokensep):
+        """
+        @return: The tags of the tag sequence of length C{n} starting at
+            corpus position C{start} joined by C{tokensep}.
+        @rtype: C{string}
+        """
+        return self._tags.string(start, n, tokensep)
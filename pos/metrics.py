@@ -0,0 +1,117 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the metrics stream shared by decca-pos.py, decca-treebank.py,
+# decca-disc.py, and decca-dep.py.  For every n-gram length, one line
+# with a JSON object is written to the metrics file:
+#
+#   {"script": "decca-pos.py", "n": 3, "candidates": 5210,
+#    "varying": 812, "expand_time": 0.061, "filter_time": 0.012,
+#    "output_time": 0.034, "sort_time": 0.002, "peak_rss_kb": 10432,
+#    "elapsed": 1.52}
+#
+# candidates is the number of n-grams generated (by start position) and
+# varying the number of them that were kept as variation n-grams.  The
+# times are in seconds; output_time includes sort_time.  elapsed is the
+# time since the metrics were started.  Without a metrics file, nothing
+# is recorded and the calls cost next to nothing, so that the scripts
+# can make them unconditionally.
+
+import resource
+import time
+
+class Metrics:
+    """
+    The metrics of the n-gram lengths of one run, written to a file as
+    one JSON object per line.
+
+        >>> metrics = Metrics("metrics.jsonl", script="decca-pos.py")
+        >>> start = time.time()
+        >>> metrics.since("expand", start)
+        >>> metrics.add("candidates", 5210)
+        >>> metrics.level(3)
+        >>> metrics.close()
+    """
+    def __init__(self, filename=None, append=False, **fields):
+        """
+        Construct a new C{Metrics}.
+
+        @param filename: The file to write the metrics to, or C{None}
+            to record nothing.
+        @type filename: C{string}
+        @param append: Whether to add to the end of an existing file
+            (e.g. when a run is resumed) instead of overwriting it.
+        @type append: C{bool}
+        @param fields: Fields that are written with every n-gram length,
+            such as the name of the script.
+        """
+        self._file = None
+        self._fields = fields
+        self._record = {}
+        self._start = time.time()
+        if filename:
+            # the json module is only needed for writing metrics
+            import json
+            self._dumps = json.dumps
+            if append:
+                self._file = open(filename, 'a')
+            else:
+                self._file = open(filename, 'w')
+
+    def add(self, name, value):
+        """
+        Add C{value} to the field C{name} of the current n-gram length.
+
+        @rtype: None
+        """
+        if self._file is not None:
+            self._record[name] = self._record.get(name, 0) + value
+
+    def since(self, phase, start):
+        """
+        Add the time since C{start} to the time of C{phase} (the field
+        C{phase}_time) of the current n-gram length.
+
+        @param start: The time the phase started, from C{time.time()}.
+        @type start: C{float}
+        @rtype: None
+        """
+        if self._file is not None:
+            self.add(phase + "_time", time.time() - start)
+
+    def level(self, n, **fields):
+        """
+        Write the fields recorded for the n-gram length C{n} and start
+        recording the next one.
+
+        @param fields: Further fields for this n-gram length only.
+        @rtype: None
+        """
+        if self._file is None:
+            return
+        record = self._fields.copy()
+        record.update(fields)
+        for name, value in self._record.items():
+            if isinstance(value, float):
+                value = round(value, 4)
+            record[name] = value
+        record['n'] = n
+        record['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        record['elapsed'] = round(time.time() - self._start, 4)
+        self._file.write(self._dumps(record, sort_keys=True) + "\n")
+        self._file.flush()
+        self._record = {}
+
+    def close(self):
+        """
+        Close the metrics file.
+
+        @rtype: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,332 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the inverted index over the output files of decca-pos.py.  It
+# maps every word and every tag that appears in a variation n-gram to
+# the output lines that contain it, given by the n-gram length (the
+# number of the output file) and the byte offset of the line in that
+# file.  The index is written while the output files are written and is
+# memory-mapped when it is read, so that a lookup only reads the lines
+# it finds and not the output files themselves.
+#
+# All integers in the file are 32-bit little-endian:
+#
+#   magic               "DECCAIX1"
+#   header              words, tags, postings, string bytes
+#   key offsets         words + tags + 1 offsets into the string data
+#   posting starts      words + tags + 1 indices into the postings
+#   posting lengths     postings n-gram lengths
+#   posting offsets     postings byte offsets into the output files
+#   string data         the output file prefix, then the words and the
+#                       tags, each sorted
+#
+# The postings of a key are sorted by length and offset.  The output
+# files are named by the prefix and the length as in decca-pos.py
+# (prefix + "%03d" % n), so byte offsets are limited to 2 GB per file.
+
+import os
+import sys
+import mmap
+import struct
+import tempfile
+from array import array
+
+magic = "DECCAIX1"
+
+_header = struct.Struct("<4i")
+
+def _little_endian(ids):
+    # arrays are written and read in the byte order of the file
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+def output_filename(prefix, n):
+    """
+    @return: The name of the output file for the n-grams of length
+        C{n}.
+    @rtype: C{string}
+    """
+    return prefix + "%03d" % n
+
+class IndexedFile:
+    """
+    An output file that adds every line written to it to an
+    C{IndexWriter}.  Each call of C{write()} has to write exactly one
+    line, as C{SortedOutput.write()} does.
+
+        >>> output.write(IndexedFile(file, index, n))
+    """
+    def __init__(self, file, index, n):
+        self._file = file
+        self._index = index
+        self._n = n
+        self._offset = 0
+
+    def write(self, line):
+        self._index.add_line(self._n, self._offset, line)
+        self._file.write(line)
+        self._offset += len(line)
+
+def _open_temporary(filename):
+    # a new file with a unique name in the directory of filename, which
+    # is renamed to filename once it is complete
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        (fd, temporary) = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                           suffix=".tmp", dir=directory)
+    except OSError, e:
+        raise IOError(str(e))
+    return (os.fdopen(fd, 'wb'), temporary)
+
+class IndexWriter:
+    """
+    Collects the postings of the words and tags in the output lines of
+    decca-pos.py and writes them to an index file.  The index file is
+    written by C{close()}, under a temporary name first, so that there
+    is never an incomplete index under C{filename}; if it cannot be
+    written, the temporary file is removed.
+
+        >>> index = IndexWriter("ngrams.index", "/output/ngrams.", " ## ")
+        >>> index.add_file(1, "/output/ngrams.001")
+        >>> index.close()
+    """
+    def __init__(self, filename, prefix, tokensep=" ## "):
+        """
+        Construct a new C{IndexWriter} for the output files named by
+        C{prefix}, with the words and tags of an n-gram joined by
+        C{tokensep}.
+
+        @raise IOError: If the file cannot be written.
+        """
+        self._filename = filename
+        (self._file, self._temporary) = _open_temporary(filename)
+        self._prefix = prefix
+        self._tokensep = tokensep
+        # the postings of each key as one array of (n, offset) pairs
+        self._words = {}
+        self._tags = {}
+
+    def add_line(self, n, offset, line):
+        """
+        Add the output line C{line}, which starts at byte C{offset} of
+        the output file for length C{n}.
+
+        @rtype: None
+        """
+        if offset > 0x7fffffff:
+            self._discard()
+            raise IOError("Output file too large to index: " + output_filename(self._prefix, n))
+        fields = line.rstrip("\n").split('\t')
+        tags = {}
+        for tagseq in fields[3::2]:
+            for tag in tagseq.split(self._tokensep):
+                tags[tag] = 1
+        for (Keys, keys) in ((self._words, fields[1].split(self._tokensep)),
+                             (self._tags, tags.keys())):
+            seen = {}
+            for key in keys:
+                if seen.has_key(key):
+                    continue
+                seen[key] = 1
+                try:
+                    postings = Keys[key]
+                except KeyError:
+                    postings = Keys[key] = array('i')
+                postings.append(n)
+                postings.append(offset)
+
+    def add_file(self, n, filename):
+        """
+        Add all lines of an output file that has already been written.
+
+        @rtype: None
+        """
+        file = open(filename, 'rb')
+        offset = 0
+        for line in file:
+            self.add_line(n, offset, line)
+            offset += len(line)
+        file.close()
+
+    def close(self):
+        """
+        Write the index file.
+
+        @rtype: None
+        @raise IOError: If the file cannot be written.
+        """
+        words = self._words.keys()
+        words.sort()
+        tags = self._tags.keys()
+        tags.sort()
+
+        strings = [self._prefix]
+        key_offsets = array('i', [len(self._prefix)])
+        starts = array('i', [0])
+        lengths = array('i')
+        offsets = array('i')
+        for (Keys, keys) in ((self._words, words), (self._tags, tags)):
+            for key in keys:
+                strings.append(key)
+                key_offsets.append(key_offsets[-1] + len(key))
+                # the postings are added in the order the output is
+                # written, which is not always by length
+                postings = Keys[key]
+                pairs = [(postings[i], postings[i+1]) for i in xrange(0, len(postings), 2)]
+                pairs.sort()
+                for (n, offset) in pairs:
+                    lengths.append(n)
+                    offsets.append(offset)
+                starts.append(len(lengths))
+                del Keys[key]
+
+        try:
+            self._file.write(magic)
+            self._file.write(_header.pack(len(words), len(tags), len(lengths),
+                                          key_offsets[-1]))
+            for ids in (key_offsets, starts, lengths, offsets):
+                _little_endian(ids).tofile(self._file)
+            self._file.write("".join(strings))
+            self._file.close()
+            # mkstemp() creates the file readable by its owner only
+            os.chmod(self._temporary, 0644)
+            os.rename(self._temporary, self._filename)
+        except (IOError, OSError), e:
+            self._discard()
+            raise IOError(str(e))
+
+    def _discard(self):
+        # remove the incomplete index under its temporary name
+        self._file.close()
+        try:
+            os.remove(self._temporary)
+        except OSError:
+            pass
+
+class NgramIndex:
+    """
+    An index file of decca-pos.py opened for reading.  The postings of
+    a word or a tag are looked up with C{word()} or C{tag()} and the
+    output lines they point to are read with C{lines()}.
+
+        >>> index = NgramIndex("ngrams.index")
+        >>> for (n, line) in index.lines(index.word("that")):
+        ...     print n, line
+    """
+    def __init__(self, filename, prefix=None):
+        """
+        Open the index file C{filename}.  The output files are looked
+        for under the prefix saved in the index, unless another
+        C{prefix} is given.
+
+        @raise IOError: If the file cannot be read or is not an index.
+        """
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            # an empty file cannot be mapped
+            self._file.close()
+            raise IOError("Not an n-gram index: " + filename)
+        if self._map[:len(magic)] != magic:
+            self.close()
+            raise IOError("Not an n-gram index: " + filename)
+
+        (self._words, self._tags, postings, string_bytes) = \
+            _header.unpack_from(self._map, len(magic))
+        keys = self._words + self._tags
+        offset = len(magic) + _header.size
+        self._key_offsets = self._array(offset, keys + 1)
+        offset += 4 * (keys + 1)
+        self._starts = self._array(offset, keys + 1)
+        offset += 4 * (keys + 1)
+        self._lengths = offset
+        offset += 4 * postings
+        self._offsets = offset
+        offset += 4 * postings
+        self._strings = offset
+        if self._strings + string_bytes > len(self._map):
+            self.close()
+            raise IOError("Truncated n-gram index: " + filename)
+
+        if prefix is None:
+            prefix = self._map[self._strings:self._strings + self._key_offsets[0]]
+        self.prefix = prefix
+
+    def _array(self, offset, length):
+        ids = array('i')
+        ids.fromstring(self._map[offset:offset + 4 * length])
+        return _little_endian(ids)
+
+    def _key(self, i):
+        return self._map[self._strings + self._key_offsets[i]:
+                         self._strings + self._key_offsets[i+1]]
+
+    def _find(self, key, low, high):
+        # binary search for key among the sorted keys from low to high,
+        # reading only the keys that are compared from the file
+        limit = high
+        while low < high:
+            mid = (low + high) / 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < limit and self._key(low) == key:
+            start = self._starts[low]
+            end = self._starts[low+1]
+            lengths = self._array(self._lengths + 4 * start, end - start)
+            offsets = self._array(self._offsets + 4 * start, end - start)
+            return zip(lengths, offsets)
+        return []
+
+    def word(self, word):
+        """
+        @return: The (n, offset) postings of the output lines with
+            variation n-grams that contain the word C{word}, sorted by
+            n and offset.
+        @rtype: C{list}
+        """
+        return self._find(word, 0, self._words)
+
+    def tag(self, tag):
+        """
+        @return: The (n, offset) postings of the output lines with a
+            tag sequence that contains the tag C{tag}, sorted by n and
+            offset.
+        @rtype: C{list}
+        """
+        return self._find(tag, self._words, self._words + self._tags)
+
+    def lines(self, postings):
+        """
+        @return: A generator of (n, line) pairs with the output lines
+            (without the final newline) for C{postings}.
+        @rtype: C{generator}
+        """
+        file = None
+        current = None
+        for (n, offset) in postings:
+            if n != current:
+                if file is not None:
+                    file.close()
+                file = open(output_filename(self.prefix, n), 'rb')
+                current = n
+            file.seek(offset)
+            yield n, file.readline().rstrip("\n")
+        if file is not None:
+            file.close()
+
+    def close(self):
+        """
+        Close the index file.
+
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
@@ -0,0 +1,98 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the non-fringe heuristic of Dickinson and Meurers (2003) for
+# the variation n-grams of decca-pos.py.  The variation nucleus of a
+# variation n-gram is made up of the words whose tags differ between
+# its tag sequences.  A nucleus is on the fringe if it includes the
+# first or the last word of the n-gram; otherwise it is surrounded by
+# identical context on both sides, and such non-fringe nuclei are the
+# most likely to be errors.  The longer the n-gram in which a nucleus is
+# still non-fringe, the more context it has.
+#
+# The variation n-grams are added one length at a time while they are
+# found, so that the nuclei can be ranked by their longest non-fringe
+# context at the end of the same run, without reading the output files
+# again.
+
+class NonFringeNuclei:
+    """
+    The words that are the nucleus of a non-fringe variation n-gram,
+    each with the longest such n-gram.
+
+        >>> nuclei = NonFringeNuclei(" ## ")
+        >>> for n, Dict in variation_ngrams(pairs):
+        ...     nuclei.add_level(n, Dict)
+        >>> for (n, word, words, dist) in nuclei.ranked():
+        ...     print n, word, words, dist.N()
+    """
+    def __init__(self, tokensep=" ## "):
+        """
+        Construct a new C{NonFringeNuclei} for n-grams with the words
+        and tags joined by C{tokensep}.
+        """
+        self._tokensep = tokensep
+        # the longest non-fringe n-gram for each nucleus word, as a
+        # tuple (n, count, words, dist)
+        self._nuclei = {}
+
+    def add(self, n, words, dist):
+        """
+        Add the variation n-gram C{words} of length C{n} with the
+        C{FreqDist} C{dist} of its tag sequences.
+
+        @rtype: None
+        """
+        # a nucleus can only have context on both sides from n = 3
+        if n < 3:
+            return
+        Tags = [tags.split(self._tokensep) for tags in dist.samples()]
+        first = Tags[0]
+
+        nucleus = []
+        for i in range(n):
+            for tags in Tags[1:]:
+                if tags[i] != first[i]:
+                    nucleus.append(i)
+                    break
+        if not nucleus or nucleus[0] == 0 or nucleus[-1] == n - 1:
+            return
+
+        wordlist = words.split(self._tokensep)
+        count = dist.N()
+        for i in nucleus:
+            word = wordlist[i]
+            best = self._nuclei.get(word)
+            if best is None or (n, count) > best[:2]:
+                self._nuclei[word] = (n, count, words, dist)
+
+    def add_level(self, n, Dict):
+        """
+        Add the variation n-grams of length C{n} in C{Dict}, which maps
+        each n-gram to the C{FreqDist} of its tag sequences.
+
+        @rtype: None
+        """
+        for words, dist in Dict.iteritems():
+            self.add(n, words, dist)
+
+    def __len__(self):
+        return len(self._nuclei)
+
+    def ranked(self):
+        """
+        @return: A list of (n, word, words, dist) tuples, one for each
+            nucleus word, where C{words} is the longest non-fringe
+            variation n-gram of the word, with its length C{n} and the
+            C{FreqDist} C{dist} of its tag sequences.  The list is
+            sorted by decreasing length and total count.
+        @rtype: C{list}
+        """
+        ranked = [(-n, -count, word)
+                  for word, (n, count, words, dist) in self._nuclei.iteritems()]
+        ranked.sort()
+        return [(-n, word) + self._nuclei[word][2:] for (n, count, word) in ranked]
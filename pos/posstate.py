@@ -0,0 +1,242 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the persistent state for incremental runs of decca-pos.py.
+# A state directory holds the interned corpus and, for every n-gram
+# length n, a table of the variation n-grams found so far:
+#
+#   corpus.words, corpus.tags   the word and tag ID arrays
+#   words.txt, tags.txt         the strings for the IDs, one per line
+#   corpus.sentences            the sentence numbers, if the corpus is
+#                               divided into sentences
+#   level.NNN                   the table for the n-grams of length n
+#
+# A table maps the word key of each variation n-gram to a pair
+# (counts, positions): a dictionary from tag keys to counts and an array
+# of the corpus positions where the n-gram starts.
+#
+# When new tokens are appended to the corpus, only the n-grams that
+# overlap the new tokens can change, so append_tokens() only looks at
+# those and returns the lengths n whose tables were changed.  In a
+# corpus divided into sentences, the appended tokens start a new
+# sentence.
+
+import os
+import cPickle
+from array import array
+
+from intcorpus import InternedCorpus
+
+def level_filename(dirname, n):
+    return os.path.join(dirname, "level.%03d" % n)
+
+def level_table(corpus, Dict, Grams, n):
+    """
+    Build the table for the n-grams of length C{n} from the C{Dict}
+    of variation n-grams and the start positions in C{Grams} used in
+    the main loop of decca-pos.py.
+    """
+    Table = {}
+    for words in Dict.keys():
+        dist = Dict[words]
+        counts = {}
+        for tags in dist.samples():
+            counts[tags] = dist.count(tags)
+        Table[words] = (counts, array('i'))
+
+    for start in Grams:
+        Table[corpus.word_key(start, n)][1].append(start)
+
+    return Table
+
+def create_state(dirname):
+    """
+    Create an empty state directory, removing the tables of a previous
+    state if there are any.
+    """
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    for filename in os.listdir(dirname):
+        if filename.startswith("level."):
+            os.remove(os.path.join(dirname, filename))
+
+def save_level(dirname, n, Table):
+    file = open(level_filename(dirname, n), 'wb')
+    cPickle.dump(Table, file, 2)
+    file.close()
+
+def save_corpus(dirname, corpus):
+    for (name, ids, strings) in (("words", corpus.words, corpus.word_strings),
+                                 ("tags", corpus.tags, corpus.tag_strings)):
+        file = open(os.path.join(dirname, "corpus." + name), 'wb')
+        ids.tofile(file)
+        file.close()
+        file = open(os.path.join(dirname, name + ".txt"), 'w')
+        for string in strings:
+            file.write(string + "\n")
+        file.close()
+
+    filename = os.path.join(dirname, "corpus.sentences")
+    if corpus.sentences is not None:
+        file = open(filename, 'wb')
+        corpus.sentences.tofile(file)
+        file.close()
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+def load_state(dirname):
+    """
+    @return: The corpus and the list of tables (for n = 1, 2, ...)
+        saved in the state directory C{dirname}.
+    @rtype: (C{InternedCorpus}, C{list} of C{dict})
+    """
+    words = open(os.path.join(dirname, "words.txt")).read().split("\n")[:-1]
+    tags = open(os.path.join(dirname, "tags.txt")).read().split("\n")[:-1]
+
+    Ids = {}
+    for (name, typecode) in (("words", 'l'), ("tags", 'l'), ("sentences", 'i')):
+        filename = os.path.join(dirname, "corpus." + name)
+        if not os.path.exists(filename) and name == "sentences":
+            Ids[name] = None
+            continue
+        Ids[name] = array(typecode)
+        file = open(filename, 'rb')
+        Ids[name].fromfile(file, os.path.getsize(filename) / Ids[name].itemsize)
+        file.close()
+
+    # the IDs are kept as they were saved, since the keys in the tables
+    # are computed from them
+    corpus = InternedCorpus()
+    corpus.load(Ids["words"], words, Ids["tags"], tags, Ids["sentences"])
+
+    Levels = []
+    n = 1
+    while os.path.exists(level_filename(dirname, n)):
+        file = open(level_filename(dirname, n), 'rb')
+        Levels.append(cPickle.load(file))
+        file.close()
+        n = n + 1
+
+    return corpus, Levels
+
+def append_tokens(corpus, Levels, pairs):
+    """
+    Append the (word, tag) pairs to C{corpus} and update the tables in
+    C{Levels}, adding tables for new n-gram lengths as needed.  A
+    C{None} in the pairs marks a sentence boundary, as for
+    L{decca_pos.variation_ngrams}.
+
+    @return: The n-gram lengths whose tables were changed.
+    @rtype: C{list} of C{int}
+    """
+    old_size = len(corpus)
+    if corpus.sentences is not None:
+        corpus.end_sentence()
+    for pair in pairs:
+        if pair is None:
+            if corpus.sentences is not None:
+                corpus.end_sentence()
+        else:
+            corpus.append(pair[0], pair[1])
+    size = len(corpus)
+
+    index = _PositionIndex(corpus)
+    changed = []
+    previous = None
+    n = 1
+
+    while 1:
+        if n <= len(Levels):
+            Table = Levels[n-1]
+        else:
+            Table = {}
+
+        # find the n-grams that overlap the new tokens; beyond the
+        # unigrams, only n-grams with a varying (n-1)-gram at the
+        # beginning or end can vary
+        Touched = {}
+        for start in xrange(max(0, old_size - n + 1), size - n + 1):
+            if corpus.crosses(start, n):
+                continue
+            if n > 1 and not (previous.has_key(corpus.word_key(start, n-1)) or
+                              previous.has_key(corpus.word_key(start+1, n-1))):
+                continue
+            words = corpus.word_key(start, n)
+            if Touched.has_key(words):
+                Touched[words].append(start)
+            else:
+                Touched[words] = [start]
+
+        if not Touched and n > len(Levels):
+            break
+
+        for words, starts in Touched.iteritems():
+            if Table.has_key(words):
+                # a variation n-gram stays a variation n-gram, only its
+                # counts change
+                (counts, positions) = Table[words]
+            else:
+                # this n-gram did not vary before, so count all of its
+                # occurrences
+                starts = index.find(starts[0], n)
+                (counts, positions) = ({}, array('i'))
+            for start in starts:
+                tags = corpus.tag_key(start, n)
+                counts[tags] = counts.get(tags, 0) + 1
+                positions.append(start)
+            if len(counts) > 1:
+                Table[words] = (counts, positions)
+                if not changed or changed[-1] != n:
+                    changed.append(n)
+
+        if n > len(Levels):
+            if not Table:
+                break
+            Levels.append(Table)
+
+        previous = Table
+        n = n + 1
+
+    return changed
+
+class _PositionIndex:
+    # an index from word IDs to the corpus positions where they occur,
+    # built the first time it is needed, for finding all occurrences
+    # of an n-gram
+    def __init__(self, corpus):
+        self._corpus = corpus
+        self._positions = None
+
+    def find(self, first, n):
+        # find all occurrences of the n-gram that occurs at first
+        if self._positions is None:
+            self._positions = {}
+            i = 0
+            for id in self._corpus.words:
+                if self._positions.has_key(id):
+                    self._positions[id].append(i)
+                else:
+                    self._positions[id] = array('i', [i])
+                i = i + 1
+
+        words = self._corpus.word_key(first, n)
+        ids = self._corpus.words[first:first+n]
+
+        # start from the least frequent word in the n-gram
+        best = 0
+        for j in range(1, n):
+            if len(self._positions[ids[j]]) < len(self._positions[ids[best]]):
+                best = j
+
+        starts = []
+        for position in self._positions[ids[best]]:
+            start = position - best
+            if start >= 0 and start + n <= len(self._corpus) and \
+               self._corpus.word_key(start, n) == words and \
+               not self._corpus.crosses(start, n):
+                starts.append(start)
+        return starts
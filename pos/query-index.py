@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This script looks up words and tags in the index written by
+# decca-pos.py with -i/--index and prints the variation n-grams that
+# contain all of them, in the format of the output files with the
+# n-gram length in front of each line.
+
+# --------------------------------------------------------
+
+import getopt
+import sys
+import time
+
+from ngramindex import NgramIndex
+
+usage = "Usage: " + sys.argv[0] + " [-p output_prefix] [-t tag ...] ngrams.index [word ...]"
+
+try:
+  opts, args = getopt.getopt(sys.argv[1:], "p:t:h", ['prefix=','tag=','help'])
+except getopt.GetoptError:
+  print usage
+  sys.exit(1)
+
+prefix = None
+tags = []
+for option, specification in opts:
+  if option in ("-p", "--prefix"):
+    prefix = specification
+  elif option in ("-t", "--tag"):
+    tags.append(specification)
+  elif option in ("-h", "--help"):
+    print usage
+    print """
+Options:
+
+-p/--prefix  specify the path and stem of the output files (e.g.
+             /path/to/output/dir/ngrams.) if they have been moved
+-t/--tag     look up a tag (can be given more than once)
+-h/--help    display this help menu
+"""
+    sys.exit()
+
+if not args or (len(args) == 1 and not tags):
+  print usage
+  sys.exit(1)
+
+start = time.time()
+
+try:
+  index = NgramIndex(args[0], prefix)
+except IOError, e:
+  sys.stderr.write("Error: Unable to read index " + args[0] + ": " + str(e) + "\n")
+  sys.exit(1)
+
+# the lines that contain all words and tags are the intersection of
+# their postings
+postings = None
+for postinglist in [index.word(word) for word in args[1:]] + [index.tag(tag) for tag in tags]:
+  if postings is None:
+    postings = postinglist
+  else:
+    found = {}
+    for posting in postinglist:
+      found[posting] = 1
+    postings = [posting for posting in postings if found.has_key(posting)]
+
+try:
+  for (n, line) in index.lines(postings):
+    print str(n) + "\t" + line
+except IOError, e:
+  sys.stderr.write("Error: " + str(e) + "\n")
+  sys.exit(1)
+index.close()
+
+sys.stderr.write("%d variation n-grams found (%.3fs).\n" % (len(postings), time.time() - start))
@@ -0,0 +1,147 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is a memory-bounded replacement for the Dict of decca-pos.py
+# while the n-grams of one length are being counted.  Most word n-grams
+# (and almost all of the unigrams and bigrams) occur with only one tag
+# sequence and are deleted from Dict as soon as all n-grams have been
+# counted, but until then Dict holds all of them.  SpillCounts holds the
+# counts in memory up to a limit and then writes them as a sorted run to
+# a temporary file.  At the end the runs are merged, the counts for the
+# same n-gram are added up, and only the varying n-grams are kept.
+
+import heapq
+import marshal
+import tempfile
+
+from nltk_freqdist import *
+
+class SpillCounts:
+    """
+    The counts of the tag sequences of word n-grams, spilled to
+    temporary files when they do not fit in the memory limit.
+
+        >>> counts = SpillCounts(limit)
+        >>> counts.add("the ## man", "DT ## NN")
+        >>> Dict = counts.varying()
+    """
+    def __init__(self, limit):
+        """
+        Construct a new, empty C{SpillCounts}.
+
+        @param limit: The number of bytes of counts to hold in memory
+            before a sorted run is written to a temporary file.
+        @type limit: C{int}
+        """
+        self._limit = limit
+        self._counts = {}
+        self._size = 0
+        self._runs = []
+
+    def add(self, words, tags):
+        """
+        Count one occurrence of the word n-gram C{words} with the tag
+        sequence C{tags}.
+
+        @rtype: None
+        """
+        try:
+            dist = self._counts[words]
+        except KeyError:
+            dist = self._counts[words] = FreqDist()
+            # count the words plus the FreqDist overhead
+            self._size += _sizeof(words) + 100
+        if dist.count(tags):
+            dist.inc(tags)
+        else:
+            dist.inc(tags)
+            # a second tag sequence also creates the dictionary of counts
+            self._size += _sizeof(tags) + 100
+            if self._size > self._limit:
+                self._spill()
+
+    def runs(self):
+        """
+        @return: The number of sorted runs written to temporary files.
+        @rtype: C{int}
+        """
+        return len(self._runs)
+
+    def varying(self):
+        """
+        @return: A dictionary that maps each word n-gram that occurs
+            with more than one tag sequence to a C{FreqDist} of its tag
+            sequences, as in the C{Dict} of decca-pos.py.
+        @rtype: C{dict}
+        """
+        Dict = {}
+
+        if not self._runs:
+            for words, dist in self._counts.iteritems():
+                if dist.B() > 1:
+                    Dict[words] = dist
+            self._counts = {}
+            self._size = 0
+            return Dict
+
+        if self._counts:
+            self._spill()
+
+        # the runs are sorted by words, so all counts for one n-gram
+        # come one after the other
+        words = None
+        dist = {}
+        for (nextwords, tags, count) in heapq.merge(*[_read(run) for run in self._runs]):
+            if nextwords != words:
+                if len(dist) > 1:
+                    Dict[words] = _freqdist(dist)
+                words = nextwords
+                dist = {}
+            dist[tags] = dist.get(tags, 0) + count
+        if len(dist) > 1:
+            Dict[words] = _freqdist(dist)
+
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        return Dict
+
+    def _spill(self):
+        # write the counts in memory as a sorted run to a temporary file
+        run = tempfile.TemporaryFile()
+        allwords = self._counts.keys()
+        allwords.sort()
+        for words in allwords:
+            dist = self._counts[words]
+            alltags = dist.samples()
+            alltags.sort()
+            for tags in alltags:
+                marshal.dump((words, tags, dist.count(tags)), run)
+        run.seek(0)
+        self._runs.append(run)
+        self._counts = {}
+        self._size = 0
+
+def _sizeof(key):
+    # the keys are strings, or hashes in the array-backed store
+    if isinstance(key, str):
+        return len(key)
+    return 8
+
+def _read(run):
+    # read the (words, tags, count) items of a sorted run one at a time
+    while 1:
+        try:
+            yield marshal.load(run)
+        except EOFError:
+            return
+
+def _freqdist(dist):
+    fd = FreqDist()
+    for tags, count in dist.iteritems():
+        fd.inc(tags, count)
+    return fd
@@ -0,0 +1,207 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is a suffix array engine for decca-pos.py.  Instead of building
+# the variation n-grams one length at a time, it builds one suffix array
+# and LCP array over the word IDs of an InternedCorpus and finds all
+# variation n-grams of every length in a single sweep over the LCP
+# intervals.
+#
+# Every word n-gram that occurs more than once corresponds to exactly one
+# LCP interval (the block of suffixes in the suffix array that start with
+# it), so each repeated n-gram is visited once with all of its corpus
+# positions.  An n-gram is a variation n-gram if the tag sequences at
+# these positions are not all identical.  Since a varying n-gram always
+# contains a varying (n-1)-gram, this finds exactly the n-grams that the
+# level-by-level main loop of decca-pos.py finds.
+#
+# If the corpus is divided into sentences, a distinct sentinel ID is put
+# between the sentences, so that no common prefix extends across a
+# sentence boundary.
+
+from array import array
+
+from nltk_freqdist import *
+
+def suffix_array(seq):
+    """
+    Sort the suffixes of C{seq} by prefix doubling.
+
+    @return: The start positions of the suffixes of C{seq} in
+        lexicographic order.
+    @rtype: C{list} of C{int}
+    @param seq: A sequence of non-negative integers.
+    @type seq: C{array} or C{list}
+    """
+    size = len(seq)
+    if size == 0:
+        return []
+
+    sa = range(size)
+    rank = list(seq)
+    k = 1
+
+    while 1:
+        # sort on the pair (rank of the first k items, rank of the next
+        # k items), packed into a single integer
+        base = max(rank) + 2
+        key = [0] * size
+        for i in xrange(size):
+            if i + k < size:
+                key[i] = rank[i] * base + rank[i+k] + 1
+            else:
+                key[i] = rank[i] * base
+        sa.sort(key=key.__getitem__)
+
+        # rerank: suffixes with the same key share a rank
+        rank[sa[0]] = 0
+        for j in xrange(1, size):
+            if key[sa[j]] == key[sa[j-1]]:
+                rank[sa[j]] = rank[sa[j-1]]
+            else:
+                rank[sa[j]] = rank[sa[j-1]] + 1
+
+        # all ranks are distinct, so the suffixes are sorted
+        if rank[sa[-1]] == size - 1:
+            return sa
+        k = k * 2
+
+def lcp_array(seq, sa):
+    """
+    Compute the longest common prefix of each pair of neighboring
+    suffixes in the suffix array (Kasai et al. 2001).
+
+    @return: A list where item C{i} is the length of the longest common
+        prefix of the suffixes at C{sa[i-1]} and C{sa[i]} (item 0 is 0).
+    @rtype: C{list} of C{int}
+    """
+    size = len(seq)
+    rank = [0] * size
+    for i in xrange(size):
+        rank[sa[i]] = i
+
+    lcp = [0] * size
+    h = 0
+    for i in xrange(size):
+        if rank[i] > 0:
+            j = sa[rank[i]-1]
+            while i + h < size and j + h < size and seq[i+h] == seq[j+h]:
+                h = h + 1
+            lcp[rank[i]] = h
+            if h > 0:
+                h = h - 1
+        else:
+            h = 0
+    return lcp
+
+def lcp_intervals(lcp):
+    """
+    Generate the LCP intervals of an LCP array bottom-up (Abouelhoda et
+    al. 2004).
+
+    @return: A generator of (lcp, parent_lcp, lb, rb) tuples: the
+        suffixes C{sa[lb..rb]} share a common prefix of length C{lcp},
+        while the enclosing interval shares only C{parent_lcp} items.
+    """
+    stack = [(0, 0)]
+    size = len(lcp)
+
+    for i in xrange(1, size + 1):
+        if i < size:
+            h = lcp[i]
+        else:
+            h = 0
+        lb = i - 1
+        while h < stack[-1][0]:
+            (l, lb) = stack.pop()
+            yield l, max(h, stack[-1][0]), lb, i - 1
+        if h > stack[-1][0]:
+            stack.append((h, lb))
+
+def variation_levels(corpus):
+    """
+    Find all variation n-grams in an C{InternedCorpus}.
+
+    @return: A list of (Dict, Starts) pairs, one for each n-gram length
+        from 1 up to the longest variation n-gram.  Dict maps the word
+        key of a variation n-gram to a C{FreqDist} of the tag keys of
+        its occurrences, as in the C{Dict} of decca-pos.py, and Starts
+        holds one start position for each of its tag sequences, from
+        which the strings for the output are built.
+    @rtype: C{list} of C{tuple}
+    """
+    (seq, Positions) = _sentence_sequence(corpus)
+
+    sa = suffix_array(seq)
+    lcp = lcp_array(seq, sa)
+
+    Levels = []
+
+    for (l, parent_l, lb, rb) in lcp_intervals(lcp):
+        positions = sa[lb:rb+1]
+        if Positions is not None:
+            positions = [Positions[i] for i in positions]
+
+        # skip intervals where all occurrences have the same tags for
+        # the longest n-gram, since then no shorter one varies either
+        if not _varies(corpus, positions, l):
+            continue
+
+        # the shortest n-gram in this interval that varies; all the
+        # longer ones vary as well
+        low = parent_l + 1
+        high = l
+        while low < high:
+            mid = (low + high) / 2
+            if _varies(corpus, positions, mid):
+                high = mid
+            else:
+                low = mid + 1
+
+        for n in range(low, l + 1):
+            while len(Levels) < n:
+                Levels.append(({}, array('i')))
+            (Dict, Starts) = Levels[n-1]
+            dist = FreqDist()
+            for start in positions:
+                tags = corpus.tag_key(start, n)
+                if not dist.count(tags):
+                    Starts.append(start)
+                dist.inc(tags)
+            Dict[corpus.word_key(positions[0], n)] = dist
+
+    return Levels
+
+def _sentence_sequence(corpus):
+    # return the sequence the suffix array is built over and the corpus
+    # position of each of its items, or None if they are the same.  With
+    # sentences, every sentence but the last is followed by a sentinel
+    # ID that occurs nowhere else (at corpus position -1).
+    sentences = corpus.sentences
+    if sentences is None:
+        return corpus.words, None
+
+    seq = array('l')
+    Positions = array('l')
+    sentinel = len(corpus.word_strings)
+    for i in xrange(len(corpus)):
+        if i > 0 and sentences[i] != sentences[i-1]:
+            seq.append(sentinel)
+            Positions.append(-1)
+            sentinel = sentinel + 1
+        seq.append(corpus.words[i])
+        Positions.append(i)
+    return seq, Positions
+
+def _varies(corpus, positions, n):
+    # return 1 if the tag sequences of length n at positions are not all
+    # identical
+    tags = corpus.tag_key(positions[0], n)
+    for start in positions:
+        if corpus.tag_key(start, n) != tags:
+            return 1
+    return 0
@@ -0,0 +1,259 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the binary constituent cache of decca-treebank.py.  The
+# constituents file is read from its text format once and written to a
+# cache file, which holds the nonterminals bucketed by the length of
+# their yield: for each length, the corpus positions where the
+# nonterminals start and their cats as integer IDs into a string table.
+# The words of the yields are not stored, since they are the words of
+# the corpus at these positions (in the corpus cache).  The cache file is
+# memory-mapped, so that a run for one unit length only reads the bucket
+# for that length.
+#
+# All integers in the file are 32-bit little-endian:
+#
+#   magic               "DECCACN1"
+#   header              constituents, buckets, strings, string bytes
+#   lengths             buckets yield lengths, in increasing order
+#   bucket starts       buckets + 1 indices into the constituents
+#   positions           constituents corpus positions
+#   cats                constituents string IDs
+#   string offsets      strings + 1 offsets into the string data
+#   string data         the strings, one after the other
+#
+# Corpus positions count from 1, as in the constituents file, and the
+# nonterminals of one length are in the order of the constituents file.
+
+import os
+import sys
+import tempfile
+import mmap
+import struct
+from array import array
+
+magic = "DECCACN1"
+
+_header = struct.Struct("<4i")
+
+def _open_temporary(filename):
+    # a new file with a unique name in the directory of filename, which
+    # is renamed to filename once it is complete
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        (fd, temporary) = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                           suffix=".tmp", dir=directory)
+    except OSError, e:
+        raise IOError(str(e))
+    return (os.fdopen(fd, 'wb'), temporary)
+
+def _little_endian(ids):
+    # arrays are written and read in the byte order of the file
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+class ConstituentCache:
+    """
+    A constituent cache file opened for reading.  The nonterminals of
+    a yield length are read with C{bucket()}.
+
+        >>> Constituents = ConstituentCache("corpus.cons.cache")
+        >>> Constituents.lengths()
+        [1, 2, 3, 5]
+        >>> Constituents.bucket(2)
+        [(4, 'NP'), (17, 'PP')]
+    """
+    def __init__(self, filename):
+        """
+        Open the constituent cache C{filename}.
+
+        @raise IOError: If the file cannot be read or is not a
+            constituent cache.
+        """
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            # an empty file cannot be mapped
+            self._file.close()
+            raise IOError("Not a constituent cache: " + filename)
+        if self._map[:len(magic)] != magic:
+            self.close()
+            raise IOError("Not a constituent cache: " + filename)
+
+        (constituents, buckets, strings, string_bytes) = \
+            _header.unpack_from(self._map, len(magic))
+        offset = len(magic) + _header.size
+        lengths = self._array(offset, buckets)
+        offset += 4 * buckets
+        starts = self._array(offset, buckets + 1)
+        offset += 4 * (buckets + 1)
+        self._positions = offset
+        offset += 4 * constituents
+        self._cats = offset
+        offset += 4 * constituents
+        self._string_offsets = offset
+        self._string_data = offset + 4 * (strings + 1)
+        self._string_count = strings
+        if self._string_data + string_bytes > len(self._map):
+            self.close()
+            raise IOError("Truncated constituent cache: " + filename)
+
+        self._buckets = {}
+        for i in range(buckets):
+            self._buckets[lengths[i]] = (starts[i], starts[i+1])
+        self._strings = None
+        self._constituents = constituents
+
+    def __len__(self):
+        return self._constituents
+
+    def _array(self, offset, length):
+        ids = array('i')
+        ids.fromstring(self._map[offset:offset + 4 * length])
+        return _little_endian(ids)
+
+    def lengths(self):
+        """
+        @return: The yield lengths of the nonterminals, in increasing
+            order.
+        @rtype: C{list} of C{int}
+        """
+        lengths = self._buckets.keys()
+        lengths.sort()
+        return lengths
+
+    def count(self, length):
+        """
+        @return: The number of nonterminals with a yield of length
+            C{length}.
+        @rtype: C{int}
+        """
+        (start, end) = self._buckets.get(length, (0, 0))
+        return end - start
+
+    def positions(self, length):
+        """
+        @return: The corpus positions of the nonterminals with a yield
+            of length C{length}.
+        @rtype: C{array}
+        """
+        (start, end) = self._buckets.get(length, (0, 0))
+        return self._array(self._positions + 4 * start, end - start)
+
+    def bucket(self, length):
+        """
+        @return: A list of (position, cat) pairs, one for each
+            nonterminal with a yield of length C{length} (which is
+            empty if there are none).
+        @rtype: C{list}
+        """
+        (start, end) = self._buckets.get(length, (0, 0))
+        strings = self.strings()
+        cats = self._array(self._cats + 4 * start, end - start)
+        return zip(self.positions(length), [strings[id] for id in cats])
+
+    def strings(self):
+        """
+        @return: A list of all strings, indexed by their IDs.
+        @rtype: C{list}
+        """
+        if self._strings is None:
+            offsets = self._array(self._string_offsets, self._string_count + 1)
+            data = self._map[self._string_data:self._string_data + offsets[-1]]
+            self._strings = [data[offsets[id]:offsets[id+1]]
+                             for id in range(self._string_count)]
+        return self._strings
+
+    def close(self):
+        """
+        Close the constituent cache.
+
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
+
+class ConstituentCacheWriter:
+    """
+    Writes the nonterminals of a constituents file to a constituent
+    cache file.  The nonterminals are added with C{append()} and the
+    file is written by C{close()}.  (The file is first written under a
+    temporary name of its own, so that there is never an incomplete
+    cache under C{filename}, even while several processes create the
+    same cache.)
+
+        >>> writer = ConstituentCacheWriter("corpus.cons.cache")
+        >>> writer.append(4, "NP", 2)
+        >>> writer.close()
+    """
+    def __init__(self, filename):
+        """
+        Construct a new C{ConstituentCacheWriter}.
+
+        @raise IOError: If the file cannot be written.
+        """
+        self._filename = filename
+        (self._file, self._temporary) = _open_temporary(filename)
+        # the positions and cat IDs of each length
+        self._buckets = {}
+        self._strings = []
+        self._string_ids = {}
+
+    def _intern(self, string):
+        try:
+            return self._string_ids[string]
+        except KeyError:
+            id = len(self._strings)
+            self._string_ids[string] = id
+            self._strings.append(string)
+            return id
+
+    def append(self, position, cat, length):
+        """
+        Add a nonterminal with the cat C{cat}, whose yield of length
+        C{length} starts at corpus position C{position}.
+
+        @rtype: None
+        """
+        try:
+            (positions, cats) = self._buckets[length]
+        except KeyError:
+            (positions, cats) = self._buckets[length] = (array('i'), array('i'))
+        positions.append(position)
+        cats.append(self._intern(cat))
+
+    def close(self):
+        """
+        Write the constituent cache file.
+
+        @rtype: None
+        """
+        lengths = self._buckets.keys()
+        lengths.sort()
+        starts = array('i', [0])
+        for length in lengths:
+            starts.append(starts[-1] + len(self._buckets[length][0]))
+        offsets = array('i', [0])
+        for string in self._strings:
+            offsets.append(offsets[-1] + len(string))
+
+        self._file.write(magic)
+        self._file.write(_header.pack(starts[-1], len(lengths), len(self._strings),
+                                      offsets[-1]))
+        _little_endian(array('i', lengths)).tofile(self._file)
+        _little_endian(starts).tofile(self._file)
+        for column in (0, 1):
+            for length in lengths:
+                _little_endian(self._buckets[length][column]).tofile(self._file)
+        _little_endian(offsets).tofile(self._file)
+        self._file.write("".join(self._strings))
+        self._file.close()
+        # mkstemp() creates the file readable by its owner only
+        os.chmod(self._temporary, 0644)
+        os.rename(self._temporary, self._filename)
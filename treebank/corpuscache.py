@@ -0,0 +1,372 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the binary corpus cache shared by decca-pos.py,
+# decca-treebank.py, decca-disc.py, and decca-dep.py.  A corpus is read
+# from its text format once and written to a cache file, which holds
+# every token as integer IDs into a string table, one ID per column
+# (word, tag, and for decca-dep.py the dependency relation and the
+# surface word), together with the start positions and ids of the
+# sentences.  The cache file is memory-mapped and read in place, so
+# opening it takes no time however large the corpus is.
+#
+# All integers in the file are 32-bit little-endian:
+#
+#   magic               "DECCACC1"
+#   header              tokens, columns, sentences, strings, string bytes
+#   columns             columns arrays of tokens string IDs
+#   sentence starts     sentences + 1 corpus positions (the last is tokens)
+#   sentence ids        sentences string IDs
+#   string offsets      strings + 1 offsets into the string data
+#   string data         the strings, one after the other
+#
+# Corpus positions count from 0.
+
+import os
+import sys
+import tempfile
+import mmap
+import struct
+from array import array
+from bisect import bisect_right
+
+magic = "DECCACC1"
+
+_header = struct.Struct("<5i")
+_int = struct.Struct("<i")
+
+# the number of IDs unpacked at once when iterating over a column
+_chunk = 65536
+
+def _open_temporary(filename):
+    # a new file with a unique name in the directory of filename, which
+    # is renamed to filename once it is complete
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        (fd, temporary) = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                           suffix=".tmp", dir=directory)
+    except OSError, e:
+        raise IOError(str(e))
+    return (os.fdopen(fd, 'wb'), temporary)
+
+def _little_endian(ids):
+    # arrays are written and read in the byte order of the file
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+def is_corpus_cache(filename):
+    """
+    @return: True if C{filename} is a corpus cache file (rather than a
+        corpus in a text format).
+    @rtype: C{bool}
+    """
+    try:
+        file = open(filename, 'rb')
+    except IOError:
+        return False
+    start = file.read(len(magic))
+    file.close()
+    return start == magic
+
+class IntView:
+    """
+    A read-only sequence of the 32-bit integers in a part of a
+    memory-mapped file.  Single items are unpacked from the file when
+    they are looked up, so that nothing is copied into memory.
+    """
+    def __init__(self, map, offset, length):
+        """
+        Construct a new C{IntView} of the C{length} integers starting
+        at byte C{offset} of C{map}.
+        """
+        self._map = map
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i = i + self._length
+        if i < 0 or i >= self._length:
+            raise IndexError(i)
+        return _int.unpack_from(self._map, self._offset + 4 * i)[0]
+
+    def __iter__(self):
+        for start in range(0, self._length, _chunk):
+            for id in self.array(start, min(start + _chunk, self._length)):
+                yield id
+
+    def array(self, start=0, end=None):
+        """
+        @return: A copy of the integers from C{start} to C{end} (or to
+            the end) in memory.
+        @rtype: C{array}
+        """
+        if end is None:
+            end = self._length
+        ids = array('i')
+        ids.fromstring(self._map[self._offset + 4 * start:self._offset + 4 * end])
+        return _little_endian(ids)
+
+class CorpusCache:
+    """
+    A corpus cache file opened for reading.  The IDs of the tokens in
+    each column are in C{columns} (the words in C{words} and the tags
+    in C{tags}) and the strings for the IDs are looked up with
+    C{string()}.  The sentences are given by C{sentence_starts}, which
+    holds the start position of each sentence and the length of the
+    corpus at the end.
+
+        >>> cache = CorpusCache("corpus.cache")
+        >>> cache.word(0), cache.tag(0)
+        ('The', 'DT')
+        >>> cache.starts_sentence(0)
+        True
+    """
+    def __init__(self, filename):
+        """
+        Open the corpus cache C{filename}.
+
+        @raise IOError: If the file cannot be read or is not a corpus
+            cache.
+        """
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            # an empty file cannot be mapped
+            self._file.close()
+            raise IOError("Not a corpus cache: " + filename)
+        if self._map[:len(magic)] != magic:
+            self.close()
+            raise IOError("Not a corpus cache: " + filename)
+
+        (tokens, columns, sentences, strings, string_bytes) = \
+            _header.unpack_from(self._map, len(magic))
+        offset = len(magic) + _header.size
+        self.columns = []
+        self._offsets = []
+        for c in range(columns):
+            self.columns.append(IntView(self._map, offset, tokens))
+            self._offsets.append(offset)
+            offset += 4 * tokens
+        self.sentence_starts = IntView(self._map, offset, sentences + 1)
+        offset += 4 * (sentences + 1)
+        self.sentence_ids = IntView(self._map, offset, sentences)
+        offset += 4 * sentences
+        self._string_offsets = IntView(self._map, offset, strings + 1)
+        self._strings = offset + 4 * (strings + 1)
+        if self._strings + string_bytes > len(self._map):
+            self.close()
+            raise IOError("Truncated corpus cache: " + filename)
+
+        self.words = self.columns[0]
+        if columns > 1:
+            self.tags = self.columns[1]
+        self.sentences = sentences
+
+        # the string table and the sentence starts are much smaller than
+        # the columns and are read into memory the first time a string
+        # or a sentence is looked up, which makes the lookups faster
+        self._string_list = None
+        self._starts = None
+        self._tokens = tokens
+
+    def __len__(self):
+        return self._tokens
+
+    def string(self, id):
+        """
+        @return: The string for the ID C{id}.
+        @rtype: C{string}
+        """
+        if self._string_list is None:
+            self._string_list = self.strings()
+        return self._string_list[id]
+
+    def strings(self):
+        """
+        @return: A list of all strings, indexed by their IDs.
+        @rtype: C{list}
+        """
+        offsets = self._string_offsets.array()
+        data = self._map[self._strings:self._strings + offsets[-1]]
+        return [data[offsets[id]:offsets[id+1]] for id in range(len(offsets) - 1)]
+
+    def field(self, position, column):
+        """
+        @return: The string in column C{column} of the token at corpus
+            position C{position}.
+        @rtype: C{string}
+        """
+        # this is called for every token that is looked at (as is
+        # word()), so the ID is unpacked here rather than through the
+        # view of the column
+        if position < 0 or position >= self._tokens:
+            raise IndexError(position)
+        if self._string_list is None:
+            self._string_list = self.strings()
+        return self._string_list[_int.unpack_from(self._map, self._offsets[column] + 4 * position)[0]]
+
+    def word(self, position):
+        """
+        @return: The word at corpus position C{position}.
+        @rtype: C{string}
+        """
+        if position < 0 or position >= self._tokens:
+            raise IndexError(position)
+        if self._string_list is None:
+            self._string_list = self.strings()
+        return self._string_list[_int.unpack_from(self._map, self._offsets[0] + 4 * position)[0]]
+
+    def word_list(self, start, end):
+        """
+        @return: The words at the corpus positions from C{start} to
+            C{end}.
+        @rtype: C{list}
+        """
+        if self._string_list is None:
+            self._string_list = self.strings()
+        strings = self._string_list
+        return [strings[id] for id in self.words.array(start, end)]
+
+    def tag(self, position):
+        """
+        @return: The tag at corpus position C{position}.
+        @rtype: C{string}
+        """
+        return self.field(position, 1)
+
+    def sentence(self, position):
+        """
+        @return: The number (counting from 0) of the sentence that the
+            token at corpus position C{position} is in.
+        @rtype: C{int}
+        """
+        if self._starts is None:
+            self._starts = self.sentence_starts.array()
+        return bisect_right(self._starts, position, 0, self.sentences) - 1
+
+    def starts_sentence(self, position):
+        """
+        @return: True if the token at corpus position C{position} is
+            the first token of a sentence.
+        @rtype: C{bool}
+        """
+        sentence = self.sentence(position)
+        return self._starts[sentence] == position
+
+    def sentence_id(self, sentence):
+        """
+        @return: The id of the sentence number C{sentence}, which is
+            empty if the corpus has no sentence ids.
+        @rtype: C{string}
+        """
+        return self.string(self.sentence_ids[sentence])
+
+    def close(self):
+        """
+        Close the corpus cache.  The views of its columns cannot be
+        used afterwards.
+
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
+
+class CorpusCacheWriter:
+    """
+    Writes a corpus to a corpus cache file.  The tokens are added with
+    C{append()} and C{new_sentence()} and the file is written by
+    C{close()}.  (The file is first written under a temporary name of
+    its own, so that there is never an incomplete cache under
+    C{filename}, even while several processes create the same cache.)
+
+        >>> writer = CorpusCacheWriter("corpus.cache", 2)
+        >>> writer.new_sentence("s1")
+        >>> writer.append("The", "DT")
+        >>> writer.append("man", "NN")
+        >>> writer.close()
+    """
+    def __init__(self, filename, columns):
+        """
+        Construct a new C{CorpusCacheWriter} for a corpus with
+        C{columns} fields for every token.
+
+        @raise IOError: If the file cannot be written.
+        """
+        self._filename = filename
+        (self._file, self._temporary) = _open_temporary(filename)
+        self._columns = [array('i') for c in range(columns)]
+        self._starts = array('i')
+        self._ids = array('i')
+        self._strings = []
+        self._string_ids = {}
+        self._sentence = ""
+        self._in_sentence = False
+
+    def _intern(self, string):
+        try:
+            return self._string_ids[string]
+        except KeyError:
+            id = len(self._strings)
+            self._string_ids[string] = id
+            self._strings.append(string)
+            return id
+
+    def new_sentence(self, id=""):
+        """
+        Start a new sentence with the id C{id}.  The tokens added
+        before the first call are a sentence without an id, and a
+        sentence without tokens is left out.
+
+        @rtype: None
+        """
+        self._sentence = id
+        self._in_sentence = False
+
+    def append(self, *fields):
+        """
+        Add a token with the strings C{fields}, one for each column, to
+        the end of the corpus.
+
+        @rtype: None
+        """
+        if not self._in_sentence:
+            self._starts.append(len(self._columns[0]))
+            self._ids.append(self._intern(self._sentence))
+            self._in_sentence = True
+        for c in range(len(self._columns)):
+            self._columns[c].append(self._intern(fields[c]))
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def close(self):
+        """
+        Write the corpus cache file.
+
+        @rtype: None
+        """
+        tokens = len(self._columns[0])
+        offsets = array('i', [0])
+        for string in self._strings:
+            offsets.append(offsets[-1] + len(string))
+
+        self._file.write(magic)
+        self._file.write(_header.pack(tokens, len(self._columns), len(self._ids),
+                                      len(self._strings), offsets[-1]))
+        for ids in self._columns + [self._starts + array('i', [tokens]), self._ids, offsets]:
+            _little_endian(ids).tofile(self._file)
+        self._file.write("".join(self._strings))
+        self._file.close()
+        # mkstemp() creates the file readable by its owner only
+        os.chmod(self._temporary, 0644)
+        os.rename(self._temporary, self._filename)
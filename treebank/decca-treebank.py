@@ -43,20 +43,48 @@ charencoding = "utf-8"
 # (Files specified on command line will override these settings.)
 
 input_corpus = "/home/user/research/decca/treebank/corpus.txt"
-cached_corpus = "/home/user/research/decca/treebank/corpus.bsddb"
+cached_corpus = "/home/user/research/decca/treebank/corpus.cache"
 constituents = "/home/user/research/decca/treebank/corpus.constituents"
-cached_cons = "/home/user/research/decca/treebank/corpus.cons.bsddb"
+cached_cons = "/home/user/research/decca/treebank/corpus.cons.cache"
 destination_dir = "/home/user/research/decca/treebank/output/"
 output_file_stem = "corpus-grams"
 
 # unit is the window we are examining -- i.e. the length of the string
-# covered by a nonterminal
+# covered by a nonterminal, or 0 for all lengths
 
 unit = 3
 
 # use plaintext output: 0, xhtml: 1
 xhtml = 0
 
+# Optional: file for the metrics of each n-gram length
+# [If a metrics file is given, one line with a JSON object is written to
+#  it for every n-gram length, with the number of n-grams generated and
+#  kept as variation n-grams, the time spent on expanding, filtering,
+#  and writing them, and the peak memory.  This requires python >= 2.6
+#  for the json module.]
+
+metrics_file = ""
+
+# Optional: binary result file
+# [If a result file is given, the variation n-grams of all lengths are
+#  written to it as well, with the words of the n-grams and the
+#  categories as integer IDs, so that they can be loaded with
+#  resultfile.ResultFile without parsing the output files.]
+
+results_file = ""
+
+# Optional: directory for checkpoints
+# [If a checkpoint directory is given, the variation n-grams of each
+#  length are saved to it once the length has been written to its
+#  output file.  An interrupted run can then be resumed with resume = 1
+#  (or -s/--resume) and the same settings, and goes on with the next
+#  length instead of starting over.  With unit 0, the units that were
+#  finished are skipped.]
+
+checkpoint_dir = ""
+resume = 0
+
 # --------------------------------------------------------
 # END USER SETTINGS
 # --------------------------------------------------------
@@ -65,18 +93,27 @@ xhtml = 0
 import getopt
 import sys
 import os
+import time
 import commands
-import io
-
-# import extra modules
-import bsddb
 
 from nltk_freqdist import *
+from sortedoutput import peak_memory
+from ngramhash import HashedSequence
+from corpuscache import CorpusCache, CorpusCacheWriter
+from constituentcache import ConstituentCache, ConstituentCacheWriter
+from metrics import Metrics
+from resultfile import ResultWriter
+from yieldmatcher import YieldMatcher
+from checkpoint import Checkpoint
 
 # specify the long options in arglist
-arglist = ['unit=','corpus=','cached-corp=','constituents=','cached_const=','directory=','xhtml','file=','help'] 
+arglist = ['unit=','corpus=','cached-corp=','constituents=','cached_const=','directory=','xhtml','file=','metrics=','results=','checkpoint=','resume','prepare','help'] 
 # parse the command line call
-opts, args = getopt.getopt(sys.argv[1:],"u:c:b:d:o:n:x:f:h",arglist)
+opts, args = getopt.getopt(sys.argv[1:],"u:c:b:d:o:n:x:f:e:r:k:sph",arglist)
+
+# with prepare = 1 (-p/--prepare), only the cached corpus and the cached
+# constituents are created
+prepare = 0
 
 # Go through the command line options and see if the user specified a
 # directory or a corpus, or asked for help
@@ -84,7 +121,10 @@ opts, args = getopt.getopt(sys.argv[1:],"u:c:b:d:o:n:x:f:h",arglist)
 for option, specification in opts:
     if option in ("-u", "--unit"):
         strunit = specification
-        unit = int(strunit)
+        if strunit == "all":
+            unit = 0
+        else:
+            unit = int(strunit)
     if option in ("-d", "--directory"):
         destination_dir = specification
     elif option in ("-c", "--corpus"):
@@ -103,6 +143,16 @@ for option, specification in opts:
 	xhtml = newxhtml
     elif option in ("-f", "--file"):
         output_file_stem = specification
+    elif option in ("-e", "--metrics"):
+        metrics_file = specification
+    elif option in ("-r", "--results"):
+        results_file = specification
+    elif option in ("-k", "--checkpoint"):
+        checkpoint_dir = specification
+    elif option in ("-s", "--resume"):
+        resume = 1
+    elif option in ("-p", "--prepare"):
+        prepare = 1
     elif option in ("-h", "--help"):
         print """
 
@@ -113,7 +163,7 @@ and writes out n files to destination_dir.
 
 Options:
 
--u/--unit          specify the unit length
+-u/--unit          specify the unit length, or all for all unit lengths
 -c/--corpus        specify the (absolute) corpus file name
 -b/--cached-corp   specify the (absolute) cached corpus file name
 -o/--constituents  specify the (absolute) constituents file name
@@ -121,6 +171,11 @@ Options:
 -d/--directory     specify the (absolute) output directory name
 -f/--file          specify the base name for the output files
 -x/--xhtml         toggle XHTML output
+-e/--metrics       specify a file to write the metrics of each n-gram length to
+-r/--results       specify a file to write the results to in a binary format
+-k/--checkpoint    specify a directory to save a checkpoint to after each n-gram length
+-s/--resume        resume from the checkpoints in the checkpoint directory
+-p/--prepare       only create the cached corpus and constituents, then exit
 -h/--help          display this help menu
 """
         sys.exit()
@@ -129,10 +184,17 @@ Options:
 if destination_dir[len(destination_dir)-1] != "/":
     destination_dir += "/"
 
-# create output string for unit setting
-unit_str = str(unit)
-if unit < 10:
-    unit_str = "0" + unit_str
+# with unit 0 (-u all), all unit lengths are run one after the other
+all_units = (unit == 0)
+
+# a run can only be resumed from its checkpoints, and the result file of
+# the interrupted run cannot be continued
+if resume and not checkpoint_dir:
+    sys.stderr.write("\n\nError: A checkpoint directory is needed to resume.\n")
+    sys.exit(1)
+if resume and results_file:
+    sys.stderr.write("\n\nError: A result file cannot be written when resuming.\n")
+    sys.exit(1)
 
 # print output settings
 if xhtml:
@@ -144,13 +206,6 @@ else:
 if not os.path.exists(destination_dir):
     print commands.getoutput("mkdir " + destination_dir)
     print "Creating directory " + destination_dir
-if not os.path.exists(destination_dir + unit_str):
-    print commands.getoutput("mkdir " + destination_dir + unit_str)
-    print "Creating directory " + destination_dir + unit_str
-
-# concatenate the path name with the file name and a dot for the
-# extension, to be used in the rest of the code
-destination_dir += unit_str + "/" + output_file_stem + "."
 
 # --------------------------------------------------------
 
@@ -166,6 +221,27 @@ def get_n_str(n,unit):
         n_str=str(n+unit-1)
     return n_str
 
+# the function 'ngram_key' returns the key for the n-gram of the given
+# length starting at corpus position start (counting from 1): a hash
+# computed from the prefix hashes in Words, so that no n-gram strings
+# have to be built until the output is written
+
+def ngram_key(start,length):
+    return Words.key(start-1,length)
+
+# a 'Gram' is the record for the n-gram starting at corpus position
+# start (counting from 1) in Grams and Store: words is the key of the
+# n-gram from ngram_key and cats maps each offset in the n-gram where a
+# nonterminal starts (as an integer) to its cat
+
+class Gram(object):
+    __slots__ = ('start', 'words', 'cats')
+
+    def __init__(self, start, words, cats):
+        self.start = start
+        self.words = words
+        self.cats = cats
+
 def add_to_dict(Dict,words,offset,cat):
     if (Dict.has_key(words)):
         if Dict[words].has_key(offset):
@@ -178,15 +254,93 @@ def add_to_dict(Dict,words,offset,cat):
         Dict[words][offset] = FreqDist()
         Dict[words][offset].inc(cat)
 
-def print_output(Output,filename):
+# the function 'gen_output' returns the index of the records of the
+# variation n-grams in Dict for the output: a list with a tuple (total,
+# key, words) for each n-gram, where words is the key of the n-gram in
+# Dict and key is its string followed by the text that follows it in an
+# output line, sorted by decreasing total and key, which is the order
+# of the output lines.  Only the n-gram strings are built here; the
+# lines themselves are formatted one at a time as they are written by
+# print_output.  gen_output also returns the time spent on sorting.
+
+def gen_output(Dict,xhtml,Grams,length):
+    if xhtml:
+        suffix = "</p>"
+    else:
+        suffix = "\t"
+
+    # build the strings for the n-grams in Dict from their positions in
+    # Grams
+    Strings = {}
+    for gram in Grams.itervalues():
+        if not Strings.has_key(gram.words):
+            Strings[gram.words] = Words.string(gram.start-1,length,tokensep) + suffix
+
+    Records = []
+    for words in Dict.keys():
+        # nb: the total should be the same for all offsets
+        total = 0
+        for Cats in Dict[words].itervalues():
+            if Cats.N() > total:
+                total = Cats.N()
+        Records.append((total, Strings[words], words))
+        del Strings[words]
+
+    begin = time.time()
+    Records.sort()
+    Records.reverse()
+    return Records, time.time() - begin
+
+# the function 'format_line' returns the output line (without the final
+# newline) for the n-gram with the string ngram, its total count, and
+# the FreqDists of the cats at its offsets in Offsets
+
+def format_line(total,ngram,Offsets,xhtml):
+    if xhtml:
+        parts = ["<p>", str(total), ": ", ngram, "</p>\n", "<ul>\n"]
+    else:
+        parts = [str(total), "\t", ngram]
+
+    for offset in Offsets.keys():
+        Cats = Offsets[offset]
+        if xhtml:
+            parts.append("<li>" + str(offset) + " <ul>\n")
+            for cat in Cats.samples():
+                parts.append("<li>" + str(Cats.count(cat)) + ': ' + cat + "</li>\n")
+            parts.append("</ul>\n</li>\n")
+        else:
+            # add the count of the cat@offset along with offset
+            # position (in parentheses)
+            parts.append('\t' + ' (' + str(offset) + ') --')
+
+            # for all cats (the actual variation), print them out with
+            # their counts
+            for cat in Cats.samples():
+                parts.append('  ' + str(Cats.count(cat)) + ':' + cat)
+
+    if xhtml:
+        parts.append("</ul>")
+    return "".join(parts)
+
+# the function 'print_output' writes the variation n-grams in Dict to
+# filename in the order of Records (from gen_output), formatting each
+# line as it is written, and adds them to the result file results.  The
+# n-grams are removed from Dict as they are written, so the formatted
+# lines are never all in memory at once.
+
+def print_output(Records,Dict,filename,results=None):
     if xhtml:
         filename += ".html"
+        suffix = len("</p>")
+    else:
+        suffix = len("\t")
 
-    if os.path.exists(filename):
+    # when resuming, the file may have been left by the interrupted run
+    if os.path.exists(filename) and not resume:
         sys.stderr.write("\n\nError: Output file " + filename + " already exists.\n")
         sys.exit(1)
     try:
-        file = io.open(filename, 'w', encoding="utf-8")
+        file = open(filename, 'w', 1 << 16)
     except:
         sys.stderr.write("\n\nError: Unable to open file " + filename + "\n")
 	sys.exit(1)
@@ -199,561 +353,619 @@ def print_output(Output,filename):
         file.write('<meta http-equiv="content-language" content="en" />\n')
         file.write("</head>\n<body>\n")
 
-    okeys = Output.keys()
-    okeys.sort()
-    okeys.reverse()
-
-    for key in okeys:
-        for line in Output[key]:
-	  file.write(unicode(line + "\n", encoding="utf8"))
+    # write the lines sorted by decreasing count
+    for (total, key, words) in Records:
+        ngram = key[:-suffix]
+        Offsets = Dict[words]
+        file.write(format_line(total,ngram,Offsets,xhtml) + "\n")
+
+        if results is not None:
+            entries = []
+            for offset in Offsets.keys():
+                for cat in Offsets[offset].samples():
+                    entries.append((int(offset), Offsets[offset].count(cat), cat))
+            results.add(total, ngram, entries)
+        del Dict[words]
 
     if xhtml:
 	file.write("</body>\n</html>\n")
 
     file.close()
 
-def gen_output(Dict,xhtml):
-    Output = {}
-
-    # --------
-    # GENERATING OUTPUT
-    # find all the n-grams in Dict, which will be the varying ones
-
-    for words in Dict.keys():
-	line = words
-	total = 0
+# --------------------------------------------------------
+# STEP 1: Read in nonterminals
 
-	if xhtml:
-	    line += "</p>\n"
-	    line += "<ul>\n"
+# the function 'read_constituents' opens the cached constituents,
+# creating the cache from the constituents file first if it does not
+# exist yet.  The cache holds the nonterminals bucketed by the length of
+# their yield (see constituentcache.py), so that only the nonterminals
+# of the unit lengths that are run are read from it.
+
+def read_constituents():
+    if not os.path.exists(cached_cons):
+        try:
+            nonterminals = open(constituents,'r')
+        except:
+            sys.stderr.write("\n\nError: Unable to open constituents file " + constituents + "\n")
+            sys.exit(1)
+        try:
+            Writer = ConstituentCacheWriter(cached_cons)
+        except IOError:
+            sys.stderr.write("\n\nError: Unable to open cached_cons file for writing\n" + cached_cons + "\n")
+            sys.exit(1)
+        line = nonterminals.readline()
+        while line:
+            spl = line.strip().split("\t")
+
+            # the length of the yield is the number of words (without the
+            # index and cat labels)
+            Writer.append(int(spl[0]), spl[1], len(spl) - 2)
+            line = nonterminals.readline()
+        nonterminals.close()
+        Writer.close()
+        print "nonterminals read in and cached,",
+    else:
+        print "cached nonterminals read in,",
+    sys.stdout.flush()
 
-        # nb: the total should be the same for all offsets
-        for offset in Dict[words].keys():
-            
-            if (Dict[words][offset].N()> total):
-                total = Dict[words][offset].N()
-                
-            if xhtml:
-	        line += "<li>" + str(offset) + " <ul>\n"
-		for cat in Dict[words][offset].samples():
-                    count = Dict[words][offset].count(cat)
-                    line += "<li>" + str(count) + ': ' + cat + "</li>\n"
-		line += "</ul>\n</li>\n"
-	    else:
-                # add the count of the cat@offset along with offset
-                # position (in parentheses)
-                line = line + '\t' + ' (' + str(offset) + ') --'
-            
-                # for all cats (the actual variation), print them out with
-                # their counts
-                for cat in Dict[words][offset].samples():
-                    count = Dict[words][offset].count(cat)
-                    line = line + '  ' + str(count) + ':' + cat
-
-            del Dict[words][offset]
+    try:
+        return ConstituentCache(cached_cons)
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to read cached_cons file " + cached_cons + "\n")
+        sys.exit(1)
 
+# the function 'find_windows' returns the corpus positions of all
+# stretches of the corpus that have the same words as the yield of one
+# of the nonterminals in Constituents of a length in units, as a
+# dictionary that maps each length to the start positions (counting from
+# 0).  The yields of all lengths are matched in a single pass over the
+# corpus.
+
+def find_windows(Constituents, units):
+    matcher = YieldMatcher(len(Words.strings))
+    for unit in units:
+        for start in Constituents.positions(unit):
+            matcher.add(Words.ids[start-1:start-1+unit])
+    return matcher.find(Words.ids)
+
+# the function 'base_case' expands the nonterminals in Bucket and the
+# stretches of the corpus starting at the positions in Starts (see
+# run_unit) to the variation n-grams of length unit, and returns them in
+# Grams and Dict.  begin is the time the base case started.
+
+def base_case(unit, Bucket, Starts, begin):
+    # create Dict, the dictionary of variations
+    Dict = {}
 
-        if xhtml:
-            line = "<p>" + str(total) + ": " + line + "</ul>"
-	else:
-            line = str(total) + "\t" + line
+    # Grams holds a Gram for each n-gram, indexed by its start position
+    # (counting from 1).  In the base case, all offsets are 0 because
+    # the cats start at the beginning.
+    Grams = {}
 
-        if not Output.has_key(total):
-	    Output[total] = []
-	Output[total].append(line)
-        del Dict[words]
-        
-    return Output
+    for (start, cat) in Bucket:
 
-def handle_one_line(line):
-    spl = line.split('\t')
-    # pop the words off the back of the list
-    words = spl.pop()
+        if Grams.has_key(start):
+            gram = Grams[start]
 
-    pairlist = []
+            # a cat that accounts for a unary branch will be longer
+            # than one that does not, so we want to keep it
 
-    while spl:
-        pair = spl.pop()
-        newspl = pair.split(':')
-        if newspl[0]:
-            offset = int(newspl[0])
+            if len(cat) > len(gram.cats[0]):
+                gram.cats[0] = cat
         else:
-            offset = 99999
-        cat = newspl[1]
-        pairlist.append((offset,cat))
-    return words, pairlist
-
-def have_seen(some_offset,newpairlist):
-    seen = 0
-    for (this_offset,this_cat) in newpairlist:
-        if int(some_offset) == this_offset:
-            seen = 1
-    return seen
+            Grams[start] = Gram(start, ngram_key(start,unit), {0: cat})
 
-# --------------------------------------------------------
-
-# we are working with the base case "unit-grams", so we set n to be 1
-# (they can be thought of as essentially unigrams)
-
-n = 1
+    # we now loop over Grams to store the n-grams in a dictionary (Dict),
+    # which will be used to keep track of varying n-grams
 
-print "Working with window units of length " + str(unit)
+    for gram in Grams.itervalues():
 
-# --------------------------------------------------------
-# STEP 1: Read in nonterminals
-
-print "Using corpus: " + input_corpus
-print "Writing to:   " + destination_dir
-sys.stdout.flush()
+        # Dict will be in the form:
+        # Dict[span] = {offset:<FreqDist of cats>, ...}
 
+        add_to_dict(Dict,gram.words,0,gram.cats[0])
 
-# tell the reader, we're reading in the corpus (i.e. unigrams)
-n_str = get_n_str(n,unit)
-print n_str + " grams:",
-sys.stdout.flush()
+    # Going through the stretches of the corpus that have the yield of a
+    # nonterminal, compare them with the nonterminal ones we already
+    # have and add new ones to Grams and Dict -- i.e. ones that are the
+    # same string but have no single nonterminal yield
 
-# create Dict, the dictionary of variations
-Dict = {}
+    for start in Starts:
+        # Grams is indexed by the start position of the n-gram, counting
+        # from 1
+        start = start + 1
 
-Grams = bsddb.btopen(None)
+        # if Grams has the start key, then we already know the cat label
+        # for the n-gram, so ignore it.
+        # But if it is not -- AND it appears elsewhere with a non-nil cat
+        # label (i.e. is in Dict) -- then put it in Grams and Dict
 
-# open up the file which contains all the nonterminal stretches of text
+        if not Grams.has_key(start):
+            span = ngram_key(start,unit)
+            if Dict.has_key(span):
+                Grams[start] = Gram(start, span, {0: 'NIL'})
+                Dict[span][0].inc('NIL')
 
-if not os.path.exists(cached_cons):
-    try:
-        nonterminals = open(constituents,'r')
-    except:
-        sys.stderr.write("\n\nError: Unable to open constituents file " + constituents + "\n")
-        sys.exit(1)
-    j = 1
-    Constituents = bsddb.btopen(cached_cons)
-    line = nonterminals.readline()
-    while line:
-        line = line.strip()
-	Constituents[str(j)] = line
-	j = j + 1
-	line = nonterminals.readline()
-    nonterminals.close()
-    print "nonterminals read in and cached,",
-else:
-    Constituents = bsddb.btopen(cached_cons)
-    print "cached nonterminals read in,",
-sys.stdout.flush()
+        # note that we ignore all stretches that have no nonterminal
+        # yield anywhere in the corpus -- obviously, they will not
+        # vary
 
-for key in range(1, len(Constituents.keys()) + 1):
-    line = Constituents[str(key)]
-    spl = line.split("\t")
 
-    # we only want to deal with windows of unit length (unit+2 because
-    # of the index and cat labels)
-    if (len(spl) == unit + 2):
-        index = spl.pop(0)
-        cat = spl.pop(0)
+    metrics.add("candidates", len(Grams))
+    metrics.since("expand", begin)
 
-        span = tokensep.join(spl)
+    # --------------------------------------------------------
 
-        # Grams will be in the form:
-        # "offset1:cat1\t...\toffsetN:catN\twords"
-        # where offseti is the offset point of the n-gram where cat_i
-        # starts (in the base case, all offsets are 0 because they
-        # start at the beginning
+    # filter out the nonvariations in Grams
 
-        if Grams.has_key(index):
-            templine = Grams[index]
+    begin = time.time()
+    keys = Grams.keys()
+    keys.sort()
+    for key in keys:
+        words = Grams[key].words
 
-            words, pairlist = handle_one_line(templine)
+        if Dict.has_key(words) and (Dict[words][0].B() < 2):
+            del Grams[key]
+            del Dict[words]
+        elif not Dict.has_key(words):
+            # Dict[words] has already been deleted
+            del Grams[key]
+        else:
+            sys.stderr.write(str(key) + "\n")
+    metrics.since("filter", begin)
+
+    return Grams, Dict
+
+# the function 'run_unit' finds the variation n-grams for the nuclei of
+# length unit from the nonterminals in Bucket, which cover unit words
+# each, and writes them to the directory for unit.  Starts holds the
+# corpus positions (counting from 0) of the stretches with the yield of
+# one of the nonterminals.  begin is the time the first level started,
+# which may include reading the corpus.
+
+def run_unit(unit, Bucket, Starts, begin):
+    # create output string for unit setting
+    unit_str = str(unit)
+    if unit < 10:
+        unit_str = "0" + unit_str
+
+    if not os.path.exists(destination_dir + unit_str):
+        print commands.getoutput("mkdir " + destination_dir + unit_str)
+        print "Creating directory " + destination_dir + unit_str
+
+    # concatenate the path name with the file name and a dot for the
+    # extension, to be used in the rest of the code
+    prefix = destination_dir + unit_str + "/" + output_file_stem + "."
+
+    # with all units, each unit has its own result file
+    results = None
+    if results_file:
+        filename = results_file
+        if all_units:
+            filename += "." + unit_str
+        try:
+            results = ResultWriter(filename, tokensep)
+        except IOError:
+            sys.stderr.write("\n\nError: Unable to open result file " + filename + "\n")
+            sys.exit(1)
+
+    # the checkpoint of this unit, and what it saved when resuming
+    checkpoint = None
+    saved = None
+    if checkpoint_dir:
+        try:
+            checkpoint = Checkpoint(checkpoint_dir, "unit" + unit_str, unit=unit,
+                                    corpus=cached_corpus, constituents=cached_cons,
+                                    prefix=prefix, xhtml=xhtml)
+            if resume:
+                saved = checkpoint.load()
+        except IOError, e:
+            sys.stderr.write("\n\nError: Unable to use checkpoint: " + str(e) + "\n")
+            sys.exit(1)
+
+    print "Working with window units of length " + str(unit)
+    print "Writing to:   " + prefix
+
+    if saved is not None and saved[1] is None:
+        print "Already finished according to the checkpoint."
+        sys.stdout.flush()
+        return
+
+    # we are working with the base case "unit-grams", so we set n to be 1
+    # (they can be thought of as essentially unigrams)
+
+    n = 1
+    n_str = get_n_str(n,unit)
 
-            # pairlist should be length 1
-            for (old_offset,oldcat) in pairlist:
+    if saved is None:
+        # tell the reader, we're reading in the corpus (i.e. unigrams)
+        print n_str + " grams:",
+        sys.stdout.flush()
 
-                # a cat that accounts for a unary branch will be longer
-                # than one that does not, so we want to keep it
-            
-                if len(cat) > len(oldcat):
-                    Grams[index] = "0:" + cat + '\t' + span
+        Grams, Dict = base_case(unit, Bucket, Starts, begin)
+    else:
+        # continue with the variation n-grams of the last length that
+        # was written, which are expanded to the next length below
+        (n, state) = saved
+        Grams = {}
+        for (start, words, cats) in state:
+            Grams[start] = Gram(start, words, cats)
+        del state
+        n_str = get_n_str(n,unit)
+        print "Resuming after the " + n_str + " grams from the checkpoint."
+        sys.stdout.flush()
+
+    # --------------------------------------------------------
+    # NOW BEGINS THE (non-base case) A PRIORI WORK
+
+    # Grams[i] = Gram(i, words, {offset1:cat, ..., offsetN:cat})
+    # Dict[words] = {offset1:<FreqDist>, ..., offsetN:<FreqDist>}
+    # where words is the key of the n-gram starting at i (the offsets in
+    # Dict are strings, as they appear in the output)
+
+    # --------------------------------------------------------
+    # STEP 3: loop over increasing longer n-grams until none found
+
+    # MAIN LOOP: loop until Grams, which stores all varyingly-tagged
+    # n-grams, has no more elements -- i.e. there are not n-grams of that
+    # size which are tagged in multiple ways
+
+    # the output of the length in the checkpoint has already been written
+    resumed = saved is not None
+    saved = None
+
+    while Grams:
+        if resumed:
+            resumed = 0
         else:
-            Grams[index] = "0:" + cat + '\t' + span
+            # write results for current n
 
-# we now loop over Grams to store the n-grams in a dictionary (Dict),
-# which will be used to keep track of varying n-grams
+            print "variations found,",
+            sys.stdout.flush()
 
-for index, line in Grams.iteritems():
-    # get the cat and actual n-gram (span) from Grams for this index
+            begin = time.time()
+            filename = prefix+n_str
+            Records, sort_time = gen_output(Dict,xhtml,Grams,unit+n-1)
+            print_output(Records,Dict,filename,results)
+            del Records
+            if results is not None:
+                results.end_level(unit+n-1)
 
-    span, pairlist = handle_one_line(line)
+            # print out a note to the screen that these n-grams are finished.
+            print "written to file,",
+            print "and file sorted (%.2fs, peak memory %d kB)." % (sort_time, peak_memory())
+            sys.stdout.flush()
 
-    # pairlist should be length 1 and offset should be 0
-    for (offset,cat) in pairlist:
+            metrics.add("varying", len(Grams))
+            metrics.add("sort_time", sort_time)
+            metrics.since("output", begin)
+            metrics.level(unit+n-1, unit=unit)
 
-        # Dict will be in the form:
-        # Dict[span] = {offset:<FreqDist of cats>, ...}
+            # save the variation n-grams of this length, which are all
+            # that is needed to go on with the next one
+            if checkpoint is not None:
+                try:
+                    checkpoint.save(n, [(gram.start, gram.words, gram.cats)
+                                        for gram in Grams.itervalues()])
+                except IOError, e:
+                    sys.stderr.write("\n\nError: Unable to save checkpoint: " + str(e) + "\n")
+                    sys.exit(1)
 
-        add_to_dict(Dict,span,offset,cat)
 
-# --------------------------------------------------------
-# STEP 2:  Read in corpus
+        # Increment n: we are now dealing with the next higher n-gram
+        n = n + 1
 
-# set the corpus counter to be 1, the start of the corpus
-i = 1
+        # (re)initialize Store, which will store the Grams of the
+        # n-grams, indexed by the corpus position of the first element
+        # in the n-gram
+        Store = {}
 
-# initialize Corpus, which will hold the entire corpus indexed from 1
-# if the corpus has already been cached, read it in, otherwise read the
-# input_corpus and save as the cached_corpus
-if not os.path.exists(cached_corpus):
-    try:
-        corpus_file = open(input_corpus,'r')
-    except:
-        sys.stderr.write("\n\nError: Unable to open corpus file " + input_corpus + "\n")
-        sys.exit(1)
-    Corpus = bsddb.btopen(cached_corpus)
-    line = corpus_file.readline()
-    while line:
-        line = line.rstrip()
-        (id,word,tag) = line.split('\t')
-    
-        Corpus[str(i)] = word + '\t' + tag
+        # (re)initialize Dict, which will for each n-gram corpus position
+        # store the tag sequence that occurs for any occurrence of this
+        # n-gram
+        Dict = {}
 
-        # iterate i and get the next line
-        i = i + 1
-        line = corpus_file.readline()
+        n_str = get_n_str(n,unit)
 
-    corpus_file.close()
-    print "corpus read in and cached,",
-    sys.stdout.flush()
-else:
-    Corpus = bsddb.btopen(cached_corpus)
-    print "cached corpus read in,",
-    sys.stdout.flush()
+        # tell user we're starting work on this n:
+        print n_str+" grams:",
+        sys.stdout.flush()
 
-# set index to be the length of the corpus (plus 1)
-index = len(Corpus.keys()) + 1
-
-# ngram is a list which allows us to build up our unit-grams
-ngram = []
-
-# Going through the corpus word by word, compare the n-grams we create
-# with the nonterminal ones we already have and add new ones to Grams and
-# Dict -- i.e. ones that are the same string but have no single nonterminal 
-# yield
-
-for i in range(1, index):
-    line = Corpus[str(i)]
-    (word,tag) = line.split('\t')
-    
-    # we must build up the current n-gram.  To do so, we have to append
-    # until we reach that n-gram level
-    if (i < unit):
-        ngram.append(word)
-    else:
-        ngram.append(word)
-        ngramstring = tokensep.join(ngram)
+        # length is the number of words in the new n-grams
+        length = unit + n - 1
 
-        # since Grams is indexed by the start position of the n-gram,
-        # we have to calculate that start position (since we are at the
-        # end of the n-gram currently)
-        start = str(i - unit + 1)
+        begin = time.time()
 
-        # if Grams has the start key, then we already know the cat label
-        # for the n-gram, so ignore it.
-        # But if it is not -- AND it appears elsewhere with a non-nil cat
-        # label (i.e. is in Dict) -- then put it in Grams and Dict
+        # Grams holds the offsets and cats of all the n-1 grams, so we cycle
+        # through them.
+        for gram in Grams.itervalues():
 
-        if (not Grams.has_key(start)) and (Dict.has_key(ngramstring)):
-            Grams[start] = '0:NIL' + '\t' + ngramstring
-            Dict[ngramstring][0].inc('NIL')
+            numkey = gram.start
 
-        # note that we ignore all stretches that have no nonterminal
-        # yield anywhere in the corpus -- obviously, they will not
-        # vary
-            
-        # pop off the first element for the next loop
-        ngram.pop(0)
+            # we have to iterate through the offsets of the n-1 gram in
+            # order to find all larger n-grams that have variation
+            # starting at that offset
+            for (old_offset, cat) in gram.cats.iteritems():
 
+                # ------------------
+                # EXPAND TO THE LEFT
 
-# --------------------------------------------------------
+                # if there is something in the corpus one position to the
+                # left of the n-1 gram (numkey > 1), then if Store has
+                # this key, see if it also has the offset
 
-# filter out the nonvariations in Grams
+                if (numkey > 1):
 
-for key in Grams.keys():
-    line = Grams[key]
-    spl = line.split('\t')
-    words = spl.pop()
-    
-    if Dict.has_key(words) and (len(Dict[words][0].samples()) < 2):
-        del Grams[key]
-        del Dict[words]
-    elif not Dict.has_key(words):
-        # Dict[words] has already been deleted
-        del Grams[key]
-    else:
-        sys.stderr.write(key + "\n")
+                    # get the newkey and the new_offset values (when the
+                    # key moves to the left, new_offset increases by 1
+                    newkey = numkey-1
+                    new_offset = old_offset+1
 
-# --------------------------------------------------------
-# NOW BEGINS THE (non-base case) A PRIORI WORK
+                    # check to see if this string has been generate before
+                    if Store.has_key(newkey):
 
-# Grams[i] = offset1:cat\ t ... \t offsetN:cat \t words
-# Dict[words] = {offset1:<FreqDist>, ..., offsetN:<FreqDist>}
+                        newgram = Store[newkey]
 
-# --------------------------------------------------------
-# STEP 3: loop over increasing longer n-grams until none found
+                        # we have not seen new_offset, so add it to Store
+                        # and add the tags to the words' dictionary slot.
+                        if not newgram.cats.has_key(new_offset):
+                            newgram.cats[new_offset] = cat
+                            add_to_dict(Dict,newgram.words,str(new_offset),cat)
 
-# MAIN LOOP: loop until Grams, which stores all varyingly-tagged
-# n-grams, has no more elements -- i.e. there are not n-grams of that
-# size which are tagged in multiple ways
+                    # not Store.has_key(newkey) -->
+                    # now we know that we have not seen this new_offset or
+                    # even this n-gram starting at numkey-1
+                    else:
 
-while Grams:
-    # write results for current n
+                        # since we have not seen this n-gram, we get the key
+                        # for the n-gram one word further to the left
+                        wordline = ngram_key(newkey,length)
 
-    print "variations found,",
-    sys.stdout.flush()
+                        # store the offset, indexed by the position of the
+                        # first word (newkey)
+                        Store[newkey] = Gram(newkey, wordline, {new_offset: cat})
 
-    filename = destination_dir+n_str
-    Output = gen_output(Dict,xhtml)
-    print_output(Output,filename)
+                        # add the offsets and corresponding cats to the words'
+                        # dictionary slot.
+                        add_to_dict(Dict,wordline,str(new_offset),cat)
 
-    # print out a note to the screen that these n-grams are finished.
-    print "written to file,",
-    sys.stdout.flush()
+                # -------------------
+                # EXPAND TO THE RIGHT
 
-    # sort the file using unix sort, output into the file itself
-    commands.getstatusoutput("sort -nr "+filename+" -o "+filename)
+                # if there is a position in the corpus to the right of
+                # the entire n-gram (last corpus position = index-1)
+                # and no n-gram has been created at this key, create a
+                # new n-gram to the right
+                if ((numkey + (unit-1) + (n-1)) < (index-1)):
 
-    print "and file sorted."
-    sys.stdout.flush()
+                    # a little unpacking of (numkey + (unit-1) + (n-1)):
+                    # numkey is the starting key of the string
 
+                    # n is the variation n-gram we are working with.
+                    # So, numkey + (n-1) gives us the final word of this
+                    # n-gram (the first word + n-1 = n)
 
-    # Increment n: we are now dealing with the next higher n-gram
-    n = n + 1
+                    # But these "words" are not atomic units, rather they
+                    # are stretches of length unit.  So, we need to get
+                    # the length of the "word" before adding n-1 -- the
+                    # length will be 1 + unit-1, so we add (unit-1)
 
-    # (re)initialize Store, which will store the n-grams, indexed by the
-    # corpus position of the first element in the n-gram
-    Store = {}
+                    # the offset stays the same because we extend to the right
+                    new_offset = old_offset
 
-    # (re)initialize Dict, which will for each n-gram corpus position
-    # store the tag sequence that occurs for any occurrence of this
-    # n-gram
-    Dict = {}
+                    if Store.has_key(numkey):
 
-    n_str = get_n_str(n,unit)
+                        newgram = Store[numkey]
 
-    # tell user we're starting work on this n:
-    print n_str+" grams:",
-    sys.stdout.flush()
+                        # we have not seen new_offset, so add it to Store
+                        # and add the tags to the words' dictionary slot.
+                        if not newgram.cats.has_key(new_offset):
+                            newgram.cats[new_offset] = cat
+                            add_to_dict(Dict,newgram.words,str(new_offset),cat)
 
-    # Grams holds all the n-1 grams in string form, so we cycle through them.
-    for key, line in Grams.iteritems():
+                    # not Store.has_key(numkey) -->
+                    # now we know that we have not seen this new_offset or
+                    # even this n-gram starting at numkey
+                    else:
 
-        (words, pairlist) = handle_one_line(line)
+                        # since we have not seen this n-gram, we get the key
+                        # for the n-gram one word further to the right
+                        wordline = ngram_key(numkey,length)
 
-        # we have to iterate through pairlist, the list of all offset
-        # positions, in order to find all larger n-grams that have
-        # variation starting at that offset        
-        for (old_offset, cat) in pairlist:
+                        # store the offset, indexed by the position of the
+                        # first word (numkey)
+                        Store[numkey] = Gram(numkey, wordline, {new_offset: cat})
 
-            # make a list out of words, so we can easily add and
-            # subtract words from it (to the right and left)
-            wordlist = words.split(tokensep)
+                        # add the tags to the words' dictionary slot.
+                        add_to_dict(Dict,wordline,str(new_offset),cat)
 
-            # get the integer form of key, so we can manipulate it
-            numkey = int(key)
+        # end for (gram in Grams)
 
-            # ------------------
-            # EXPAND TO THE LEFT
+        # reinitialize Grams
+        Grams = {}
 
-            # if there is something in the corpus one position to the
-            # left of the n-1 gram (numkey > 1), then if Store has
-            # this key, see if it also has the offset
+        metrics.add("candidates", len(Store))
+        metrics.since("expand", begin)
 
-            if (numkey > 1):
+        # print a note to the screen that these n-grams have been indexed.
+        print "read in,",
+        sys.stdout.flush()
 
-                # get the newkey and the new_offset values (when the
-                # key moves to the left, new_offset increases by 1
-                newkey = str(numkey-1)
-                new_offset = str(old_offset+1)
+        # ----------------------------
+        # FILTER OUT THE NON-VARIATIONS
 
-                # check to see if this string has been generate before
-                if Store.has_key(newkey):
+        begin = time.time()
 
-                    # get the Stored value for this key
-                    newline = Store[newkey]
-                    newwords, newpairlist = handle_one_line(newline)
-                    seen = have_seen(new_offset,newpairlist)
+        # loop over the indexed positions in the Store
+        for i in Store.keys():
+            # get the Store's i'th Gram
+            gram = Store[i]
+            words = gram.words
 
-                    # we have not seen new_offset, so add it to Store
-                    if not seen:
-                        newstoreline = new_offset + ":" + cat + "\t" + newline
-                        Store[newkey] = newstoreline
+            # if 'words' is a varying n-gram, put it in Grams.  Otherwise,
+            # get rid of it from Dict
+            if (Dict.has_key(words)):
 
-                        # add the tags to the words' dictionary slot.
-                        add_to_dict(Dict,newwords,new_offset,cat)
+                # set variation to 0; we will see if any of the offsets
+                # are varying.  If so, we keep it (otherwise, delete
+                # offsets that result in no variation)
+                variation = 0
+                for offset in Dict[words].keys():
+                    if Dict[words][offset].B() > 1:
+                        variation = 1
                     else:
-                        Store[newkey] = newline
+                        del Dict[words][offset]
+
+                # if at least one of the offsets provided variation, we
+                # add this i'th Gram of Store to Grams; otherwise, delete
+                # it            
+                if (variation == 1):
+                    # we need to eliminate non-varying offsets from
+                    # the Gram when we put it into Grams: keep an offset
+                    # only if words has variation at this spot
+                    cats = {}
+                    for (offset,cat) in gram.cats.iteritems():
+                        if Dict[words].has_key(str(offset)):
+                            cats[offset] = cat
+                    if cats:
+                        gram.cats = cats
+                        Grams[i] = gram
 
-                # not Store.has_key(newkey) -->
-                # now we know that we have not seen this new_offset or
-                # even this n-gram starting at numkey-1
                 else:
+                    del Dict[words]
 
-                    # since we have not seen this n-gram, we must add it a
-                    # word from the corpus to the left
-		    corpusline = Corpus[newkey]
-                    (corpline,corptag) = corpusline.split('\t')
-                    wordlist.insert(0,corpline)
-
-                    # create strings from the n-gram lists
-                    wordline = tokensep.join(wordlist)
-
-                    # store the wordline and offset, indexed by the position
-                    # of the first word (newkey)
-                    Store[newkey] = new_offset + ":" + cat + '\t' + wordline
-
-                    # add the offsets and corresponding cats to the words'
-                    # dictionary slot.
-                    add_to_dict(Dict,wordline,new_offset,cat)
-
-                    # pop the first element off both lists, so that
-                    # when we create an n-gram to the right, we will
-                    # be dealing with the original n-1 gram
-                    wordlist.pop(0)
-
-            # -------------------
-            # EXPAND TO THE RIGHT
-
-            # if there is a position in the corpus to the right of
-            # the entire n-gram (last corpus position = index-1)
-            # and no n-gram has been created at this key, create a
-            # new n-gram to the right
-            if ((numkey + (unit-1) + (n-1)) < (index-1)):
-
-                # a little unpacking of (numkey + (unit-1) + (n-1)):
-                # numkey is the starting key of the string
-                
-                # n is the variation n-gram we are working with.
-                # So, numkey + (n-1) gives us the final word of this
-                # n-gram (the first word + n-1 = n)
-
-                # But these "words" are not atomic units, rather they
-                # are stretches of length unit.  So, we need to get
-                # the length of the "word" before adding n-1 -- the
-                # length will be 1 + unit-1, so we add (unit-1)
-
-                # the offset stays the same because we extend to the right
-                newkey = str(numkey+(unit-1)+(n-1))
-                new_offset = str(old_offset)
-
-                if Store.has_key(key):
-
-                    # get the Stored value of this key
-                    newline = Store[key]
-                    newwords,newpairlist = handle_one_line(newline)
-                    seen = have_seen(new_offset,newpairlist)
-                
-                    # we have not seen new_offset, so add it to Store
-                    if not seen:
-                        newstoreline = new_offset + ":" + cat + "\t" + newline
-                        Store[key] = newstoreline
+            del Store[i]
 
-                        # add the tags to the words' dictionary slot.
-                        add_to_dict(Dict,newwords,new_offset,cat)
-                    else:
-                        Store[key] = newline
+        # end for (i in Store.keys())
 
-                # not Store.has_key(key) -->
-                # now we know that we have not seen this new_offset or
-                # even this n-gram starting at numkey
-                else:
+        Store = {}
+        metrics.since("filter", begin)
 
-                    # since we have not seen this n-gram, we must add it a
-                    # word from the corpus to the right
-		    corpusline = Corpus[newkey]
-                    (corpline,corptag) = corpusline.split('\t')
-                    wordlist.append(corpline)
+    # end while (key in Grams)
 
-                    # create strings from the n-gram lists
-                    wordline = tokensep.join(wordlist)
+    print "and no variations found."
+    sys.stdout.flush()
 
-                    # store the wordline and tagline, indexed by the position
-                    # of the first word (key)
-                    Store[key] = new_offset + ":" + cat + '\t' + wordline
+    # the metrics of the first length without variation n-grams
+    metrics.level(unit+n-1, unit=unit)
+    if results is not None:
+        results.close()
+    if checkpoint is not None:
+        try:
+            checkpoint.finish(n)
+        except IOError, e:
+            sys.stderr.write("\n\nError: Unable to save checkpoint: " + str(e) + "\n")
+            sys.exit(1)
 
-                    # add the tags to the words' dictionary slot.
-                    add_to_dict(Dict,wordline,new_offset,cat)
+# --------------------------------------------------------
 
-                    wordlist.pop()
-                        
-    # end for (key in Grams.keys())
+print "Using corpus: " + input_corpus
+sys.stdout.flush()
 
-    # reinitialize Grams
-    Grams.close()
-    Grams = bsddb.btopen(None)
+# the base case of the first unit is expanded from the nonterminals and
+# the corpus, which are read in once for all units
+begin = time.time()
 
-    # print a note to the screen that these n-grams have been indexed.
-    print "read in,",
-    sys.stdout.flush()
+Constituents = read_constituents()
 
-    # ----------------------------
-    # FILTER OUT THE NON-VARIATIONS
-
-    # loop over the indexed positions in the Store
-    for i in Store.keys():
-        # get the Store's i'th value
-        storeline = Store[i]
-        words, pairlist = handle_one_line(storeline)
-
-        # if 'words' is a varying n-gram, put it in Grams.  Otherwise,
-        # get rid of it from Dict
-        if (Dict.has_key(words)):
-
-            # set variation to 0; we will see if any of the offsets
-            # are varying.  If so, we keep it (otherwise, delete
-            # offsets that result in no variation)
-            variation = 0
-            for offset in Dict[words].keys():
-                if len(Dict[words][offset].samples()) > 1:
-                    variation = 1
-                else:
-                    del Dict[words][offset]
+# STEP 2:  Read in corpus
 
-            # if at least one of the offsets provided variation, we
-            # add this i'th value of Store to Grams; otherwise, delete
-            # it            
-            if (variation == 1):
-                # Fill the Grams dictionary from the Store one
+# the corpus is held in a corpus cache, indexed from 0; if the corpus
+# has already been cached, open the cache, otherwise read the
+# input_corpus and save it as the cached_corpus
+if not os.path.exists(cached_corpus):
+    try:
+        corpus_file = open(input_corpus,'r')
+    except:
+        sys.stderr.write("\n\nError: Unable to open corpus file " + input_corpus + "\n")
+        sys.exit(1)
+    try:
+        Writer = CorpusCacheWriter(cached_corpus, 2)
+    except IOError:
+        sys.stderr.write("\n\nError: Unable to open cached_corpus file for writing\n" + cached_corpus + "\n")
+        sys.exit(1)
+    prev_sentindex = None
+    line = corpus_file.readline()
+    while line:
+        line = line.rstrip()
+        (id,word,tag) = line.split('\t')
 
-                # we need to eliminate non-varying offsets from
-                # storeline when we put it into Grams
+        # the sentence id sNN is the part of the corpus id sNN_NN
+        # before the "_"
+        sentindex = id.split('_')[0]
+        if sentindex != prev_sentindex:
+            prev_sentindex = sentindex
+            Writer.new_sentence(sentindex)
+        Writer.append(word, tag)
 
-                gramline = ""
-                for (offset,cat) in pairlist:
-                    pair = str(offset) + ":" + cat
-                    
-                    if Dict[words].has_key(str(offset)):
-                        # put the pair into the gramline only if words
-                        # has variation at this spot
-                        if gramline:
-                            gramline = gramline + "\t" + pair
-                        else:
-                            gramline = pair
-                if gramline:
-                    gramline = gramline + "\t" + words
-                    Grams[i] = gramline
+        # get the next line
+        line = corpus_file.readline()
 
-            else:
-                del Dict[words]
+    corpus_file.close()
+    Writer.close()
+    print "corpus read in and cached,",
+    sys.stdout.flush()
+else:
+    print "cached corpus read in,",
+    sys.stdout.flush()
 
-        del Store[i]
+try:
+    Corpus = CorpusCache(cached_corpus)
+except IOError:
+    sys.stderr.write("\n\nError: Unable to read cached_corpus file " + cached_corpus + "\n")
+    sys.exit(1)
 
-    # end for (i in Store.keys())
+# set index to be the length of the corpus (plus 1)
+index = len(Corpus) + 1
+
+# Words holds the words of the corpus as integer IDs, from which the key
+# of any n-gram is computed from its start position and length.  The
+# prefix hashes for the keys are computed once and saved next to the
+# cached corpus, in cached_corpus + ".hashes".
+Words = HashedSequence()
+try:
+    Words.load(Corpus.words.array(), Corpus.strings(), cached_corpus + ".hashes")
+except IOError:
+    sys.stderr.write("\n\nError: Unable to write hash file " + cached_corpus + ".hashes\n")
+    sys.exit(1)
+
+# wrapper.py creates the caches once with -p/--prepare before it runs
+# several unit lengths at the same time, which would otherwise all
+# create them
+if prepare:
+    print "caches ready."
+    Corpus.close()
+    Constituents.close()
+    sys.exit()
+
+try:
+    metrics = Metrics(metrics_file, append=resume, script="decca-treebank.py")
+except IOError:
+    sys.stderr.write("\n\nError: Unable to open metrics file " + metrics_file + "\n")
+    sys.exit(1)
+
+
+
+# find the variation n-grams for each unit length; with all units, only
+# the lengths with more than one nonterminal can vary
+if all_units:
+    units = [length for length in Constituents.lengths() if Constituents.count(length) > 1]
+else:
+    units = [unit]
 
-    Store = {}
+# find the stretches of the corpus with the yields of the nonterminals
+# for all unit lengths at once
+Windows = find_windows(Constituents, units)
 
-# end while (key in Grams)
+for unit in units:
+    run_unit(unit, Constituents.bucket(unit), Windows.get(unit, []), begin)
+    if Windows.has_key(unit):
+        del Windows[unit]
+    begin = time.time()
 
-print "and no variations found."
-sys.stdout.flush()
+metrics.close()
 
 # close corpus files
 
 Corpus.close()
 Constituents.close()
-Grams.close()
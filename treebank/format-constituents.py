@@ -18,31 +18,44 @@ import sys
 import commands
 import bsddb
 
+from corpuscache import CorpusCache, is_corpus_cache
+
 try:
   corpus_filename = sys.argv[1]
   tempcons_filename = sys.argv[2]
 except: 
-  print "Usage: " + sys.argv[0] + " input_corpus.txt temp_cons.txt"
+  print "Usage: " + sys.argv[0] + " input_corpus.txt|corpus.cache temp_cons.txt"
   sys.exit()
 
-corpus_fileh = open(corpus_filename)
 tempcons_fileh = open(tempcons_filename)
 
-Corpus = bsddb.btopen(None)
-
-i = 1
-line = corpus_fileh.readline()
-while line:
+# the corpus may also be given as the corpus cache of decca-treebank.py,
+# in which case the corpus positions are found from the start positions
+# of the sentences
+Cache = None
+if is_corpus_cache(corpus_filename):
+  Cache = CorpusCache(corpus_filename)
+  Sentences = {}
+  for sentence in range(Cache.sentences):
+    Sentences[Cache.sentence_id(sentence)] = Cache.sentence_starts[sentence]
+else:
+  corpus_fileh = open(corpus_filename)
+
+  Corpus = bsddb.btopen(None)
+
+  i = 1
+  line = corpus_fileh.readline()
+  while line:
     line = line.strip()
     (id,word,tag) = line.split('\t')
-     
+
     Corpus[id] = str(i)
 
     # iterate i and get the next line
     i = i + 1
     line = corpus_fileh.readline()
 
-corpus_fileh.close()
+  corpus_fileh.close()
 
 line = tempcons_fileh.readline()
 while line:
@@ -69,7 +82,10 @@ while line:
     orderedtermkeys = orderedterms.keys()
     orderedtermkeys.sort()
 
-    catstart = Corpus["s" + sentnum + "_" + str(orderedtermkeys[0])]
+    if Cache is not None:
+      catstart = str(Sentences["s" + sentnum] + orderedtermkeys[0])
+    else:
+      catstart = Corpus["s" + sentnum + "_" + str(orderedtermkeys[0])]
 
     output = catstart + "\t" + cat
 
@@ -80,5 +96,8 @@ while line:
 
   line = tempcons_fileh.readline()
 
-Corpus.close()
+if Cache is not None:
+  Cache.close()
+else:
+  Corpus.close()
 tempcons_fileh.close()
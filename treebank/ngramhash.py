@@ -0,0 +1,261 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the n-gram hashing shared by decca-pos.py and
+# decca-treebank.py.  Instead of joining the words of an n-gram with
+# tokensep to get a dictionary key (and splitting the key again to extend
+# the n-gram), an n-gram is keyed by a polynomial hash over the integer
+# IDs of its tokens.  With the prefix hashes of the whole sequence, the
+# hash of any n-gram is computed from its start position and length in
+# constant time, whatever the length of the n-gram.  The tokensep string
+# is only built when an output line is written.
+#
+# Since different n-grams can have the same hash, the key of an n-gram
+# is made up of two independent hashes with different bases, so that
+# two different n-grams only get the same key if both of their hashes
+# are the same (with a chance of about 1 in 2 ** 120 for every pair).
+# The key only depends on the tokens of the n-gram, so that it is the
+# same in every process and every run.
+#
+# The prefix hashes of a long sequence that is read again and again (the
+# words of a corpus cache) can be saved to a hash file, so that they are
+# only computed once.  The file is only used for a sequence with the
+# same IDs, which are checked by their MD5 digest.  All integers in the
+# file are 64-bit little-endian:
+#
+#   magic               "DECCAHS2"
+#   header              tokens, the MD5 digest of the IDs (16 bytes)
+#   prefix hashes       tokens + 1 hashes with the first base
+#   prefix hashes       tokens + 1 hashes with the second base
+
+import os
+import sys
+import struct
+import hashlib
+import tempfile
+from array import array
+
+# the hashes are computed modulo a Mersenne prime and kept in arrays of
+# C longs, which have 64 bits on most platforms (where they do not, the
+# hashes are kept in lists instead)
+modulus = (1 << 61) - 1
+base = 1000003
+base2 = 2147483659
+
+magic = "DECCAHS2"
+
+_header = struct.Struct("<q16s")
+
+def _hashes(values):
+    if array('l').itemsize >= 8:
+        return array('l', values)
+    return list(values)
+
+def _open_temporary(filename):
+    # a new file with a unique name in the directory of filename, which
+    # is renamed to filename once it is complete
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        (fd, temporary) = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                           suffix=".tmp", dir=directory)
+    except OSError, e:
+        raise IOError(str(e))
+    return (os.fdopen(fd, 'wb'), temporary)
+
+class HashedSequence:
+    """
+    A sequence of tokens stored as an array of integer IDs, together
+    with the prefix hashes needed to compute the hash of any n-gram in
+    constant time.  The strings for the IDs are kept in the table
+    C{strings}.
+
+        >>> seq = HashedSequence()
+        >>> for word in "the man saw the man".split():
+        ...     seq.append(word)
+        >>> seq.key(0, 2) == seq.key(3, 2)
+        True
+    """
+    def __init__(self):
+        """
+        Construct a new, empty C{HashedSequence}.
+        """
+        self.ids = array('l')
+        self.strings = []
+        self._ids = {}
+        self._prefix = _hashes([0])
+        self._powers = _hashes([1])
+        # the prefix hashes and powers with the second base, for the keys
+        self._prefix2 = _hashes([0])
+        self._powers2 = _hashes([1])
+
+    def intern(self, token):
+        """
+        @return: The ID for C{token}, assigning the next free ID if it
+            has not been seen before.
+        @rtype: C{int}
+        """
+        try:
+            return self._ids[token]
+        except KeyError:
+            id = len(self.strings)
+            self._ids[token] = id
+            self.strings.append(token)
+            return id
+
+    def append(self, token):
+        """
+        Add one token to the end of the sequence.
+
+        @rtype: None
+        """
+        id = self.intern(token)
+        self.ids.append(id)
+        self._prefix.append((self._prefix[-1] * base + id + 1) % modulus)
+        self._prefix2.append((self._prefix2[-1] * base2 + id + 1) % modulus)
+
+    def load(self, ids, strings, filename=None):
+        """
+        Fill an empty sequence with the tokens given by their IDs, for
+        which the strings are in C{strings} (so that the tokens do not
+        have to be interned again, e.g. for a corpus cache).
+
+        @param ids: The IDs of the tokens.
+        @type ids: C{sequence} of C{int}
+        @param strings: The strings for the IDs, which becomes the
+            table C{strings} of this sequence.
+        @type strings: C{list}
+        @param filename: A hash file for the prefix hashes: if it holds
+            the prefix hashes of C{ids}, they are read from it, and
+            otherwise they are computed and saved to it.
+        @type filename: C{string}
+        @rtype: None
+        @raise IOError: If the hash file cannot be written.
+        """
+        self.strings[:] = strings
+        for id in range(len(strings)):
+            self._ids[strings[id]] = id
+        self.ids.extend(array('l', ids))
+        if filename is not None and self._read_hashes(filename):
+            return
+
+        ids = self.ids
+        prefix = self._prefix
+        prefix2 = self._prefix2
+        h = prefix[-1]
+        h2 = prefix2[-1]
+        for id in ids[len(prefix)-1:]:
+            h = (h * base + id + 1) % modulus
+            h2 = (h2 * base2 + id + 1) % modulus
+            prefix.append(h)
+            prefix2.append(h2)
+        if filename is not None:
+            self._write_hashes(filename)
+
+    def _read_hashes(self, filename):
+        # read the prefix hashes from the hash file filename, if it holds
+        # those of this sequence
+        if not os.path.exists(filename):
+            return False
+        file = open(filename, 'rb')
+        try:
+            head = file.read(len(magic) + _header.size)
+            if len(head) < len(magic) + _header.size or head[:len(magic)] != magic:
+                return False
+            (tokens, digest) = _header.unpack_from(head, len(magic))
+            if tokens != len(self.ids) or digest != hashlib.md5(self.ids).digest():
+                return False
+            prefixes = []
+            for i in (0, 1):
+                if array('l').itemsize == 8:
+                    prefix = array('l')
+                    try:
+                        prefix.fromfile(file, tokens + 1)
+                    except EOFError:
+                        return False
+                    if sys.byteorder == "big":
+                        prefix.byteswap()
+                else:
+                    data = file.read(8 * (tokens + 1))
+                    if len(data) != 8 * (tokens + 1):
+                        return False
+                    prefix = list(struct.unpack("<%dq" % (tokens + 1), data))
+                prefixes.append(prefix)
+        finally:
+            file.close()
+        (self._prefix, self._prefix2) = prefixes
+        return True
+
+    def _write_hashes(self, filename):
+        # write the prefix hashes to the hash file filename, under a
+        # temporary name first
+        (file, temporary) = _open_temporary(filename)
+        file.write(magic)
+        file.write(_header.pack(len(self.ids), hashlib.md5(self.ids).digest()))
+        for prefix in (self._prefix, self._prefix2):
+            if isinstance(prefix, array):
+                if sys.byteorder == "big":
+                    prefix = array('l', prefix)
+                    prefix.byteswap()
+                prefix.tofile(file)
+            else:
+                file.write(struct.pack("<%dq" % len(prefix), *prefix))
+        file.close()
+        # mkstemp() creates the file readable by its owner only
+        os.chmod(temporary, 0644)
+        os.rename(temporary, filename)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def hash(self, start, n):
+        """
+        @return: The hash of the n-gram of length C{n} starting at
+            position C{start} (counting from 0).
+        @rtype: C{int}
+        """
+        try:
+            power = self._powers[n]
+        except IndexError:
+            power = self._power(n)
+        return (self._prefix[start+n] - self._prefix[start] * power) % modulus
+
+    def _power(self, n):
+        # base ** n, with the powers (of both bases) only computed as far
+        # as they are needed (up to the length of the longest n-gram)
+        powers = self._powers
+        powers2 = self._powers2
+        while len(powers) <= n:
+            powers.append((powers[-1] * base) % modulus)
+            powers2.append((powers2[-1] * base2) % modulus)
+        return powers[n]
+
+    def key(self, start, n):
+        """
+        @return: The key for the n-gram of length C{n} starting at
+            position C{start} (counting from 0), made up of its hashes
+            with both bases.  The key is the same for all n-grams with
+            the same tokens.
+        @rtype: C{long}
+        """
+        try:
+            power = self._powers[n]
+        except IndexError:
+            power = self._power(n)
+        power2 = self._powers2[n]
+        prefix = self._prefix
+        prefix2 = self._prefix2
+        return ((prefix[start+n] - prefix[start] * power) % modulus) << 61 | \
+               ((prefix2[start+n] - prefix2[start] * power2) % modulus)
+
+    def string(self, start, n, tokensep):
+        """
+        @return: The tokens of the n-gram of length C{n} starting at
+            position C{start} joined by C{tokensep}.
+        @rtype: C{string}
+        """
+        strings = self.strings
+        return tokensep.join([strings[id] for id in self.ids[start:start+n]])
@@ -0,0 +1,388 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the binary result file shared by decca-pos.py and
+# decca-treebank.py.  It holds the same variation n-grams as the output
+# files, but as integer arrays with the tokens of the n-grams and
+# categories (tag sequences or constituent labels) interned in a string
+# table, so that the results of a run can be loaded with a few bulk
+# reads instead of parsing the output files.
+#
+# A variation n-gram is a record with its total count, its n-gram, and
+# a list of entries (offset, count, category), one for each category
+# at each offset in the n-gram where a category starts (for
+# decca-pos.py, the offset is always 0).  The records of one length
+# are a level, sorted by decreasing total count as in the output files.
+#
+# The n-grams and categories are given as strings with their tokens
+# joined by tokensep, as in the output files, but they are stored as
+# sequences of token IDs, so that the string table only grows with the
+# number of distinct tokens and not with the length of the n-grams.
+#
+# All integers in the file are 32-bit little-endian, except for the
+# file positions, which are 64-bit:
+#
+#   magic               "DECCARS2"
+#   header              tokensep length
+#   tokensep            the tokensep string
+#   levels              one after the other, as they are written:
+#     totals              records total counts
+#     n-gram starts       records + 1 indices into the n-gram tokens
+#     n-gram tokens       string IDs
+#     entry starts        records + 1 indices into the entries
+#     offsets             entries offsets
+#     counts              entries counts
+#     category starts     entries + 1 indices into the category tokens
+#     category tokens     string IDs
+#   string offsets      strings + 1 offsets into the string data
+#   string data         the strings, one after the other
+#   directory           for each level: n, records, entries, n-gram
+#                       tokens, category tokens, position
+#   trailer             levels, strings, string table position,
+#                       directory position
+
+import os
+import sys
+import mmap
+import struct
+import tempfile
+from array import array
+
+magic = "DECCARS2"
+
+_header = struct.Struct("<i")
+_entry = struct.Struct("<5iq")
+_trailer = struct.Struct("<2i2q")
+
+# the largest 32-bit integer, which no count, index, or offset in the
+# file may exceed
+_limit = (1 << 31) - 1
+
+def _little_endian(ids):
+    # arrays are written and read in the byte order of the file
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+def _check(value, what):
+    # raise an error if value does not fit into a 32-bit integer
+    if value > _limit:
+        raise ValueError("Too many %s for a result file: %d" % (what, value))
+
+def _open_temporary(filename):
+    # a new file with a unique name in the directory of filename, which
+    # is renamed to filename once it is complete
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        (fd, temporary) = tempfile.mkstemp(prefix=os.path.basename(filename) + ".",
+                                           suffix=".tmp", dir=directory)
+    except OSError, e:
+        raise IOError(str(e))
+    return (os.fdopen(fd, 'wb'), temporary)
+
+def is_result_file(filename):
+    """
+    @return: True if C{filename} is a result file.
+    @rtype: C{bool}
+    """
+    try:
+        file = open(filename, 'rb')
+    except IOError:
+        return False
+    start = file.read(len(magic))
+    file.close()
+    return start == magic
+
+class ResultWriter:
+    """
+    Writes the variation n-grams of a run to a result file.  The
+    records of one length are added with C{add()} and written by
+    C{end_level()}; the string table is written by C{close()}.  (The
+    file is first written under a temporary name, so that there is
+    never an incomplete result file under C{filename}.)
+
+        >>> results = ResultWriter("ngrams.results", " ## ")
+        >>> results.add(3, "the ## man", [(0, 2, "DT ## NN"), (0, 1, "DT ## VB")])
+        >>> results.end_level(2)
+        >>> results.close()
+    """
+    def __init__(self, filename, tokensep):
+        """
+        Construct a new C{ResultWriter}.
+
+        @param tokensep: The string between the tokens of the n-grams
+            and categories.
+        @type tokensep: C{string}
+        @raise IOError: If the file cannot be written.
+        """
+        self._filename = filename
+        self._tokensep = tokensep
+        (self._file, self._temporary) = _open_temporary(filename)
+        self._file.write(magic)
+        self._file.write(_header.pack(len(tokensep)))
+        self._file.write(tokensep)
+        self._strings = []
+        self._string_ids = {}
+        self._directory = []
+        self._new_level()
+
+    def _new_level(self):
+        self._totals = array('i')
+        self._ngram_starts = array('i', [0])
+        self._ngram_tokens = array('i')
+        self._starts = array('i', [0])
+        self._offsets = array('i')
+        self._counts = array('i')
+        self._cat_starts = array('i', [0])
+        self._cat_tokens = array('i')
+
+    def _intern(self, string):
+        try:
+            return self._string_ids[string]
+        except KeyError:
+            id = len(self._strings)
+            self._string_ids[string] = id
+            self._strings.append(string)
+            return id
+
+    def _add_tokens(self, string, tokens, starts):
+        # add the IDs of the tokens of string to tokens and the index
+        # after them to starts
+        for token in string.split(self._tokensep):
+            tokens.append(self._intern(token))
+        starts.append(len(tokens))
+
+    def add(self, total, ngram, entries):
+        """
+        Add a variation n-gram to the current level.
+
+        @param total: The total count of the n-gram.
+        @type total: C{int}
+        @param ngram: The n-gram, as in the output files.
+        @type ngram: C{string}
+        @param entries: The (offset, count, category) entries of the
+            n-gram.
+        @type entries: C{list} of C{tuple}
+        @rtype: None
+        @raise ValueError: If the level gets too large for the file.
+        """
+        _check(len(self._ngram_tokens) + ngram.count(self._tokensep) + 1, "n-gram tokens")
+        self._totals.append(total)
+        self._add_tokens(ngram, self._ngram_tokens, self._ngram_starts)
+        for (offset, count, cat) in entries:
+            _check(len(self._cat_tokens) + cat.count(self._tokensep) + 1, "category tokens")
+            self._offsets.append(offset)
+            self._counts.append(count)
+            self._add_tokens(cat, self._cat_tokens, self._cat_starts)
+        self._starts.append(len(self._counts))
+
+    def end_level(self, n):
+        """
+        Write the records added since the last level as the level for
+        the n-grams of length C{n}.
+
+        @rtype: None
+        """
+        # sort the records by decreasing total count
+        order = [(-self._totals[i], i) for i in xrange(len(self._totals))]
+        order.sort()
+
+        totals = array('i')
+        ngram_starts = array('i', [0])
+        ngram_tokens = array('i')
+        starts = array('i', [0])
+        offsets = array('i')
+        counts = array('i')
+        cat_starts = array('i', [0])
+        cat_tokens = array('i')
+        for (total, i) in order:
+            totals.append(-total)
+            ngram_tokens.extend(self._ngram_tokens[self._ngram_starts[i]:self._ngram_starts[i+1]])
+            ngram_starts.append(len(ngram_tokens))
+            start = self._starts[i]
+            end = self._starts[i+1]
+            offsets.extend(self._offsets[start:end])
+            counts.extend(self._counts[start:end])
+            for j in xrange(start, end):
+                cat_tokens.extend(self._cat_tokens[self._cat_starts[j]:self._cat_starts[j+1]])
+                cat_starts.append(len(cat_tokens))
+            starts.append(len(counts))
+
+        self._directory.append((n, len(totals), len(counts), len(ngram_tokens),
+                                len(cat_tokens), self._file.tell()))
+        for ids in (totals, ngram_starts, ngram_tokens, starts, offsets, counts,
+                    cat_starts, cat_tokens):
+            _little_endian(ids).tofile(self._file)
+        self._new_level()
+
+    def close(self):
+        """
+        Write the string table and close the result file.
+
+        @rtype: None
+        @raise ValueError: If the strings are too long for the file.
+        """
+        strings_position = self._file.tell()
+        offsets = array('i', [0])
+        offset = 0
+        for string in self._strings:
+            offset += len(string)
+            _check(offset, "bytes of strings")
+            offsets.append(offset)
+        _little_endian(offsets).tofile(self._file)
+        self._file.write("".join(self._strings))
+
+        directory_position = self._file.tell()
+        for level in self._directory:
+            self._file.write(_entry.pack(*level))
+        self._file.write(_trailer.pack(len(self._directory), len(self._strings),
+                                       strings_position, directory_position))
+        self._file.close()
+        # mkstemp() creates the file readable by its owner only
+        os.chmod(self._temporary, 0644)
+        os.rename(self._temporary, self._filename)
+
+class ResultLevel:
+    """
+    The variation n-grams of one length in a result file, read into
+    integer arrays: C{totals} for the records, C{offsets} and
+    C{counts} for the entries, where the entries of record C{i} are
+    those from C{starts[i]} to C{starts[i+1]}, and the token IDs of the
+    n-grams and categories in C{ngram_tokens} and C{cat_tokens}, where
+    the n-gram of record C{i} is made up of the tokens from
+    C{ngram_starts[i]} to C{ngram_starts[i+1]} and the category of entry
+    C{j} of those from C{cat_starts[j]} to C{cat_starts[j+1]}.
+    """
+    def __init__(self, results, n, records, entries, ngram_tokens, cat_tokens,
+                 position):
+        self.n = n
+        self._results = results
+        arrays = []
+        for length in (records, records + 1, ngram_tokens, records + 1, entries,
+                       entries, entries + 1, cat_tokens):
+            arrays.append(results._array(position, length))
+            position += 4 * length
+        (self.totals, self.ngram_starts, self.ngram_tokens, self.starts,
+         self.offsets, self.counts, self.cat_starts, self.cat_tokens) = arrays
+
+    def __len__(self):
+        return len(self.totals)
+
+    def ngram(self, i):
+        """
+        @return: The tokens of the n-gram of record C{i}.
+        @rtype: C{list} of C{string}
+        """
+        strings = self._results.strings()
+        return [strings[id] for id in
+                self.ngram_tokens[self.ngram_starts[i]:self.ngram_starts[i+1]]]
+
+    def records(self):
+        """
+        @return: A generator of (total, n-gram, entries) records with
+            the n-grams and categories as in the output files, where the
+            entries are (offset, count, category) tuples.
+        @rtype: C{generator}
+        """
+        strings = self._results.strings()
+        tokensep = self._results.tokensep
+        ngram_starts = self.ngram_starts
+        cat_starts = self.cat_starts
+        for i in xrange(len(self.totals)):
+            ngram = tokensep.join([strings[id] for id in
+                                   self.ngram_tokens[ngram_starts[i]:ngram_starts[i+1]]])
+            entries = []
+            for j in xrange(self.starts[i], self.starts[i+1]):
+                cat = tokensep.join([strings[id] for id in
+                                     self.cat_tokens[cat_starts[j]:cat_starts[j+1]]])
+                entries.append((self.offsets[j], self.counts[j], cat))
+            yield self.totals[i], ngram, entries
+
+class ResultFile:
+    """
+    A result file opened for reading.  The levels are read with
+    C{level()}, which reads all records of a length in one go.
+
+        >>> results = ResultFile("ngrams.results")
+        >>> for (total, ngram, entries) in results.level(2).records():
+        ...     print total, ngram, entries
+    """
+    def __init__(self, filename):
+        """
+        Open the result file C{filename}.
+
+        @raise IOError: If the file cannot be read or is not a result
+            file.
+        """
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            # an empty file cannot be mapped
+            self._file.close()
+            raise IOError("Not a result file: " + filename)
+        if self._map[:len(magic)] != magic or \
+           len(self._map) < len(magic) + _header.size + _trailer.size:
+            self.close()
+            raise IOError("Not a result file: " + filename)
+
+        (length,) = _header.unpack_from(self._map, len(magic))
+        start = len(magic) + _header.size
+        self.tokensep = self._map[start:start + length]
+        (levels, self._string_count, self._strings_position, position) = \
+            _trailer.unpack_from(self._map, len(self._map) - _trailer.size)
+        self._directory = {}
+        for i in range(levels):
+            entry = _entry.unpack_from(self._map, position + i * _entry.size)
+            self._directory[entry[0]] = entry[1:]
+        self._strings = None
+
+    def _array(self, position, length):
+        ids = array('i')
+        ids.fromstring(self._map[position:position + 4 * length])
+        return _little_endian(ids)
+
+    def levels(self):
+        """
+        @return: The n-gram lengths that have a level in the file, in
+            increasing order.
+        @rtype: C{list} of C{int}
+        """
+        levels = self._directory.keys()
+        levels.sort()
+        return levels
+
+    def level(self, n):
+        """
+        @return: The level for the n-gram of length C{n}.
+        @rtype: C{ResultLevel}
+        @raise KeyError: If there is no level for C{n}.
+        """
+        return ResultLevel(self, n, *self._directory[n])
+
+    def strings(self):
+        """
+        @return: A list of all strings (the tokens of the n-grams and
+            categories), indexed by their IDs.
+        @rtype: C{list}
+        """
+        if self._strings is None:
+            offsets = self._array(self._strings_position, self._string_count + 1)
+            start = self._strings_position + 4 * len(offsets)
+            data = self._map[start:start + offsets[-1]]
+            self._strings = [data[offsets[id]:offsets[id+1]]
+                             for id in xrange(self._string_count)]
+        return self._strings
+
+    def close(self):
+        """
+        Close the result file.
+
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
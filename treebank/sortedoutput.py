@@ -0,0 +1,155 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the sorted output stage shared by decca-pos.py,
+# decca-treebank.py, and decca-dep.py.  It replaces writing each output
+# file unsorted and then running "sort -nr" on it: the output lines are
+# collected with their counts and written once, in the same order that
+# "sort -nr" gives in the C locale (by decreasing count and lines with
+# the same count in reverse byte order).  If the lines do not fit in the
+# memory limit, sorted runs are written to temporary files and merged.
+
+import heapq
+import marshal
+import resource
+import tempfile
+import time
+
+# the default limit (in bytes) for the output lines held in memory
+max_bytes = 256 * 1024 * 1024
+
+class SortedOutput:
+    """
+    A collection of output lines, each with a count, that are written
+    to a file sorted by decreasing count.
+
+        >>> output = SortedOutput()
+        >>> output.add(3, "3\\tthe ## man")
+        >>> output.write(file)
+    """
+    def __init__(self, limit=None):
+        """
+        Construct a new, empty C{SortedOutput}.
+
+        @param limit: The number of bytes of lines to hold in memory
+            before a sorted run is written to a temporary file.
+        @type limit: C{int}
+        """
+        if limit is None:
+            limit = max_bytes
+        self._limit = limit
+        self._lines = []
+        self._size = 0
+        self._runs = []
+        self.sort_time = 0.0
+
+    def add(self, count, line):
+        """
+        Add an output line.
+
+        @param count: The count the line is sorted by.
+        @type count: C{int}
+        @param line: The output line without the final newline.
+        @type line: C{string}
+        @rtype: None
+        """
+        self._lines.append((count, line))
+        # count the line itself plus the tuple and list overhead
+        self._size += len(line) + 100
+        if self._size > self._limit:
+            self._spill()
+
+    def runs(self):
+        """
+        @return: The number of sorted runs written to temporary files.
+        @rtype: C{int}
+        """
+        return len(self._runs)
+
+    def write(self, file):
+        """
+        Write all lines to C{file} in sorted order, each followed by a
+        newline.
+
+        @param file: An open file.
+        @rtype: None
+        """
+        if not self._runs:
+            self._sort()
+            for (count, line) in self._lines:
+                file.write(line + "\n")
+            self._lines = []
+            self._size = 0
+            return
+
+        if self._lines:
+            self._spill()
+
+        start = time.time()
+        for (count, line) in _merge(self._runs):
+            file.write(line + "\n")
+        self.sort_time += time.time() - start
+
+        for run in self._runs:
+            run.close()
+        self._runs = []
+
+    def _sort(self):
+        start = time.time()
+        self._lines.sort()
+        self._lines.reverse()
+        self.sort_time += time.time() - start
+
+    def _spill(self):
+        # write the lines in memory as a sorted run to a temporary file
+        self._sort()
+        run = tempfile.TemporaryFile()
+        for item in self._lines:
+            marshal.dump(item, run)
+        run.seek(0)
+        self._runs.append(run)
+        self._lines = []
+        self._size = 0
+
+class _Head(object):
+    # the next line of a sorted run, ordered so that the smallest item
+    # on the heap is the line that comes first in the output
+    __slots__ = ('item', 'run')
+
+    def __init__(self, item, run):
+        self.item = item
+        self.run = run
+
+    def __lt__(self, other):
+        return self.item > other.item
+
+def _merge(runs):
+    # merge the sorted runs, reading one line at a time from each
+    heap = []
+    for run in runs:
+        try:
+            heap.append(_Head(marshal.load(run), run))
+        except EOFError:
+            pass
+    heapq.heapify(heap)
+
+    while heap:
+        head = heap[0]
+        yield head.item
+        try:
+            head.item = marshal.load(head.run)
+            heapq.heapreplace(heap, head)
+        except EOFError:
+            heapq.heappop(heap)
+
+def peak_memory():
+    """
+    @return: The peak memory use (maximum resident set size) of this
+        process so far, in kilobytes.
+    @rtype: C{int}
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,165 @@
+# DECCA infomation:
+#
+# Copyright (C) 2006 Markus Dickinson, Detmar Meurers, Adriane Boyd
+# Contact: decca@ling.osu.edu
+# URL: http://decca.osu.edu
+# License: GNU GPL (http://decca.osu.edu/software/license.html)
+
+# This is the search for the corpus windows that decca-treebank.py
+# labels NIL: the stretches of the corpus that have the same words as
+# the yield of a nonterminal somewhere else.  Instead of sliding a
+# window of each unit length over the corpus, the yields of all lengths
+# are compiled into one Aho-Corasick automaton over the integer IDs of
+# the words, so that a single pass over the corpus finds the windows of
+# all lengths at once.
+#
+# The trie of the automaton is kept in one dictionary that maps
+# state * alphabet + ID to the next state, and the other links in
+# arrays indexed by state, rather than in a dictionary for each state.
+
+from array import array
+
+class YieldMatcher:
+    """
+    A multi-pattern matcher for sequences of token IDs.  The patterns
+    are added with C{add()}, after which C{find()} returns the start
+    positions of all their occurrences in a sequence, by length.
+
+        >>> matcher = YieldMatcher(len(Words.strings))
+        >>> matcher.add(Words.ids[4:7])
+        >>> Windows = matcher.find(Words.ids)
+        >>> Windows[3]
+        array('l', [4, 18])
+    """
+    def __init__(self, alphabet):
+        """
+        Construct a new C{YieldMatcher} without patterns.
+
+        @param alphabet: The number of distinct token IDs, which are
+            the integers from 0 to C{alphabet} - 1.
+        @type alphabet: C{int}
+        """
+        self._alphabet = alphabet
+        self._goto = {}
+        # for each state: its depth (the length of the prefix it
+        # stands for), its parent and the ID that leads to it from
+        # the parent, and whether a pattern ends in it
+        self._depth = array('l', [0])
+        self._parent = array('l', [0])
+        self._label = array('l', [0])
+        self._final = array('b', [0])
+        self._fail = None
+        self._output = None
+
+    def __len__(self):
+        """
+        @return: The number of states of the automaton.
+        @rtype: C{int}
+        """
+        return len(self._depth)
+
+    def add(self, ids):
+        """
+        Add the pattern C{ids}, a sequence of token IDs.  Patterns
+        cannot be added after the first call of C{find()}.
+
+        @rtype: None
+        """
+        goto = self._goto
+        alphabet = self._alphabet
+        state = 0
+        for id in ids:
+            key = state * alphabet + id
+            try:
+                state = goto[key]
+            except KeyError:
+                new = len(self._depth)
+                goto[key] = new
+                self._depth.append(self._depth[state] + 1)
+                self._parent.append(state)
+                self._label.append(id)
+                self._final.append(0)
+                state = new
+        if state:
+            self._final[state] = 1
+
+    def _build(self):
+        # compute the failure link of every state (the longest proper
+        # suffix of its prefix that is also a prefix in the trie) and
+        # the output link (the deepest state along the failure links,
+        # starting with the state itself, in which a pattern ends),
+        # visiting the states in order of their depth
+        goto = self._goto
+        alphabet = self._alphabet
+        depth = self._depth
+        parent = self._parent
+        label = self._label
+        final = self._final
+        states = len(depth)
+        fail = array('l', [0]) * states
+        output = array('l', [0]) * states
+
+        order = range(1, states)
+        order.sort(key=depth.__getitem__)
+        for state in order:
+            f = 0
+            if parent[state]:
+                id = label[state]
+                f = fail[parent[state]]
+                while True:
+                    next = goto.get(f * alphabet + id)
+                    if next is not None:
+                        f = next
+                        break
+                    if not f:
+                        break
+                    f = fail[f]
+            fail[state] = f
+            if final[state]:
+                output[state] = state
+            else:
+                output[state] = output[f]
+
+        self._fail = fail
+        self._output = output
+
+    def find(self, ids):
+        """
+        @return: A dictionary that maps each pattern length to an
+            array of the start positions (counting from 0) of the
+            occurrences of the patterns of that length in C{ids}, in
+            increasing order.  Lengths without occurrences are left out.
+        @rtype: C{dict}
+        """
+        if self._fail is None:
+            self._build()
+        goto = self._goto
+        alphabet = self._alphabet
+        depth = self._depth
+        fail = self._fail
+        output = self._output
+
+        Windows = {}
+        state = 0
+        i = 0
+        for id in ids:
+            i += 1
+            while True:
+                next = goto.get(state * alphabet + id)
+                if next is not None:
+                    state = next
+                    break
+                if not state:
+                    break
+                state = fail[state]
+
+            # report every pattern that ends here, from the longest
+            match = output[state]
+            while match:
+                n = depth[match]
+                try:
+                    Windows[n].append(i - n)
+                except KeyError:
+                    Windows[n] = array('l', [i - n])
+                match = output[fail[match]]
+        return Windows